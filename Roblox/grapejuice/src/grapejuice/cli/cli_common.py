@@ -1,8 +1,10 @@
 from pathlib import Path
+from typing import Optional
 
 from grapejuice_common import paths
 from grapejuice_common.gtk.gtk_util import gtk_boot
 from grapejuice_common.logs.log_vacuum import vacuum_logs
+from grapejuice_common.logs.tracing import configure_tracing, span
 
 
 def handle_fatal_error(ex: Exception):
@@ -32,18 +34,28 @@ def _load_locale() -> Path:
 
 
 def common_prepare():
+    # Tracing is configured first, so the rest of the start-up shows up in the trace
+    trace_path = configure_tracing("grapejuice")
+
+    with span("common_prepare"):
+        _common_prepare(trace_path)
+
+
+def _common_prepare(trace_path: Optional[Path]):
     locale_directory = None
     locale_loading_errors = None
 
     try:
-        locale_directory = _load_locale()
+        with span("load_locale"):
+            locale_directory = _load_locale()
 
     except Exception as e:
         locale_loading_errors = e
 
     from grapejuice_common.logs import log_config
 
-    log_config.configure_logging("grapejuice")
+    with span("configure_logging"):
+        log_config.configure_logging("grapejuice")
 
     # List out startup info
     # Has to be done after configure_logging to avoid load order conflicts
@@ -56,18 +68,26 @@ def common_prepare():
     if locale_directory is not None:
         log.info(f"Using locale directory {locale_directory}")
 
-    from grapejuice_common.features.settings import current_settings
+    if trace_path is not None:
+        log.info(f"Writing trace to '{trace_path}'")
+
+    with span("load_settings"):
+        from grapejuice_common.features.settings import current_settings
 
     if current_settings:
         if not current_settings.get_model().performed_first_time_setup:
             from grapejuice.first_time_setup import run_first_time_setup
-            run_first_time_setup()
 
-        current_settings.perform_migrations()
+            with span("first_time_setup"):
+                run_first_time_setup()
+
+        with span("perform_migrations"):
+            current_settings.perform_migrations()
 
 
 def common_exit():
-    vacuum_logs()
+    with span("common_exit"):
+        vacuum_logs()
 
 
 def common_run_configuration(fn):
@@ -76,7 +96,9 @@ def common_run_configuration(fn):
 
         try:
             common_prepare()
-            return_value = fn(*args, **kwargs)
+
+            with span(f"command/{getattr(fn, '__name__')}"):
+                return_value = fn(*args, **kwargs)
 
         except Exception as e:
             handle_fatal_error(e)
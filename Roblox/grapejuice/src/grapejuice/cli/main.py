@@ -1,6 +1,7 @@
 import locale
 import re
 from gettext import gettext as _
+from typing import Optional
 
 import click
 
@@ -125,15 +126,201 @@ def uninstall():
 
 @cli.command()
 @click.argument("hint", type=str)
-def top(hint: str):
+@click.option("--detailed", is_flag=True, help="Ask winedbg for the process list, this starts a wineserver")
+@click.option("--interval", type=float, default=1.0, show_default=True, help="Seconds between samples")
+@click.option("--once", is_flag=True, help="Print a single sample, measured over one interval, and exit")
+@click.option("--json", "as_json", is_flag=True, help="Write one JSON object per sample instead of a table")
+def top(hint: str, detailed: bool, interval: float, once: bool, as_json: bool):
+    import json
+    import time
     from grapejuice_common.wine.wineprefix_hints import WineprefixHint
     from grapejuice_common.wine.wine_functions import get_wineprefix
+    from grapejuice_common.wine.wine_process_monitor import WineProcessMonitor
 
     hint = WineprefixHint(hint)
     prefix = get_wineprefix([hint])
 
-    for proc in prefix.core_control.process_list:
-        print(repr(proc))
+    if detailed:
+        for proc in prefix.core_control.detailed_process_list:
+            print(repr(proc))
+
+        return
+
+    monitor = WineProcessMonitor(prefix.paths.base_directory)
+
+    try:
+        # Rates are measured between two samples, the first one only provides the counters to start from
+        monitor.sample()
+
+        while True:
+            time.sleep(interval)
+            samples = monitor.sample()
+
+            if as_json:
+                print(json.dumps({
+                    "timestamp": time.time(),
+                    "prefix": prefix.configuration.display_name,
+                    "processes": [sample.as_dict() for sample in samples]
+                }), flush=True)
+
+            else:
+                if not once:
+                    # Clear the screen and move the cursor home, like top does
+                    print("\033[H\033[2J", end="")
+
+                print(f"{prefix.configuration.display_name} - {len(samples)} process(es)")
+                print(
+                    f"{'PID':>8} {'CPU%':>6} {'RSS MiB':>9} {'THR':>4} "
+                    f"{'READ/s':>10} {'WRITE/s':>10} {'CSW/s':>8}  IMAGE"
+                )
+
+                for sample in sorted(samples, key=lambda s: s.cpu_percent, reverse=True):
+                    print(
+                        f"{sample.pid:>8} "
+                        f"{sample.cpu_percent:>6.1f} "
+                        f"{sample.rss_bytes / 1024 / 1024:>9.1f} "
+                        f"{sample.threads:>4} "
+                        f"{sample.read_bytes_per_second:>10.0f} "
+                        f"{sample.write_bytes_per_second:>10.0f} "
+                        f"{sample.context_switches_per_second:>8.0f}  "
+                        f"{sample.image}"
+                    )
+
+                print("", end="", flush=True)
+
+            if once:
+                break
+
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command()
+@click.option("--force", is_flag=True, help="Update even when the computer is busy")
+@click.option("--dry-run", is_flag=True, help="Only list the outdated Roblox installations")
+@common_run_configuration
+def pre_update(force: bool, dry_run: bool):
+    from grapejuice_common.wine.roblox_pre_update import outdated_products, pre_update_all_prefixes
+    from grapejuice_common.wine.wine_functions import prefixes_on_disk
+
+    if dry_run:
+        for prefix in prefixes_on_disk():
+            for outdated in outdated_products(prefix):
+                print(f"{prefix.configuration.display_name}: {outdated.product.value} -> {outdated.current_version}")
+
+        return
+
+    pre_update_all_prefixes(force=force)
+
+
+@cli.command()
+@click.option("--dry-run", is_flag=True, help="Only report how much space would be saved")
+@click.option("--jobs", type=int, default=None, help="Number of files to hash at the same time")
+@common_run_configuration
+def dedup_versions(dry_run: bool, jobs: Optional[int]):
+    from grapejuice_common.wine import versions_dedup
+    from grapejuice_common.wine.wine_functions import prefixes_on_disk
+
+    report = versions_dedup.dedup_versions(
+        list(prefixes_on_disk()),
+        dry_run=dry_run,
+        jobs=jobs or versions_dedup.DEFAULT_JOBS
+    )
+
+    mib = 1024 * 1024
+
+    print(f"Scanned {report.files} files ({report.bytes / mib:.1f} MiB), hashed {report.hashed_files}")
+
+    if report.skipped_prefixes:
+        print(f"Skipped {report.skipped_prefixes} prefix(es) that are running programs")
+
+    if dry_run:
+        print(f"{report.duplicate_files} duplicate files, {report.bytes_saved / mib:.1f} MiB would be saved")
+
+    else:
+        print(
+            f"Linked {report.duplicate_files} duplicate files "
+            f"({report.reflinked} reflinked, {report.hardlinked} hardlinked), saved {report.bytes_saved / mib:.1f} MiB"
+        )
+
+
+@cli.command()
+@click.option("--keep", type=int, default=1, show_default=True, help="Previous versions to keep per product")
+@click.option("--dry-run", is_flag=True, help="Only show what would be removed")
+@common_run_configuration
+def gc_versions(keep: int, dry_run: bool):
+    from grapejuice_common.wine import versions_gc
+    from grapejuice_common.wine.wine_functions import prefixes_on_disk
+
+    mib = 1024 * 1024
+    total = 0
+
+    for prefix in prefixes_on_disk():
+        plan = versions_gc.plan_gc(prefix, keep=keep)
+
+        for stale in plan.stale:
+            product = stale.product.value if stale.product else "unknown"
+            print(f"{prefix.configuration.display_name}: {stale.version.name} ({product}) "
+                  f"{stale.reclaimable_size / mib:.1f} MiB")
+
+        if not dry_run:
+            versions_gc.run_gc(plan)
+
+        total += plan.reclaimable_size
+
+    print(f"{'Would reclaim' if dry_run else 'Reclaimed'} {total / mib:.1f} MiB")
+
+
+def _print_registry_changes(changes):
+    for change in changes:
+        marker = {"added": "+", "removed": "-", "changed": "~"}[change.kind]
+        print(f"{marker} [{change.path}]")
+
+        for value_change in change.values:
+            if value_change.old is None:
+                print(f"    + {value_change.name} = {value_change.new.type.name} {value_change.new.data!r}")
+
+            elif value_change.new is None:
+                print(f"    - {value_change.name} = {value_change.old.type.name} {value_change.old.data!r}")
+
+            else:
+                print(f"    ~ {value_change.name} = {value_change.old.type.name} {value_change.old.data!r} "
+                      f"-> {value_change.new.type.name} {value_change.new.data!r}")
+
+
+@cli.command()
+@click.argument("hives", nargs=-1, type=click.Path(exists=True, dir_okay=False))
+@click.option("--snapshot", is_flag=True, help="Save the hives of every prefix to compare against later")
+@click.option("--key", "key_prefix", default=None, help="Only compare this key and its subkeys, e.g. Software\\Roblox")
+@common_run_configuration
+def registry_diff(hives, snapshot: bool, key_prefix: Optional[str]):
+    from pathlib import Path
+
+    from grapejuice_common.wine import registry_diff as diff
+    from grapejuice_common.wine.wine_functions import prefixes_on_disk
+
+    if hives:
+        if len(hives) != 2 or snapshot:
+            raise click.UsageError("Pass two hives to compare them, or none to compare every prefix to its snapshot")
+
+        _print_registry_changes(diff.diff_hives(Path(hives[0]), Path(hives[1]), key_prefix))
+        return
+
+    for prefix in prefixes_on_disk():
+        if snapshot:
+            diff.snapshot_registry(prefix)
+            print(f"Saved the registry of {prefix.configuration.display_name}")
+            continue
+
+        changes_by_hive = diff.diff_registry_snapshot(prefix, key_prefix)
+
+        if not changes_by_hive:
+            print(f"{prefix.configuration.display_name}: no snapshot, take one with --snapshot")
+            continue
+
+        for hive_name, changes in changes_by_hive.items():
+            print(f"{prefix.configuration.display_name}: {hive_name}: {len(changes)} changed keys")
+            _print_registry_changes(changes)
 
 
 def main():
@@ -4,7 +4,7 @@ from gettext import gettext as _
 from typing import Optional
 
 from grapejuice import gui_task_manager
-from grapejuice.tasks import InstallMicrosoftEdgeWebview2
+from grapejuice.tasks import InstallMicrosoftEdgeWebview2, RemoveOldRobloxVersions
 from grapejuice_common.gtk.components.grape_setting import GrapeSetting
 from grapejuice_common.gtk.components.grape_setting_action import GrapeSettingAction
 from grapejuice_common.gtk.components.grape_settings_group import GrapeSettingsGroup
@@ -57,6 +57,9 @@ def _app_hints(prefix: Wineprefix) -> GrapeSettingsGroup:
 
 
 def _roblox_settings(prefix: Wineprefix) -> GrapeSettingsGroup:
+    def do_remove_old_versions(*_):
+        gui_task_manager.run_task_once(RemoveOldRobloxVersions, prefix)
+
     return GrapeSettingsGroup(
         title=_("Roblox Settings"),
         description=_("Roblox has some 'secret' launch options. You can change those here. Be careful!"),
@@ -66,6 +69,31 @@ def _roblox_settings(prefix: Wineprefix) -> GrapeSettingsGroup:
                 display_name=_("Roblox release channel"),
                 value=RobloxReleaseChannel(prefix.configuration.roblox_release_channel),
                 value_type=RobloxReleaseChannel
+            ),
+            GrapeSetting(
+                key="roblox_direct_player_launch",
+                display_name=_("Skip the Roblox launcher"),
+                description=_("Start the Roblox player directly when the installed version is up to date. "
+                              "The launcher is still used to update Roblox."),
+                value=prefix.configuration.roblox_direct_player_launch
+            ),
+            GrapeSetting(
+                key="is_template",
+                display_name=_("Use as template for new prefixes"),
+                description=_("New prefixes are cloned from this prefix instead of installing Roblox from scratch. "
+                              "Log out of Roblox in this prefix first."),
+                value=prefix.configuration.is_template
+            ),
+            GrapeSetting(
+                key="remove-old-roblox-versions",
+                display_name=_("Remove old Roblox versions"),
+                description=_("Roblox keeps every version it has installed. This removes all but the current version "
+                              "and the one before it. Versions that are running are left alone."),
+                value=GrapeSettingAction(
+                    key="remove-old-roblox-versions",
+                    display_name=_("Remove old versions"),
+                    action=do_remove_old_versions
+                )
             )
         ]
     )
@@ -339,7 +367,9 @@ class PrefixFeatureToggles:
         model.hints = hints
 
         model.apply_dict(self._groups.winedebug.settings_dictionary)
-        model.apply_dict(self._groups.roblox_settings.settings_dictionary)
+        roblox_settings = self._groups.roblox_settings.settings_dictionary
+        roblox_settings.pop("remove-old-roblox-versions", None)
+        model.apply_dict(roblox_settings)
 
         graphics = self._groups.graphics_settings.settings_dictionary
         model.roblox_renderer = graphics.pop("roblox_renderer", RobloxRenderer.Undetermined).value
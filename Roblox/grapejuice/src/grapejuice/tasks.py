@@ -3,7 +3,6 @@ import random
 import subprocess
 import sys
 import time
-from datetime import datetime, timedelta
 from gettext import gettext as _
 from pathlib import Path
 from typing import Optional
@@ -56,23 +55,17 @@ class ExtractFastFlags(background.BackgroundTask):
     def work(self) -> None:
         from grapejuice_common.abstraction.abstracted_instance import abstract_grapejuice
 
-        should_extract_flags = True
+        # Studio is only started when the installed version has not been dumped before
+        abstract_grapejuice().extract_fast_flags()
 
-        # Only check fast flags every x minutes, checking more often is overkill
-        # This also reduces overall compute time used, yay!
 
-        if paths.fast_flag_cache_location().exists():
-            ten_minutes_ago = datetime.now() - timedelta(minutes=10)
-
-            stat = os.stat(paths.fast_flag_cache_location())
-            if stat.st_mtime > ten_minutes_ago.timestamp():
-                should_extract_flags = False
-
-        if should_extract_flags:
-            abstract_grapejuice().extract_fast_flags()
+class PreUpdateRoblox(background.BackgroundTask):
+    def __init__(self, **kwargs):
+        super().__init__(_("Updating Roblox in the background"), **kwargs)
 
-        else:
-            time.sleep(1)  # Make it feel like Grapejuice is doing something
+    def work(self) -> None:
+        from grapejuice_common.wine.roblox_pre_update import pre_update_all_prefixes
+        pre_update_all_prefixes()
 
 
 class OpenLogsDirectory(background.BackgroundTask):
@@ -133,6 +126,50 @@ class InstallRoblox(background.BackgroundTask):
         self._prefix.roblox.install_roblox(post_install_function=update_edge_state)
 
 
+class ClonePrefix(background.BackgroundTask):
+    _template: Wineprefix
+    _prefix: Wineprefix
+
+    def __init__(self, template: Wineprefix, prefix: Wineprefix, **kwargs):
+        super().__init__(
+            _("Creating {prefix} from {template}").format(
+                prefix=prefix.configuration.display_name,
+                template=template.configuration.display_name
+            ),
+            **kwargs
+        )
+
+        self._template = template
+        self._prefix = prefix
+
+    def work(self):
+        from grapejuice_common.wine.wineprefix_clone import clone_prefix
+        clone_prefix(self._template, self._prefix)
+
+
+class RemoveOldRobloxVersions(background.BackgroundTask):
+    _prefix: Wineprefix
+
+    def __init__(self, prefix: Wineprefix, **kwargs):
+        super().__init__(
+            _("Removing old Roblox versions from {prefix}").format(prefix=prefix.configuration.display_name),
+            **kwargs
+        )
+
+        self._prefix = prefix
+
+    def work(self):
+        from grapejuice_common.wine import versions_gc
+
+        plan = versions_gc.plan_gc(self._prefix)
+        removed = versions_gc.run_gc(plan)
+
+        self._log.info(
+            f"Removed {len(removed)} old Roblox versions, "
+            f"{sum(stale.reclaimable_size for stale in removed) / 1024 / 1024:.1f} MiB"
+        )
+
+
 class ShowDriveC(background.BackgroundTask):
     _path: Path
 
@@ -24,7 +24,7 @@ from grapejuice.tasks import \
     RunLinuxApp, \
     KillWineserver, \
     SetDXVKState, \
-    PreloadXRandR, OpenRobloxApp
+    PreloadXRandR, OpenRobloxApp, PreUpdateRoblox, ClonePrefix
 from grapejuice.windows.settings_window import SettingsWindow
 from grapejuice_common import variables, paths
 from grapejuice_common.features.settings import current_settings
@@ -42,6 +42,12 @@ from grapejuice_common.util.stores import WritableStore
 from grapejuice_common.wine.wine_functions import create_new_model_for_user, get_studio_wineprefix, get_app_wineprefix
 from grapejuice_common.wine.wineprefix import Wineprefix
 
+# Seconds between background Roblox updates, Roblox releases a new version about once a week
+BACKGROUND_UPDATE_INTERVAL = 60 * 60
+
+# Seconds before the first background update, the user probably opened Grapejuice to launch something
+BACKGROUND_UPDATE_DELAY = 10 * 60
+
 
 def _open_fast_flags_for(prefix: Wineprefix):
     from grapejuice.windows.fast_flag_warning import FastFlagWarning
@@ -156,6 +162,26 @@ class MainWindow(GtkBase):
 
         gui_task_manager.run_task_once(PreloadXRandR)
 
+        self._schedule_background_updates()
+
+    def _schedule_background_updates(self):
+        from gi.repository import GObject
+
+        def update():
+            if current_settings.get_model().roblox_background_updates:
+                gui_task_manager.run_task_once(PreUpdateRoblox, on_already_running=lambda: None)
+
+            # Keep the timer going, the setting might be enabled later
+            return True
+
+        def first_update():
+            update()
+            GObject.timeout_add_seconds(BACKGROUND_UPDATE_INTERVAL, update)
+
+            return False
+
+        GObject.timeout_add_seconds(BACKGROUND_UPDATE_DELAY, first_update)
+
     def _save_current_prefix(self):
         if self._current_prefix_model is not None:
             current_settings.save_prefix_model(self._current_prefix_model)
@@ -429,9 +455,18 @@ class MainWindow(GtkBase):
     def _create_current_prefix(self):
         self._prefix_name_handler.finish_editing()
 
+        from grapejuice_common.wine.wineprefix_clone import find_template_prefix
+
         model = self._current_prefix_model
+        template = find_template_prefix(exclude_id=model.id)
 
         model.create_name_on_disk_from_display_name()
+
+        if template is not None:
+            # The clone has the DXVK files of the template
+            model.third_party = dict(template.configuration.third_party)
+            model.dxvk_overrides = list(template.configuration.dxvk_overrides)
+
         current_settings.save_prefix_model(model)
         prefix = Wineprefix(model)
 
@@ -439,11 +474,20 @@ class MainWindow(GtkBase):
             self._populate_prefix_list()
             self._show_prefix_model(self._current_prefix_model)
 
-        gui_task_manager.run_task_once(
-            InstallRoblox,
-            prefix,
-            on_finish_callback=after_installation
-        )
+        if template is not None:
+            gui_task_manager.run_task_once(
+                ClonePrefix,
+                template,
+                prefix,
+                on_finish_callback=after_installation
+            )
+
+        else:
+            gui_task_manager.run_task_once(
+                InstallRoblox,
+                prefix,
+                on_finish_callback=after_installation
+            )
 
     def _show_prefix_model(self, prefix: WineprefixConfigurationModel):
         self._current_prefix.clear_cached_value()
@@ -119,6 +119,15 @@ def _general_settings():
         )
     ]
 
+    settings.append(_from_user_settings(
+        key="roblox_background_updates",
+        default_value=False,
+        display_name=_("Update Roblox in the background"),
+        description=_("While Grapejuice is open, install new versions of the Roblox player when your computer is "
+                      "idle, so games start right away instead of waiting for an update. The Roblox installer window "
+                      "shows up while an update is installed.")
+    ))
+
     if _can_update():
         settings.append(_from_user_settings(
             key="release_channel",
@@ -2,13 +2,16 @@ import logging
 from typing import Callable
 
 from grapejuice_common.abstraction.abstract_grapejuice import AbstractGrapejuice
+from grapejuice_common.logs.tracing import span, traced
 from grapejuice_common.recipes.delete_edge_update_service_recipe import DeleteEdgeUpdateServiceRecipe
 from grapejuice_common.recipes.restore_edge_update_service_recipe import RestoreEdgeUpdateServiceRecipe
+from grapejuice_common.wine.launch_pipeline import LaunchPipeline
 from grapejuice_common.wine.wineprefix import Wineprefix
 
 LOG = logging.getLogger(__name__)
 
 
+@traced("update_edge_update_state")
 def _update_edge_update_state(prefix: Wineprefix):
     """
     We need to make sure the edge update service is in the correct state before each launch
@@ -26,45 +29,64 @@ def _update_edge_update_state(prefix: Wineprefix):
         recipe.make_in(prefix)
 
 
-def _with_prefix_id(prefix_id: str, cb: Callable[[Wineprefix], None]):
+def _with_prefix_id(prefix_id: str, cb: Callable[[Wineprefix, LaunchPipeline], None]):
     """
     Run an action for a prefix, while ensuring Roblox is installed.
     This function resolves the correct Wineprefix object for a given prefix id.
+    The edge update service is brought into the correct state while the action prepares its launch.
+    Background updates of the prefix are held off until the action has started.
     :param prefix_id: The prefix id to resolve
-    :param cb: Function to be called after the prefix is found (in the correct state)
+    :param cb: Function to be called after the prefix is found (in the correct state), it receives the pipeline its
+    pre-launch steps should be submitted to
     """
     from grapejuice_common.wine.wine_functions import find_wineprefix
+    from grapejuice_common.wine.roblox_pre_update import launch_lock
 
-    prefix = find_wineprefix(prefix_id)
+    with span("find_wineprefix", prefix_id=prefix_id):
+        prefix = find_wineprefix(prefix_id)
 
     def cb_wrapper(pfx: Wineprefix):
-        _update_edge_update_state(pfx)
-        cb(pfx)
+        with LaunchPipeline() as pipeline:
+            pipeline.submit("update_edge_update_state", _update_edge_update_state, pfx)
 
-    if prefix.roblox.is_installed:
-        cb_wrapper(prefix)
+            with span("prefix_action"):
+                cb(pfx, pipeline)
 
-    else:
-        prefix.roblox.install_roblox(post_install_function=lambda: cb_wrapper(prefix))
+    with span("check_roblox_installed"):
+        is_installed = prefix.roblox.is_installed
+
+    # Background updates run the launcher in the prefix too, they must not run while Roblox is being started
+    with launch_lock(prefix):
+        if is_installed:
+            cb_wrapper(prefix)
+
+        else:
+            prefix.roblox.install_roblox(post_install_function=lambda: cb_wrapper(prefix))
 
 
 class AbstractGrapejuiceImpl(AbstractGrapejuice):
     def launch_studio(self, prefix_id: str):
         # Roblox itself does this on Windows
         # But it might cause issues which might be cause for ide=False?
-        _with_prefix_id(prefix_id, lambda prefix: prefix.roblox.run_roblox_studio(ide=True))
+        _with_prefix_id(
+            prefix_id,
+            lambda prefix, pipeline: prefix.roblox.run_roblox_studio(ide=True, pipeline=pipeline)
+        )
 
     def play_game(self, prefix_id: str, uri: str):
-        _with_prefix_id(prefix_id, lambda prefix: prefix.roblox.run_roblox_player(uri))
+        _with_prefix_id(prefix_id, lambda prefix, pipeline: prefix.roblox.run_roblox_player(uri, pipeline=pipeline))
 
     def launch_app(self, prefix_id: str):
-        _with_prefix_id(prefix_id, lambda prefix: prefix.roblox.launch_app())
+        _with_prefix_id(prefix_id, lambda prefix, pipeline: prefix.roblox.launch_app(pipeline=pipeline))
 
     def edit_local_game(self, prefix_id: str, place_path: str):
-        _with_prefix_id(prefix_id, lambda prefix: prefix.roblox.run_roblox_studio(uri=place_path, ide=True))
+        _with_prefix_id(
+            prefix_id,
+            lambda prefix, pipeline: prefix.roblox.run_roblox_studio(uri=place_path, ide=True, pipeline=pipeline)
+        )
 
     def edit_cloud_game(self, prefix_id: str, uri: str):
-        _with_prefix_id(prefix_id, lambda prefix: prefix.roblox.run_roblox_studio(uri))
+        _with_prefix_id(prefix_id, lambda prefix, pipeline: prefix.roblox.run_roblox_studio(uri, pipeline=pipeline))
 
     def version(self):
         from grapejuice import __version__
@@ -90,4 +112,7 @@ class AbstractGrapejuiceImpl(AbstractGrapejuice):
         prefix.roblox.install_roblox(post_install_function=lambda: _update_edge_update_state(prefix))
 
     def authenticate_studio(self, prefix_id: str, ticket: str):
-        _with_prefix_id(prefix_id, lambda prefix: prefix.roblox.authenticate_studio(ticket))
+        _with_prefix_id(
+            prefix_id,
+            lambda prefix, pipeline: prefix.roblox.authenticate_studio(ticket, pipeline=pipeline)
+        )
@@ -97,3 +97,40 @@ class WineHomeInvalid(PresentableError):
             title="Wine home path is invalid",
             description=f"Wine home '{wine_home}' is invalid! {reason}."
         )
+
+
+class RegistryHiveInUse(RuntimeError):
+    def __init__(self, hive_path: Path):
+        super().__init__(f"Registry hive '{hive_path}' is owned by a running wineserver and cannot be edited offline")
+
+
+class RegistryHiveChanged(RuntimeError):
+    def __init__(self, hive_path: Path):
+        super().__init__(f"Registry hive '{hive_path}' was changed on disk while it was being edited")
+
+
+class UnsupportedOfflineRegistryEdit(RuntimeError):
+    pass
+
+
+class LegacyRegistryFormat(RuntimeError):
+    def __init__(self):
+        super().__init__(
+            "REGEDIT4 files store strings differently than version 5 files and cannot be merged into a transaction, "
+            "convert the file to 'Windows Registry Editor Version 5.00'"
+        )
+
+
+class DownloadVerificationFailed(RuntimeError):
+    def __init__(self, url: str, expected_digest: str, actual_digest: str):
+        super().__init__(f"Download of '{url}' is corrupt, expected SHA-256 {expected_digest} but got {actual_digest}")
+
+
+class WineprefixInUse(RuntimeError):
+    def __init__(self, prefix_path: Path):
+        super().__init__(f"Wineprefix '{prefix_path}' is running programs, close them and try again")
+
+
+class FastFlagExtractionFailed(RuntimeError):
+    def __init__(self, dump_path: Path, reason: str):
+        super().__init__(f"Could not extract fast flags to '{dump_path}': {reason}")
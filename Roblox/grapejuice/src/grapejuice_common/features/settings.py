@@ -7,6 +7,7 @@ from grapejuice_common import paths, variables
 from grapejuice_common.errors import HardwareProfilingError, NoHardwareProfile, PresentableError
 from grapejuice_common.hardware_info import hardware_profile
 from grapejuice_common.hardware_info.hardware_profile import HardwareProfile, profile_hardware
+from grapejuice_common.logs.tracing import traced
 from grapejuice_common.models.settings_model import SettingsModel
 from grapejuice_common.models.wineprefix_configuration_model import WineprefixConfigurationModel
 from grapejuice_common.util.pydantic_loader import pydantic_v1
@@ -55,9 +56,11 @@ def _remove_legacy_dunder_fields_from_settings_object(so: Dict[str, Any]) -> boo
 class SettingsManager:
     _settings_model: SettingsModel = None
     _location: Path = None
+    _revision: int = 0
 
     def __init__(self, file_location=paths.grapejuice_user_settings()):
         self._location = file_location
+        self._revision = 0
         self.load()
 
     def perform_migrations(self, desired_migration_version: int = current_settings_version()):
@@ -100,6 +103,13 @@ class SettingsManager:
     def version(self) -> int:
         return self._settings_model.version
 
+    @property
+    def revision(self) -> int:
+        """
+        Changes whenever the settings are loaded, saved or replaced
+        """
+        return self._revision
+
     @property
     def hardware_profile(self) -> HardwareProfile:
         if self._profile_hardware():
@@ -127,6 +137,7 @@ class SettingsManager:
 
         return None
 
+    @traced("profile_hardware")
     def _profile_hardware(self, always_profile: Optional[bool] = False) -> bool:
         """
         Profile the hardware of the machine Grapejuice is running on. This method may silently
@@ -220,6 +231,7 @@ class SettingsManager:
             save_settings = True
 
         save_settings = self._profile_hardware() or save_settings
+        self._revision += 1
 
         if save_settings:
             LOG.info("Saving settings after load, because something was wrong or needs updating")
@@ -227,6 +239,7 @@ class SettingsManager:
 
     def save(self):
         LOG.debug(f"Saving settings file to '{self._location}'")
+        self._revision += 1
 
         # Sort wineprefixes before saving so the file order matches the UI
         self._sort_wineprefixes()
@@ -280,6 +293,7 @@ class SettingsManager:
             **self._settings_model.dict(),
             **d
         })
+        self._revision += 1
 
 
 current_settings = SettingsManager()
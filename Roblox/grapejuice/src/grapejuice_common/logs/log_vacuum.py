@@ -13,7 +13,15 @@ number_of_logs_to_keep = 10
 
 
 def log_files():
-    return paths.logging_directory().glob("*.log")
+    logging_directory = paths.logging_directory()
+
+    # Rotated process logs may be compressed
+    yield from logging_directory.glob("*.log")
+    yield from logging_directory.glob("*.log.gz")
+
+    # Launch traces, see grapejuice_common.logs.tracing
+    yield from logging_directory.glob("*.trace.json")
+    yield from logging_directory.glob("*.trace.jsonl")
 
 
 def archive_directory():
@@ -0,0 +1,533 @@
+import argparse
+import array
+import gzip
+import json
+import logging
+import os
+import queue
+import selectors
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Set, IO, Iterable, List, Callable, Tuple
+
+import grapejuice_common
+from grapejuice_common import paths
+
+log = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# Module that is run as the writer process, __name__ is __main__ when it runs
+WRITER_MODULE = "grapejuice_common.logs.process_log_capture"
+
+# A capture hands the writer the read ends of the stdout and stderr pipes and the pty
+CAPTURE_FD_COUNT = 3
+MAX_REQUEST_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class LogCaptureSettings:
+    max_bytes: int = 10 * 1024 * 1024
+    backup_count: int = 2
+    compress: bool = False
+
+
+class RotatingLogWriter:
+    """
+    Writes process output to a log file, rotating it once it grows past the configured size.
+    Rotated files are named <name>.<n>.log, or <name>.<n>.log.gz when compression is enabled.
+    Compression happens on a worker thread, so writing never waits for it.
+    """
+    _path: Path
+    _settings: LogCaptureSettings
+    _fp: Optional[IO[bytes]] = None
+    _size: int = 0
+    _pending_count: int = 0
+    _compression_queue: Optional["queue.Queue[Optional[Path]]"] = None
+    _compressor: Optional[threading.Thread] = None
+
+    def __init__(self, path: Path, settings: LogCaptureSettings):
+        self._path = path
+        self._settings = settings
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def _rotated_path(self, index: int) -> Path:
+        suffix = ".log.gz" if self._settings.compress else ".log"
+        return self._path.with_name(f"{self._path.stem}.{index}{suffix}")
+
+    def _shift_backups(self):
+        backup_count = self._settings.backup_count
+
+        oldest = self._rotated_path(backup_count)
+        if oldest.exists():
+            os.remove(oldest)
+
+        for index in range(backup_count - 1, 0, -1):
+            rotated = self._rotated_path(index)
+
+            if rotated.exists():
+                os.replace(rotated, self._rotated_path(index + 1))
+
+    def _rotate(self):
+        self._fp.close()
+        self._fp = None
+
+        if self._settings.backup_count <= 0:
+            os.remove(self._path)
+            return
+
+        if not self._settings.compress:
+            self._shift_backups()
+            os.replace(self._path, self._rotated_path(1))
+            return
+
+        # Moving the file out of the way is all that happens here, the worker takes care of the backups
+        self._pending_count += 1
+        pending = self._path.with_name(f"{self._path.stem}.pending-{self._pending_count}.log")
+        os.replace(self._path, pending)
+
+        if self._compressor is None:
+            self._compression_queue = queue.Queue()
+            self._compressor = threading.Thread(target=self._compress_pending, name=f"log-compression/{pending.stem}")
+            self._compressor.start()
+
+        self._compression_queue.put(pending)
+
+    def _compress_pending(self):
+        while True:
+            pending = self._compression_queue.get()
+            if pending is None:
+                return
+
+            try:
+                self._shift_backups()
+
+                with pending.open("rb") as source, gzip.open(self._rotated_path(1), "wb") as destination:
+                    shutil.copyfileobj(source, destination)
+
+                os.remove(pending)
+
+            except OSError as e:
+                log.error(f"Failed to compress {pending}: {type(e).__name__}: {e}")
+
+    def write(self, data: bytes):
+        max_bytes = self._settings.max_bytes
+
+        while data:
+            if self._fp is None:
+                # Unbuffered, every chunk we read from the pipe is written in one go
+                self._fp = self._path.open("wb", buffering=0)
+                self._size = 0
+
+            if max_bytes > 0:
+                chunk = data[:max(max_bytes - self._size, 0)]
+
+            else:
+                chunk = data
+
+            if chunk:
+                self._fp.write(chunk)
+                self._size += len(chunk)
+                data = data[len(chunk):]
+
+            if data:
+                self._rotate()
+
+    def close(self):
+        """
+        Close the log file and wait for the rotated files that are still being compressed
+        """
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+        if self._compressor is not None:
+            self._compression_queue.put(None)
+            self._compressor.join()
+            self._compressor = None
+
+
+@dataclass
+class _PumpedProcess:
+    name: str
+    pipes: Set[int]
+    keep_open: List[int] = field(default_factory=list)
+
+
+class OutputPump:
+    """
+    Copies the output of processes from pipes into log files, processes can be added while it runs.
+    Other descriptors can be watched as well, their callback is called when they become readable.
+    """
+    _selector: selectors.BaseSelector
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+
+    def add(self, name: str, writers: Dict[int, RotatingLogWriter], keep_open: Iterable[int] = ()):
+        """
+        :param name: Name of the process, used in log messages
+        :param writers: Writers by the read end of the pipe they are fed from
+        :param keep_open: Descriptors that are closed once all pipes of the process are closed
+        """
+        process = _PumpedProcess(name, set(writers), list(keep_open))
+
+        for fd, writer in writers.items():
+            self._selector.register(fd, selectors.EVENT_READ, (process, writer))
+
+    def watch(self, fd: int, callback: Callable[[], None]):
+        self._selector.register(fd, selectors.EVENT_READ, callback)
+
+    def unwatch(self, fd: int):
+        self._selector.unregister(fd)
+
+    def _pump(self, fd: int, process: _PumpedProcess, writer: RotatingLogWriter):
+        try:
+            data = os.read(fd, READ_CHUNK_SIZE)
+
+        except OSError as e:
+            log.error(f"Failed to read output of {process.name}: {type(e).__name__}: {e}")
+            data = b""
+
+        if data:
+            try:
+                writer.write(data)
+
+            except OSError as e:
+                log.error(f"Failed to write to {writer.path}: {type(e).__name__}: {e}")
+
+            return
+
+        self._selector.unregister(fd)
+        os.close(fd)
+        writer.close()
+        process.pipes.discard(fd)
+
+        if not process.pipes:
+            for keep_open_fd in process.keep_open:
+                os.close(keep_open_fd)
+
+            log.debug(f"Output of {process.name} has been captured completely")
+
+    def run(self):
+        """
+        Pump until every pipe is closed and nothing is watched anymore
+        """
+        with self._selector:
+            while self._selector.get_map():
+                for key, _events in self._selector.select():
+                    if callable(key.data):
+                        key.data()
+
+                    else:
+                        self._pump(key.fd, *key.data)
+
+
+def pump_output(writers: Dict[int, RotatingLogWriter], name: str):
+    """
+    Copy the output of a process from pipes into log files until every process holding the other end has exited.
+    The pipes are closed along with the writers.
+    :param writers: Writers by the read end of the pipe they are fed from
+    :param name: Name of the process, used in log messages
+    """
+    pump = OutputPump()
+    pump.add(name, writers)
+    pump.run()
+
+
+def _writer_environment() -> Dict[str, str]:
+    # The writer has to import this module, even when Grapejuice itself was not started as an installed package
+    package_root = str(Path(grapejuice_common.__file__).resolve().parent.parent)
+    python_path = os.environ.get("PYTHONPATH", "")
+
+    return {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [package_root, python_path]))
+    }
+
+
+class _LogWriterSession:
+    """
+    The writer process of this Grapejuice process. Captures are handed to it over a socket, along with their
+    descriptors. Once Grapejuice exits the writer stops taking new captures, but keeps writing the output of the
+    processes it has until they exit.
+    """
+    _process: subprocess.Popen
+    _control: socket.socket
+
+    def __init__(self):
+        control, writer_control = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+
+        try:
+            self._process = subprocess.Popen(
+                [sys.executable, "-m", WRITER_MODULE, "--control", str(writer_control.fileno())],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                pass_fds=(writer_control.fileno(),),
+                env=_writer_environment(),
+                # Signals for the terminal of the CLI should not take the logs down with it
+                start_new_session=True
+            )
+
+        except BaseException:
+            control.close()
+            raise
+
+        finally:
+            writer_control.close()
+
+        self._control = control
+        log.info(f"Started log writer {self._process.pid}")
+
+    @property
+    def is_alive(self) -> bool:
+        return self._process.poll() is None
+
+    def send(self, request: Dict, fds: List[int]):
+        self._control.sendmsg(
+            [json.dumps(request).encode("UTF-8")],
+            [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds))]
+        )
+
+    def close(self):
+        self._control.close()
+
+
+_session: Optional[_LogWriterSession] = None
+_session_lock = threading.Lock()
+
+
+def _send_to_writer(request: Dict, fds: List[int]) -> bool:
+    """
+    Hand a capture to the writer process, starting it when there is none yet or when it has died
+    :return: Whether the writer took the capture
+    """
+    global _session
+
+    with _session_lock:
+        for _attempt in range(2):
+            try:
+                if _session is None or not _session.is_alive:
+                    _session = _LogWriterSession()
+
+                _session.send(request, fds)
+                return True
+
+            except OSError as e:
+                log.warning(f"Could not hand {request['name']} to the log writer: {type(e).__name__}: {e}")
+
+                if _session is not None:
+                    _session.close()
+                    _session = None
+
+    return False
+
+
+def _close_writer_session():
+    global _session
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+_active_captures: Set["ProcessLogCapture"] = set()
+_active_captures_lock = threading.Lock()
+
+
+class ProcessLogCapture:
+    """
+    Owns the file descriptors of a single launched process: a pty for stdin and pipes for stdout and stderr.
+    The output is pumped into size capped log files by the writer process that is shared by every capture of this
+    Grapejuice process. The writer keeps running after Grapejuice exits, Roblox and the wineserver outlive the CLI.
+    """
+    _name: str
+    _settings: LogCaptureSettings
+    _log_paths: Dict[int, Path]
+    _child_fds: Dict[str, int]
+    _pty_fd: Optional[int]
+    _closed: bool = False
+
+    def __init__(self, name: str, settings: Optional[LogCaptureSettings] = None):
+        self._name = name
+        self._settings = settings or LogCaptureSettings()
+        self._lock = threading.Lock()
+
+        log_dir = paths.logging_directory()
+        log_dir.mkdir(parents=True, exist_ok=True)
+
+        ts = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+        stdout_read, stdout_write = os.pipe()
+        stderr_read, stderr_write = os.pipe()
+        self._pty_fd, tty_fd = os.openpty()
+
+        self._child_fds = {"stdin": tty_fd, "stdout": stdout_write, "stderr": stderr_write}
+        self._log_paths = {
+            stdout_read: log_dir / f"{ts}_{name}_stdout.log",
+            stderr_read: log_dir / f"{ts}_{name}_stderr.log"
+        }
+
+        with _active_captures_lock:
+            _active_captures.add(self)
+
+    @property
+    def stdin(self) -> int:
+        return self._child_fds["stdin"]
+
+    @property
+    def stdout(self) -> int:
+        return self._child_fds["stdout"]
+
+    @property
+    def stderr(self) -> int:
+        return self._child_fds["stderr"]
+
+    def start(self):
+        """
+        Start capturing output. Call this after the process has been spawned, the child has its own copies of the
+        descriptors by then. The writer gets copies of the other ends, after that this capture holds no descriptors.
+        """
+        for fd in self._child_fds.values():
+            os.close(fd)
+
+        self._child_fds.clear()
+
+        (stdout_fd, stdout_path), (stderr_fd, stderr_path) = self._log_paths.items()
+        request = {
+            "name": self._name,
+            "settings": asdict(self._settings),
+            "stdout": str(stdout_path),
+            "stderr": str(stderr_path)
+        }
+
+        if not _send_to_writer(request, [stdout_fd, stderr_fd, self._pty_fd]):
+            log.error(f"Could not start a log writer for {self._name}, capturing in process")
+            self._capture_in_process()
+            return
+
+        self.close()
+
+    def _capture_in_process(self):
+        writers = {fd: RotatingLogWriter(path, self._settings) for fd, path in self._log_paths.items()}
+        self._log_paths = dict()
+
+        def pump():
+            pump_output(writers, self._name)
+            self.close()
+
+        threading.Thread(target=pump, name=f"log-capture/{self._name}", daemon=True).start()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+
+            self._closed = True
+
+            if self._pty_fd is not None:
+                os.close(self._pty_fd)
+                self._pty_fd = None
+
+            # Either the writer has its own copies of these, or the process never started
+            for fd in [*self._child_fds.values(), *self._log_paths]:
+                os.close(fd)
+
+            self._child_fds.clear()
+            self._log_paths.clear()
+
+        with _active_captures_lock:
+            _active_captures.discard(self)
+
+
+def close_log_captures():
+    """
+    Release the descriptors of captures that were never handed to the writer and let the writer know that no more
+    captures are coming, to be used when Grapejuice exits.
+    """
+    with _active_captures_lock:
+        captures = list(_active_captures)
+
+    for capture in captures:
+        capture.close()
+
+    _close_writer_session()
+
+
+def _receive_capture(control: socket.socket) -> Tuple[bytes, List[int]]:
+    fds = array.array("i")
+    message, ancillary_data, _flags, _address = control.recvmsg(
+        MAX_REQUEST_SIZE,
+        socket.CMSG_SPACE(CAPTURE_FD_COUNT * fds.itemsize)
+    )
+
+    for level, kind, data in ancillary_data:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(data[:len(data) - (len(data) % fds.itemsize)])
+
+    return message, list(fds)
+
+
+def _serve(control: socket.socket):
+    pump = OutputPump()
+
+    def receive():
+        try:
+            message, fds = _receive_capture(control)
+
+        except OSError as e:
+            log.error(f"Failed to receive a capture: {type(e).__name__}: {e}")
+            message, fds = b"", []
+
+        if not message:
+            # Grapejuice has exited, the processes it started might still be running
+            pump.unwatch(control.fileno())
+            control.close()
+            return
+
+        try:
+            request = json.loads(message)
+            settings = LogCaptureSettings(**request["settings"])
+            stdout_fd, stderr_fd, pty_fd = fds
+
+        except (ValueError, TypeError, KeyError) as e:
+            log.error(f"Ignoring invalid capture: {type(e).__name__}: {e}")
+
+            for fd in fds:
+                os.close(fd)
+
+            return
+
+        writers = {
+            stdout_fd: RotatingLogWriter(Path(request["stdout"]), settings),
+            stderr_fd: RotatingLogWriter(Path(request["stderr"]), settings)
+        }
+
+        # The pty only has to stay open for as long as the process is around
+        pump.add(request["name"], writers, keep_open=[pty_fd])
+
+    pump.watch(control.fileno(), receive)
+    pump.run()
+
+
+def main(arguments: Optional[Iterable[str]] = None):
+    parser = argparse.ArgumentParser(description="Write the output of the processes Grapejuice starts to log files")
+    parser.add_argument("--control", type=int, required=True, help="Socket that captures are received on")
+    args = parser.parse_args(arguments)
+
+    _serve(socket.socket(fileno=args.control))
+
+
+if __name__ == "__main__":
+    main()
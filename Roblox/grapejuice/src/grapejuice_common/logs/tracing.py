@@ -0,0 +1,272 @@
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+from typing import Optional, Dict, Any, IO, TypeVar
+
+from grapejuice_common import paths
+
+TRACE_ENVIRONMENT_KEY = "GRAPEJUICE_TRACE"
+TRACE_FORMAT_JSON_LINES = "jsonl"
+TRACE_FORMAT_CHROME = "chrome"
+
+TracedFunction = TypeVar("TracedFunction")
+
+# Translates perf_counter readings to wall clock time, so traces of different runs can be lined up
+_EPOCH_OFFSET = time.time() - time.perf_counter()
+
+
+def _microseconds(perf_counter: float) -> int:
+    return int((perf_counter + _EPOCH_OFFSET) * 1_000_000)
+
+
+def trace_format_from_environment() -> Optional[str]:
+    """
+    Read the trace format from the environment, GRAPEJUICE_TRACE=chrome writes the Chrome trace event format and any
+    other truthy value writes JSON lines.
+    :return: The trace format, or None when tracing is disabled
+    """
+    value = os.environ.get(TRACE_ENVIRONMENT_KEY, "").strip().lower()
+
+    if value in ("", "0", "false", "no", "off"):
+        return None
+
+    if value == TRACE_FORMAT_CHROME:
+        return TRACE_FORMAT_CHROME
+
+    return TRACE_FORMAT_JSON_LINES
+
+
+class Tracer:
+    """
+    Writes finished spans to a trace file, one event per line.
+    The Chrome format is written as a JSON array that is only terminated when the tracer is closed. chrome://tracing
+    and Perfetto accept unterminated arrays, so the trace of a crashed process can still be loaded.
+    """
+    _path: Path
+    _format: str
+    _app_name: str
+    _fp: Optional[IO[str]]
+
+    def __init__(self, path: Path, trace_format: str, app_name: str):
+        self._path = path
+        self._format = trace_format
+        self._app_name = app_name
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._fp = path.open("w", encoding="UTF-8")
+
+        if trace_format == TRACE_FORMAT_CHROME:
+            self._fp.write("[\n")
+            self._fp.flush()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def record(self, name: str, start: float, end: float, *, parent: Optional[str], depth: int, args: Dict[str, Any]):
+        if self._format == TRACE_FORMAT_CHROME:
+            event = {
+                "name": name,
+                "cat": self._app_name,
+                "ph": "X",
+                "ts": _microseconds(start),
+                "dur": _microseconds(end) - _microseconds(start),
+                "pid": self._pid,
+                "tid": threading.get_ident(),
+                "args": args
+            }
+            line = json.dumps(event, default=str) + ",\n"
+
+        else:
+            event = {
+                "name": name,
+                "parent": parent,
+                "depth": depth,
+                "start_us": _microseconds(start),
+                "duration_us": _microseconds(end) - _microseconds(start),
+                "pid": self._pid,
+                "thread": threading.current_thread().name,
+                "args": args
+            }
+            line = json.dumps(event, default=str) + "\n"
+
+        with self._lock:
+            if self._fp is None:
+                return
+
+            # Written right away, so the trace survives Grapejuice being killed together with Roblox
+            self._fp.write(line)
+            self._fp.flush()
+
+    def close(self):
+        with self._lock:
+            if self._fp is None:
+                return
+
+            if self._format == TRACE_FORMAT_CHROME:
+                # A metadata event without a trailing comma, so the array is valid JSON
+                metadata = {"name": "process_name", "ph": "M", "pid": self._pid, "args": {"name": self._app_name}}
+                self._fp.write(json.dumps(metadata) + "\n]\n")
+
+            self._fp.close()
+            self._fp = None
+
+
+_tracer: Optional[Tracer] = None
+
+# A context variable instead of a thread local, so work that is handed to another thread with
+# contextvars.copy_context().run is recorded as a child of the span that handed it over
+_current_span: contextvars.ContextVar = contextvars.ContextVar("grapejuice_current_span", default=None)
+
+
+class _Span:
+    __slots__ = ("_tracer", "_name", "_args", "_start", "_parent", "_depth", "_token")
+
+    def __init__(self, tracer: Tracer, name: str, args: Dict[str, Any]):
+        self._tracer = tracer
+        self._name = name
+        self._args = args
+        self._start = 0.0
+        self._parent: Optional["_Span"] = None
+        self._depth = 0
+        self._token: Optional[contextvars.Token] = None
+
+    def set(self, key: str, value: Any):
+        self._args[key] = value
+
+    def __enter__(self):
+        self._parent = _current_span.get()
+        self._depth = 0 if self._parent is None else self._parent._depth + 1
+        self._token = _current_span.set(self)
+
+        self._start = time.perf_counter()
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end = time.perf_counter()
+
+        try:
+            _current_span.reset(self._token)
+
+        except ValueError:
+            # Exited in another context than the one it was entered in
+            _current_span.set(self._parent)
+
+        if exc_type is not None:
+            self._args["error"] = exc_type.__name__
+
+        self._tracer.record(
+            self._name,
+            self._start,
+            end,
+            parent=None if self._parent is None else self._parent._name,
+            depth=self._depth,
+            args=self._args
+        )
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def tracing_enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, **args):
+    """
+    Time a block of code. Spans opened inside the block are recorded as its children.
+    When tracing is disabled a shared no-op context manager is returned, so spans cost next to nothing.
+    :param name: Name of the span
+    :param args: Extra information to store with the span
+    :return: A context manager, its set method adds information to the span while it is open
+    """
+    tracer = _tracer
+
+    if tracer is None:
+        return _NULL_SPAN
+
+    return _Span(tracer, name, args)
+
+
+def traced(name: Optional[str] = None):
+    """
+    Record every call of the decorated function as a span
+    :param name: Name of the span, defaults to the qualified name of the function
+    """
+
+    def decorator(func: TracedFunction) -> TracedFunction:
+        span_name = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+
+            if tracer is None:
+                return func(*args, **kwargs)
+
+            with _Span(tracer, span_name, dict()):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def configure_tracing(app_name: str, trace_format: Optional[str] = None, path: Optional[Path] = None) -> Optional[Path]:
+    """
+    Start writing a trace when tracing is enabled through the environment. Calling this more than once is harmless.
+    :param app_name: Name of the application, used for the trace file name
+    :param trace_format: Overrides the format from the environment
+    :param path: Overrides the location of the trace file
+    :return: Path to the trace file, or None when tracing is disabled
+    """
+    global _tracer
+
+    if _tracer is not None:
+        return _tracer.path
+
+    trace_format = trace_format or trace_format_from_environment()
+    if trace_format is None:
+        return None
+
+    if path is None:
+        datetime_now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        extension = "json" if trace_format == TRACE_FORMAT_CHROME else "jsonl"
+        path = paths.logging_directory() / f"{datetime_now}_{app_name}.trace.{extension}"
+
+    _tracer = Tracer(path, trace_format, app_name)
+    atexit.register(close_tracing)
+
+    return path
+
+
+def close_tracing():
+    global _tracer
+
+    tracer = _tracer
+    _tracer = None
+
+    if tracer is not None:
+        tracer.close()
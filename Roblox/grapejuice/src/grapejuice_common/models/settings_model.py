@@ -19,6 +19,10 @@ class SettingsModel(pydantic_v1.BaseModel):
     wineprefixes: List[WineprefixConfigurationModel] = []
     unsupported_settings: Dict[str, Any] = {}
     performed_first_time_setup = False
+    fast_flag_extraction_timeout: float = 120.0
+    roblox_background_updates: bool = False
+    roblox_background_update_max_load: float = 0.5
+    download_cache_max_size_mb: int = 1024
 
     def update_version(self) -> bool:
         did_update = self.version != current_version
@@ -43,12 +43,20 @@ class WineprefixConfigurationModel(pydantic_v1.BaseModel):
     use_feral_gamemode: bool = False
     use_enable_esync: bool = False
     use_enable_fsync: bool = False 
+    persistent_wineserver: bool = False
+    offline_registry_edits: bool = True
+    wineserver_linger_time: int = 600
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backup_count: int = 2
+    compress_logs: bool = False
     enable_winedebug: bool = False
     winedebug_string: str = ""
     roblox_release_channel: RobloxReleaseChannel = RobloxReleaseChannel.LIVE
     roblox_renderer: str = RobloxRenderer.Undetermined.value
     roblox_set_target_fps: bool = False
     roblox_scheduler_target_fps: int = 144
+    roblox_direct_player_launch: bool = False
+    is_template: bool = False
     env: Dict[str, str] = {}
     sanitize_environment: bool = False
     env_passthrough: List[str] = DEFAULT_ENV_PASSTHROUGH
@@ -189,6 +189,30 @@ def fast_flag_cache_location() -> Path:
     return grapejuice_cache_directory() / "fast_flags.json"
 
 
+def fast_flag_dump_cache_directory() -> Path:
+    return grapejuice_cache_directory() / "fast_flag_dumps"
+
+
+def download_cache_directory() -> Path:
+    return grapejuice_cache_directory() / "downloads"
+
+
+def versions_hash_index_location() -> Path:
+    return grapejuice_cache_directory() / "versions_hashes.json"
+
+
+def roblox_version_cache_location() -> Path:
+    return grapejuice_cache_directory() / "roblox_versions.json"
+
+
+def registry_snapshots_directory() -> Path:
+    return grapejuice_cache_directory() / "registry_snapshots"
+
+
+def roblox_update_locks_directory() -> Path:
+    return grapejuice_cache_directory() / "update_locks"
+
+
 # TODO: Add method to extract this data
 path_resolve_record = dict()
 
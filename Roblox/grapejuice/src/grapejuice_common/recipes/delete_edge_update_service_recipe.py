@@ -3,15 +3,32 @@ import logging
 from grapejuice_common import paths
 from grapejuice_common.recipes.recipe import Recipe
 from grapejuice_common.wine.registry_file import RegistryFile
+from grapejuice_common.wine.registry_query_cache import RegistryQueryCache
 from grapejuice_common.wine.wineprefix import Wineprefix
 
 log = logging.getLogger(__name__)
 
 
 def _do_not_have_edge_update_service(prefix: Wineprefix):
-    system_hive = RegistryFile(prefix.paths.system_registry_hive)
+    edge_update_path = r"System\\CurrentControlSet\\Services\\edgeupdate"
+    edge_update_m_path = r"System\\CurrentControlSet\\Services\\edgeupdatem"
+
+    def query(system_hive: RegistryFile) -> bool:
+        keys = system_hive.find_keys([edge_update_path, edge_update_m_path])
+        edge_update = keys[edge_update_path]
+        edge_update_m = keys[edge_update_m_path]
+
+        log.info(f"Edge update: {repr(edge_update)}")
+        log.info(f"Edge update M: {repr(edge_update_m)}")
+
+        not_have_edge_update = edge_update is None
+        not_have_edge_update_m = edge_update_m is None
+
+        return not_have_edge_update and not_have_edge_update_m
+
     try:
-        system_hive.load()
+        return RegistryQueryCache(prefix.paths.registry_query_cache) \
+            .query(prefix.paths.system_registry_hive, "do_not_have_edge_update_service", query)
 
     except FileNotFoundError as e:
         log.error("Could not load System Hive")
@@ -19,17 +36,6 @@ def _do_not_have_edge_update_service(prefix: Wineprefix):
 
         return True
 
-    edge_update = system_hive.find_key(r"System\\CurrentControlSet\\Services\\edgeupdate")
-    edge_update_m = system_hive.find_key(r"System\\CurrentControlSet\\Services\\edgeupdatem")
-
-    log.info(f"Edge update: {repr(edge_update)}")
-    log.info(f"Edge update M: {repr(edge_update_m)}")
-
-    not_have_edge_update = edge_update is None
-    not_have_edge_update_m = edge_update_m is None
-
-    return not_have_edge_update and not_have_edge_update_m
-
 
 class DeleteEdgeUpdateServiceRecipe(Recipe):
     def __init__(self):
@@ -42,7 +48,8 @@ class DeleteEdgeUpdateServiceRecipe(Recipe):
         delete_edgeupdate_service_path = edge_webview_directory / "delete_edgeupdate_service.reg"
         delete_edgeupdatem_service_path = edge_webview_directory / "delete_edgeupdatem_service.reg"
 
-        prefix.core_control.load_registry_file(delete_edgeupdate_service_path)
-        prefix.core_control.load_registry_file(delete_edgeupdatem_service_path)
+        with prefix.core_control.registry_transaction() as transaction:
+            transaction.add_file(delete_edgeupdate_service_path)
+            transaction.add_file(delete_edgeupdatem_service_path)
 
-        prefix.core_control.kill_wine_server()
+        prefix.core_control.shutdown_wine_server()
@@ -1,4 +1,3 @@
-import io
 import json
 import logging
 import os
@@ -8,11 +7,10 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple, Any
 
-import requests
-
 from grapejuice_common import variables
 from grapejuice_common.errors import PresentableError
 from grapejuice_common.recipes.recipe import Recipe
+from grapejuice_common.util.download_cache import cached_file
 from grapejuice_common.wine.wineprefix import Wineprefix
 
 log = logging.getLogger(__name__)
@@ -205,14 +203,11 @@ class InstallDXVKRecipe(Recipe):
     def _make_in(self, prefix: Wineprefix):
         release = variables.current_dxvk_release()
 
-        response = requests.get(release.download_url)
-        response.raise_for_status()
-
         prefix.paths.dxvk_directory.mkdir(parents=True, exist_ok=True)
 
-        with io.BytesIO(response.content) as fp:
-            with tarfile.open(fileobj=fp, mode="r:gz") as tf:
-                tf.extractall(prefix.paths.dxvk_directory)
+        # The archive is read straight from the download cache
+        with tarfile.open(cached_file(release.download_url), mode="r:gz") as tf:
+            tf.extractall(prefix.paths.dxvk_directory)
 
         versioned_dxvk_directory = prefix.paths.dxvk_directory / f"dxvk-{release.version}"
         if not versioned_dxvk_directory.exists():
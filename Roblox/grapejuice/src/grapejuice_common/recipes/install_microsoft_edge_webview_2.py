@@ -1,6 +1,5 @@
-import requests
-
 from grapejuice_common.recipes.recipe import Recipe
+from grapejuice_common.util.download_cache import cached_download
 from grapejuice_common.wine.wineprefix import Wineprefix
 
 
@@ -14,11 +13,9 @@ class InstallMicrosoftEdgeWebview2Recipe(Recipe):
         download_location = prefix.paths.edge_webview_directory
         download_location.mkdir(exist_ok=True, parents=True)
 
-        response = requests.get("https://go.microsoft.com/fwlink/p/?LinkId=2124703", allow_redirects=True)
-        response.raise_for_status()
-
-        installer_location = download_location / "EvergreenBootstrapper.exe"
-        with installer_location.open("wb+") as fp:
-            fp.write(response.content)
+        installer_location = cached_download(
+            "https://go.microsoft.com/fwlink/p/?LinkId=2124703",
+            download_location / "EvergreenBootstrapper.exe"
+        )
 
         prefix.core_control.run_exe(installer_location)
@@ -3,15 +3,32 @@ import logging
 from grapejuice_common import paths
 from grapejuice_common.recipes.recipe import Recipe
 from grapejuice_common.wine.registry_file import RegistryFile
+from grapejuice_common.wine.registry_query_cache import RegistryQueryCache
 from grapejuice_common.wine.wineprefix import Wineprefix
 
 log = logging.getLogger(__name__)
 
 
 def _have_edge_update_service(prefix: Wineprefix):
-    system_hive = RegistryFile(prefix.paths.system_registry_hive)
+    edge_update_path = r"System\\CurrentControlSet\\Services\\edgeupdate"
+    edge_update_m_path = r"System\\CurrentControlSet\\Services\\edgeupdatem"
+
+    def query(system_hive: RegistryFile) -> bool:
+        keys = system_hive.find_keys([edge_update_path, edge_update_m_path])
+        edge_update = keys[edge_update_path]
+        edge_update_m = keys[edge_update_m_path]
+
+        log.info(f"Edge update: {repr(edge_update)}")
+        log.info(f"Edge update M: {repr(edge_update_m)}")
+
+        have_edge_update = edge_update is not None
+        have_edge_update_m = edge_update_m is not None
+
+        return have_edge_update and have_edge_update_m
+
     try:
-        system_hive.load()
+        return RegistryQueryCache(prefix.paths.registry_query_cache) \
+            .query(prefix.paths.system_registry_hive, "have_edge_update_service", query)
 
     except FileNotFoundError as e:
         log.error("Could not load System Hive")
@@ -19,17 +36,6 @@ def _have_edge_update_service(prefix: Wineprefix):
 
         return False
 
-    edge_update = system_hive.find_key(r"System\\CurrentControlSet\\Services\\edgeupdate")
-    edge_update_m = system_hive.find_key(r"System\\CurrentControlSet\\Services\\edgeupdatem")
-
-    log.info(f"Edge update: {repr(edge_update)}")
-    log.info(f"Edge update M: {repr(edge_update_m)}")
-
-    have_edge_update = edge_update is not None
-    have_edge_update_m = edge_update_m is not None
-
-    return have_edge_update and have_edge_update_m
-
 
 class RestoreEdgeUpdateServiceRecipe(Recipe):
     def __init__(self):
@@ -42,5 +48,6 @@ class RestoreEdgeUpdateServiceRecipe(Recipe):
         edgeupdate_service_path = edge_webview_directory / "edgeupdate_service.reg"
         edgeupdatem_service_path = edge_webview_directory / "edgeupdatem_service.reg"
 
-        prefix.core_control.load_registry_file(edgeupdate_service_path)
-        prefix.core_control.load_registry_file(edgeupdatem_service_path)
+        with prefix.core_control.registry_transaction() as transaction:
+            transaction.add_file(edgeupdate_service_path)
+            transaction.add_file(edgeupdatem_service_path)
@@ -1,4 +1,3 @@
-import io
 import logging
 import os
 import re
@@ -14,6 +13,7 @@ from packaging import version
 
 from grapejuice_common import variables, paths
 from grapejuice_common.logs.log_util import log_function
+from grapejuice_common.util import download_file
 
 LOG = logging.getLogger(__name__)
 
@@ -108,9 +108,11 @@ class SourceUpdateInformationProvider(UpdateInformationProvider):
         LOG.info(f"Temporary files path at: {tmp_path}")
         update_package_path = tmp_path / "update"
 
-        response = requests.get(variables.git_source_tarball())
-        if response.status_code < 200 or response.status_code > 299:
-            raise UpdateError(f"Received HTTP error {response.status_code} from GitLab")
+        try:
+            tarball_path = download_file(variables.git_source_tarball(), tmp_path / "update.tar.gz")
+
+        except requests.HTTPError as e:
+            raise UpdateError(f"Received HTTP error {e.response.status_code} from GitLab") from e
 
         if update_package_path.exists():
             LOG.warning(f"Removing existing update package: {update_package_path}")
@@ -121,8 +123,7 @@ class SourceUpdateInformationProvider(UpdateInformationProvider):
             LOG.debug(f"Creating update package directory: {update_package_path}")
             update_package_path.mkdir(parents=True, exist_ok=True)
 
-        fp = io.BytesIO(response.content)
-        with tarfile.open(fileobj=fp) as tar:
+        with tarfile.open(tarball_path) as tar:
             tar.extractall(update_package_path)
 
         cwd = os.getcwd()
@@ -134,10 +135,6 @@ class SourceUpdateInformationProvider(UpdateInformationProvider):
         subprocess.check_call([sys.executable, "./install.py"])
         os.chdir(cwd)
 
-        fp.close()
-        del fp
-        del response
-
         shutil.rmtree(tmp_path)
 
 
@@ -18,16 +18,74 @@ def prepare_uri(uri):
         return None
 
 
-def download_file(url, target_path: Path):
-    import requests
+def download_file(url, target_path: Path, **kwargs):
+    """
+    Stream a file to disk, see grapejuice_common.util.download.download_file for the options
+    """
+    from grapejuice_common.util.download import download_file as streaming_download
+
+    return streaming_download(url, target_path, **kwargs)
+
+
+def atomic_write(target_path: Path, data: bytes):
+    """
+    Write a file by writing a temporary file next to it and renaming that over the target, so the target is never
+    left half written
+    :param target_path: The file to write
+    :param data: The new contents of the file
+    """
+    import tempfile
+
+    try:
+        mode = os.stat(target_path).st_mode & 0o777
+
+    except FileNotFoundError:
+        mode = 0o644
+
+    fd, temporary_path = tempfile.mkstemp(dir=target_path.parent, prefix=f".{target_path.name}.")
+
+    try:
+        # mkstemp creates files that only the owner can read
+        os.fchmod(fd, mode)
+
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(data)
+            fp.flush()
+            os.fsync(fp.fileno())
+
+        os.replace(temporary_path, target_path)
+
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+@contextmanager
+def file_lock(lock_path: Path, blocking: bool = True):
+    """
+    Hold an exclusive lock for the duration of the block, shared with other Grapejuice processes. Locks are taken on a
+    separate lock file, because files written with atomic_write are replaced instead of written to.
+    :param lock_path: The lock file, it is created when it does not exist
+    :param blocking: Wait for the lock when another process holds it, instead of giving up right away
+    :return: Whether the lock is held, this is always True when blocking
+    """
+    import fcntl
+
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with lock_path.open("ab") as fp:
+        try:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
 
-    response = requests.get(url)
-    response.raise_for_status()
+        except BlockingIOError:
+            yield False
+            return
 
-    with open(target_path, "wb+") as fp:
-        fp.write(response.content)
+        try:
+            yield True
 
-    return target_path
+        finally:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
 
 
 def xdg_open(*args):
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+import requests
+
+from grapejuice_common.errors import DownloadVerificationFailed
+
+LOG = logging.getLogger(__name__)
+
+# Connect and read timeouts, the read timeout applies to every chunk and not to the whole download
+REQUEST_TIMEOUT = (10, 60)
+CHUNK_SIZE = 256 * 1024
+MAX_ATTEMPTS = 4
+
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+CONTENT_RANGE_PTN = re.compile(r"^bytes (\d+)-\d+/")
+
+_RETRYABLE_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError
+)
+
+
+class _IncompleteTransfer(requests.ConnectionError):
+    pass
+
+
+def partial_path(target_path: Path) -> Path:
+    return target_path.parent / f".{target_path.name}.part"
+
+
+def _partial_metadata_path(target_path: Path) -> Path:
+    return target_path.parent / f".{target_path.name}.part.json"
+
+
+def _remove(path: Path):
+    try:
+        os.remove(path)
+
+    except FileNotFoundError:
+        pass
+
+
+def _resume_validator(response: requests.Response) -> Optional[str]:
+    # Weak ETags can not be used in If-Range
+    etag = response.headers.get("ETag", None)
+    if etag and not etag.startswith("W/"):
+        return etag
+
+    return response.headers.get("Last-Modified", None)
+
+
+def _content_range_start(response: requests.Response) -> Optional[int]:
+    match = CONTENT_RANGE_PTN.match(response.headers.get("Content-Range", ""))
+
+    return int(match.group(1)) if match else None
+
+
+def _resumable_offset(url: str, target_path: Path) -> Tuple[int, Optional[str]]:
+    """
+    Find out how much of an earlier attempt can be kept
+    :return: Number of bytes that were downloaded before and the validator to resume them with
+    """
+    part = partial_path(target_path)
+
+    try:
+        with _partial_metadata_path(target_path).open("r", encoding="UTF-8") as fp:
+            metadata = json.load(fp)
+
+        size = os.stat(part).st_size
+
+    except (FileNotFoundError, ValueError):
+        return 0, None
+
+    if metadata.get("url", None) != url or not metadata.get("validator", None):
+        return 0, None
+
+    return size, metadata["validator"]
+
+
+def _transfer(url: str, target_path: Path, progress: Optional[ProgressCallback], chunk_size: int) -> Optional[str]:
+    part = partial_path(target_path)
+    offset, validator = _resumable_offset(url, target_path)
+
+    # Compressed responses would make byte offsets meaningless
+    headers = {"Accept-Encoding": "identity"}
+
+    if offset > 0:
+        LOG.info(f"Resuming download of {url} at {offset} bytes")
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = validator
+
+    with requests.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT, allow_redirects=True) as response:
+        if response.status_code == 416 and offset > 0:
+            # The server has nothing after the offset, which means the earlier attempt got everything
+            if response.headers.get("Content-Range", "") == f"bytes */{offset}":
+                return validator
+
+            _remove(part)
+            raise _IncompleteTransfer(f"Could not resume {url}, starting over")
+
+        response.raise_for_status()
+
+        if response.status_code == 206:
+            start = _content_range_start(response)
+
+            if start != offset:
+                # Appending a range that does not start where the partial file ends would corrupt it
+                _remove(part)
+                _remove(_partial_metadata_path(target_path))
+                raise _IncompleteTransfer(f"Server resumed {url} at {start} instead of {offset} bytes, starting over")
+
+        else:
+            # The server ignored the range or the file has changed, either way everything is sent again
+            offset = 0
+
+        content_length = response.headers.get("Content-Length", None)
+        total = offset + int(content_length) if content_length is not None else None
+
+        validator = _resume_validator(response)
+
+        with _partial_metadata_path(target_path).open("w", encoding="UTF-8") as fp:
+            json.dump({"url": url, "validator": validator}, fp)
+
+        with part.open("ab" if offset > 0 else "wb") as fp:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                fp.write(chunk)
+                offset += len(chunk)
+
+                if progress is not None:
+                    progress(offset, total)
+
+            fp.flush()
+            os.fsync(fp.fileno())
+
+    if total is not None and offset < total:
+        raise _IncompleteTransfer(f"Download of {url} stopped at {offset} of {total} bytes")
+
+    return validator
+
+
+def file_digest(path: Path, algorithm: str = "sha256", chunk_size: int = CHUNK_SIZE) -> str:
+    digest = hashlib.new(algorithm)
+
+    with path.open("rb") as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def fetch_file(
+    url: str,
+    target_path: Path,
+    *,
+    sha256: Optional[str] = None,
+    progress: Optional[ProgressCallback] = None,
+    chunk_size: int = CHUNK_SIZE,
+    max_attempts: int = MAX_ATTEMPTS
+) -> Tuple[Path, Optional[str]]:
+    """
+    Same as download_file, but also returns the ETag or Last-Modified value of the downloaded file, which can be
+    used to ask the server whether the file has changed since
+    """
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+    part = partial_path(target_path)
+    validator = None
+
+    for attempt in range(1, max_attempts + 1):
+        try:
+            validator = _transfer(url, target_path, progress, chunk_size)
+            break
+
+        except _RETRYABLE_ERRORS as e:
+            if attempt >= max_attempts:
+                raise
+
+            LOG.warning(f"Download of {url} was interrupted, retrying ({attempt}/{max_attempts}): {e}")
+
+    if sha256 is not None:
+        actual = file_digest(part)
+
+        if actual.lower() != sha256.lower():
+            # Resuming a corrupted file would only make it worse
+            _remove(part)
+            _remove(_partial_metadata_path(target_path))
+
+            raise DownloadVerificationFailed(url, sha256, actual)
+
+    os.chmod(part, 0o644)
+    os.replace(part, target_path)
+    _remove(_partial_metadata_path(target_path))
+
+    return target_path, validator
+
+
+def download_file(
+    url: str,
+    target_path: Path,
+    *,
+    sha256: Optional[str] = None,
+    progress: Optional[ProgressCallback] = None,
+    chunk_size: int = CHUNK_SIZE,
+    max_attempts: int = MAX_ATTEMPTS
+) -> Path:
+    """
+    Download a file without holding it in memory. The file is written to a partial file next to the target, which is
+    renamed over the target once it is complete. Interrupted transfers are resumed with Range requests, also by later
+    calls for the same URL and target.
+    :param url: The URL to download
+    :param target_path: Where to put the file
+    :param sha256: Expected SHA-256 digest of the file, as hex
+    :param progress: Called with the number of bytes downloaded and the total size, which might be None
+    :param chunk_size: Number of bytes to read at a time
+    :param max_attempts: How often the transfer is tried before giving up
+    :return: The target path
+    """
+    path, _ = fetch_file(
+        url,
+        target_path,
+        sha256=sha256,
+        progress=progress,
+        chunk_size=chunk_size,
+        max_attempts=max_attempts
+    )
+
+    return path
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict, replace
+from pathlib import Path
+from typing import Dict, Optional
+
+import requests
+
+from grapejuice_common import paths
+from grapejuice_common.util import atomic_write, file_lock
+from grapejuice_common.util.download import fetch_file, file_digest, REQUEST_TIMEOUT
+
+LOG = logging.getLogger(__name__)
+
+# Files are not checked with the server again for this long, so setting up a batch of prefixes does one request
+FRESH_FOR = 10 * 60
+DEFAULT_MAX_SIZE_MB = 1024
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    digest: str
+    size: int
+    validator: Optional[str]
+    validated_at: float
+    last_used: float
+
+
+_index_lock = threading.Lock()
+
+
+def _index_path() -> Path:
+    return paths.download_cache_directory() / "index.json"
+
+
+@contextmanager
+def _locked_index():
+    # Other Grapejuice processes read and write the index as well
+    with _index_lock, file_lock(paths.download_cache_directory() / "index.lock"):
+        yield
+
+
+def _objects_directory() -> Path:
+    return paths.download_cache_directory() / "objects"
+
+
+def _object_path(digest: str) -> Path:
+    return _objects_directory() / digest
+
+
+def _incoming_path(url: str) -> Path:
+    # Named after the URL, so an interrupted download is resumed by the next attempt
+    return paths.download_cache_directory() / "incoming" / hashlib.sha256(url.encode("UTF-8")).hexdigest()
+
+
+def _load_index() -> Dict[str, CacheEntry]:
+    try:
+        with _index_path().open("r", encoding="UTF-8") as fp:
+            return {url: CacheEntry(**entry) for url, entry in json.load(fp).items()}
+
+    except FileNotFoundError:
+        return dict()
+
+    except (ValueError, TypeError) as e:
+        LOG.warning(f"Ignoring invalid download cache index: {type(e).__name__}: {e}")
+        return dict()
+
+
+def _save_index(index: Dict[str, CacheEntry]):
+    path = _index_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    atomic_write(path, json.dumps({url: asdict(entry) for url, entry in index.items()}, indent=2).encode("UTF-8"))
+
+
+def _remove_object(digest: str):
+    LOG.info(f"Removing {digest} from the download cache")
+
+    try:
+        os.remove(_object_path(digest))
+
+    except FileNotFoundError:
+        pass
+
+
+def _update_entry(url: str, entry: CacheEntry, max_size: int, incoming: Optional[Path] = None):
+    """
+    Store the entry for a URL in the index
+    :param url: The URL of the file
+    :param entry: The new entry
+    :param max_size: Files are evicted until the cache fits in this many bytes
+    :param incoming: A download to move into the objects directory, this happens under the lock so it is never
+    mistaken for an orphan
+    """
+    with _locked_index():
+        index = _load_index()
+
+        if incoming is not None:
+            object_path = _object_path(entry.digest)
+            object_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(incoming, object_path)
+
+        previous = index.get(url, None)
+        index[url] = entry
+
+        if previous is not None and previous.digest != entry.digest and \
+                not any(other.digest == previous.digest for other in index.values()):
+            # The file behind the URL has changed, nothing refers to the old one anymore
+            _remove_object(previous.digest)
+
+        _evict(index, max_size, keep=entry.digest)
+        _save_index(index)
+
+
+def _remove_orphans(index: Dict[str, CacheEntry]):
+    referenced = {entry.digest for entry in index.values()}
+
+    try:
+        object_paths = list(_objects_directory().iterdir())
+
+    except FileNotFoundError:
+        return
+
+    for object_path in object_paths:
+        if object_path.name not in referenced:
+            _remove_object(object_path.name)
+
+
+def _evict(index: Dict[str, CacheEntry], max_size: int, keep: str):
+    """
+    Remove files that are not in the index, then the least recently used files until the cache fits in max_size.
+    Several URLs can share a file.
+    """
+    _remove_orphans(index)
+
+    last_used_by_digest: Dict[str, float] = dict()
+    size_by_digest: Dict[str, int] = dict()
+
+    for entry in index.values():
+        last_used_by_digest[entry.digest] = max(entry.last_used, last_used_by_digest.get(entry.digest, 0))
+        size_by_digest[entry.digest] = entry.size
+
+    total_size = sum(size_by_digest.values())
+
+    for digest in sorted(last_used_by_digest, key=lambda d: last_used_by_digest[d]):
+        if total_size <= max_size:
+            break
+
+        if digest == keep:
+            continue
+
+        _remove_object(digest)
+        total_size -= size_by_digest[digest]
+
+        for url in [url for url, entry in index.items() if entry.digest == digest]:
+            del index[url]
+
+
+def _max_size() -> int:
+    from grapejuice_common.features.settings import current_settings
+
+    size_mb = DEFAULT_MAX_SIZE_MB
+
+    if current_settings:
+        size_mb = current_settings.get_model().download_cache_max_size_mb
+
+    return size_mb * 1024 * 1024
+
+
+def _still_valid(url: str, entry: CacheEntry) -> bool:
+    if time.time() - entry.validated_at < FRESH_FOR:
+        return True
+
+    if not entry.validator:
+        return False
+
+    is_etag = entry.validator.startswith("\"")
+    header = "If-None-Match" if is_etag else "If-Modified-Since"
+
+    try:
+        with requests.get(url, headers={header: entry.validator}, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            return response.status_code == 304
+
+    except requests.RequestException as e:
+        LOG.warning(f"Could not revalidate {url}, using the cached file: {type(e).__name__}: {e}")
+        return True
+
+
+def cached_file(url: str, sha256: Optional[str] = None) -> Path:
+    """
+    Get a downloaded file from the cache that is shared by every prefix, downloading it when it is not cached or when
+    the server has a newer version. The returned file belongs to the cache and should not be changed.
+    :param url: The URL of the file
+    :param sha256: Expected SHA-256 digest of the file, as hex
+    :return: Path to the file in the cache
+    """
+    max_size = _max_size()
+    now = time.time()
+
+    with _locked_index():
+        entry = _load_index().get(url, None)
+
+    if entry is not None and (sha256 is None or entry.digest == sha256.lower()):
+        object_path = _object_path(entry.digest)
+
+        if object_path.exists() and _still_valid(url, entry):
+            LOG.info(f"Using cached download of {url}")
+
+            validated_at = entry.validated_at if now - entry.validated_at < FRESH_FOR else now
+            _update_entry(url, replace(entry, validated_at=validated_at, last_used=now), max_size)
+
+            return object_path
+
+    incoming, validator = fetch_file(url, _incoming_path(url), sha256=sha256)
+
+    digest = file_digest(incoming)
+    size = os.stat(incoming).st_size
+
+    _update_entry(
+        url,
+        CacheEntry(digest=digest, size=size, validator=validator, validated_at=now, last_used=now),
+        max_size,
+        incoming=incoming
+    )
+
+    return _object_path(digest)
+
+
+def cached_download(url: str, target_path: Path, sha256: Optional[str] = None) -> Path:
+    """
+    Like download_file, but the file comes from the download cache when possible
+    :param url: The URL of the file
+    :param target_path: Where to put a copy of the file
+    :param sha256: Expected SHA-256 digest of the file, as hex
+    :return: The target path
+    """
+    source = cached_file(url, sha256=sha256)
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # A copy instead of a link, the copy might be changed by whatever runs it
+    fd, temporary_path = tempfile.mkstemp(dir=target_path.parent, prefix=f".{target_path.name}.")
+    os.close(fd)
+
+    try:
+        shutil.copyfile(source, temporary_path)
+        os.chmod(temporary_path, 0o644)
+        os.replace(temporary_path, target_path)
+
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+    return target_path
@@ -0,0 +1,162 @@
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import select
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+LOG = logging.getLogger(__name__)
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+# How often the file is checked when no notification arrives. Inotify does not work on every file system, so this is
+# the fallback that keeps the wait going.
+WATCHED_POLL_INTERVAL = 1.0
+UNWATCHED_POLL_INTERVAL = 0.1
+
+_libc = None
+
+
+def _load_libc():
+    global _libc
+
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+
+    return _libc
+
+
+class DirectoryWatch:
+    """
+    Minimal inotify watch on a single directory. Only tells that something happened, the caller checks what.
+    """
+    _fd: int
+
+    def __init__(self, directory: Path, mask: int = WATCH_MASK):
+        libc = _load_libc()
+
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        if libc.inotify_add_watch(self._fd, os.fsencode(str(directory)), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, os.strerror(errno), str(directory))
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Wait for an event
+        :param timeout: Seconds to wait at most
+        :return: Whether events arrived
+        """
+        readable, _, _ = select.select([self._fd], [], [], max(timeout, 0))
+
+        if not readable:
+            return False
+
+        # The events are not parsed, just drained
+        try:
+            while os.read(self._fd, 4096):
+                pass
+
+        except BlockingIOError:
+            pass
+
+        return True
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def is_complete_json_document(path: Path) -> bool:
+    """
+    Check whether a file contains a whole JSON object, a file that is still being written fails to parse
+    :param path: The file to check
+    :return: Whether the file exists and contains a JSON object
+    """
+    try:
+        with path.open("rb") as fp:
+            data = fp.read()
+
+    except FileNotFoundError:
+        return False
+
+    if not data.strip():
+        return False
+
+    try:
+        return isinstance(json.loads(data), dict)
+
+    except ValueError:
+        return False
+
+
+def wait_for_file(
+    path: Path,
+    is_complete: Callable[[Path], bool],
+    timeout: float,
+    should_abort: Optional[Callable[[], bool]] = None
+) -> bool:
+    """
+    Wait until a file is complete. The directory of the file is watched with inotify when possible, the file is polled
+    when it can not be watched.
+    :param path: The file to wait for
+    :param is_complete: Checks whether the file is complete
+    :param timeout: Seconds to wait at most
+    :param should_abort: Checked along with the file, waiting stops when it returns True
+    :return: Whether the file is complete, False when the wait timed out or was aborted
+    """
+    deadline = time.monotonic() + timeout
+    watch = None
+    can_watch = True
+
+    try:
+        while True:
+            # The directory might only be created after the wait has started
+            if watch is None and can_watch and path.parent.is_dir():
+                try:
+                    watch = DirectoryWatch(path.parent)
+
+                except (OSError, AttributeError) as e:
+                    # AttributeError: the C library has no inotify
+                    LOG.debug(f"Cannot watch {path.parent}, falling back to polling: {type(e).__name__}: {e}")
+                    can_watch = False
+
+            if is_complete(path):
+                return True
+
+            if should_abort is not None and should_abort():
+                return False
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+
+            if watch is None:
+                time.sleep(min(UNWATCHED_POLL_INTERVAL, remaining))
+
+            else:
+                watch.wait(min(WATCHED_POLL_INTERVAL, remaining))
+
+    finally:
+        if watch is not None:
+            watch.close()
@@ -0,0 +1,31 @@
+import errno
+import fcntl
+import os
+from pathlib import Path
+
+# linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+# Errors that mean the file system can not clone these files
+_NO_REFLINK_ERRORS = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS}
+
+
+def reflink(source: Path, target: Path) -> bool:
+    """
+    Create a copy of a file that shares its data with the original until either of them is changed
+    :param source: The file to copy
+    :param target: Where to create the copy, an existing file is overwritten
+    :return: Whether the copy was created, False when the file system does not support reflinks
+    """
+    with source.open("rb") as source_fp, target.open("wb") as target_fp:
+        try:
+            fcntl.ioctl(target_fp.fileno(), FICLONE, source_fp.fileno())
+            return True
+
+        except OSError as e:
+            if e.errno not in _NO_REFLINK_ERRORS:
+                raise
+
+    os.remove(target)
+
+    return False
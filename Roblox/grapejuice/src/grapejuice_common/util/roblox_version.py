@@ -1,36 +1,219 @@
-from typing import Optional
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Optional, Dict
 
 import requests
 
+from grapejuice_common import paths
+from grapejuice_common.logs.tracing import traced
 from grapejuice_common.roblox_product import RobloxReleaseChannel, MAIN_ROBLOX_RELEASE_CHANNEL
-from grapejuice_common.util.cache_utils import cache
+from grapejuice_common.util import atomic_write, file_lock
 
+LOG = logging.getLogger(__name__)
 
-# TODO: Handle fetch failures properly
+CLIENT_VERSION_URL = "https://clientsettingscdn.roblox.com/v2/client-version/{binary_type}/channel/{channel}"
+PLAYER_BINARY_TYPE = "WindowsPlayer"
+STUDIO_BINARY_TYPE = "WindowsStudio"
 
-@cache()
-def current_player_version(
-    release_channel: Optional[RobloxReleaseChannel] = MAIN_ROBLOX_RELEASE_CHANNEL
-) -> Optional[str]:
-    url = f"https://clientsettingscdn.roblox.com/v2/client-version/WindowsPlayer/channel/{release_channel.value}"
-    response = requests.get(url)
-    response.raise_for_status()
+# Connect and read timeouts, a launch should not hang on a slow network when there is a version to fall back on
+REQUEST_TIMEOUT = (3.05, 10)
 
-    # if not response.ok:
-    #     return None
+# The live channel is updated about once a week, the other channels change more often
+LIVE_CHANNEL_TTL = 10 * 60
+OTHER_CHANNEL_TTL = 2 * 60
 
-    return response.json()["clientVersionUpload"]
+# Versions older than their TTL are used right away while they are refreshed in the background, as long as they are
+# not older than this
+MAX_STALE_AGE = 7 * 24 * 60 * 60
 
 
-@cache()
-def current_studio_version(
+@dataclass(frozen=True)
+class CachedVersion:
+    version: str
+    etag: Optional[str]
+    fetched_at: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+@dataclass(frozen=True)
+class VersionLookup:
+    version: str
+    # False when the version was served from the cache after its TTL ran out, a newer one might have been released
+    fresh: bool
+
+
+def version_ttl(release_channel: RobloxReleaseChannel) -> int:
+    return LIVE_CHANNEL_TTL if release_channel is MAIN_ROBLOX_RELEASE_CHANNEL else OTHER_CHANNEL_TTL
+
+
+def _cache_key(binary_type: str, release_channel: RobloxReleaseChannel) -> str:
+    return f"{binary_type}/{release_channel.value}"
+
+
+_version_cache_lock = threading.Lock()
+_background_refreshes: Dict[str, threading.Thread] = dict()
+
+
+def _load_version_cache() -> Dict[str, CachedVersion]:
+    try:
+        with paths.roblox_version_cache_location().open("r", encoding="UTF-8") as fp:
+            raw = json.load(fp)
+
+        if not isinstance(raw, dict):
+            raise ValueError(f"Expected an object, got {type(raw).__name__}")
+
+        return {key: CachedVersion(**value) for key, value in raw.items()}
+
+    except FileNotFoundError:
+        return dict()
+
+    except (ValueError, TypeError, AttributeError) as e:
+        LOG.warning(f"Ignoring invalid Roblox version cache: {type(e).__name__}: {e}")
+        return dict()
+
+
+def _store_cached_version(key: str, entry: CachedVersion):
+    path = paths.roblox_version_cache_location()
+
+    try:
+        # Other Grapejuice processes write the cache as well, the lock file keeps them from undoing each other's
+        # updates
+        with _version_cache_lock, file_lock(path.with_name(path.name + ".lock")):
+            versions = _load_version_cache()
+            versions[key] = entry
+
+            serialized = json.dumps({k: asdict(v) for k, v in versions.items()}, indent=2)
+            atomic_write(path, serialized.encode("UTF-8"))
+
+    except OSError as e:
+        LOG.warning(f"Could not store the Roblox version cache {path}: {type(e).__name__}: {e}")
+
+
+def _fetch_version(binary_type: str, release_channel: RobloxReleaseChannel, cached: Optional[CachedVersion]):
+    url = CLIENT_VERSION_URL.format(binary_type=binary_type, channel=release_channel.value)
+    headers = dict()
+
+    if cached and cached.etag:
+        headers["If-None-Match"] = cached.etag
+
+    response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+
+    if response.status_code == 304 and cached:
+        LOG.debug(f"Roblox version for {binary_type} on {release_channel.value} has not changed")
+        entry = CachedVersion(version=cached.version, etag=cached.etag, fetched_at=time.time())
+
+    else:
+        response.raise_for_status()
+
+        entry = CachedVersion(
+            version=response.json()["clientVersionUpload"],
+            etag=response.headers.get("ETag", None),
+            fetched_at=time.time()
+        )
+
+    _store_cached_version(_cache_key(binary_type, release_channel), entry)
+
+    return entry
+
+
+def _refresh_in_background(binary_type: str, release_channel: RobloxReleaseChannel, cached: CachedVersion):
+    key = _cache_key(binary_type, release_channel)
+
+    def refresh():
+        try:
+            _fetch_version(binary_type, release_channel, cached)
+
+        except (requests.RequestException, ValueError, KeyError) as e:
+            LOG.warning(f"Failed to refresh the Roblox version for {key}: {type(e).__name__}: {e}")
+
+    with _version_cache_lock:
+        running = _background_refreshes.get(key, None)
+        if running is not None and running.is_alive():
+            return
+
+        # Not a daemon, a CLI invocation exits right after launching Roblox and should finish the refresh first.
+        # The request timeout bounds how long that can take.
+        thread = threading.Thread(target=refresh, name=f"version-refresh/{key}")
+        _background_refreshes[key] = thread
+
+    thread.start()
+
+
+def _lookup_version(binary_type: str, release_channel: RobloxReleaseChannel, allow_stale: bool) -> VersionLookup:
+    cached = _load_version_cache().get(_cache_key(binary_type, release_channel), None)
+
+    if cached is not None:
+        if cached.age < version_ttl(release_channel):
+            return VersionLookup(cached.version, fresh=True)
+
+        if allow_stale and cached.age < MAX_STALE_AGE:
+            LOG.info(f"Using cached Roblox version {cached.version} while it is being refreshed")
+            _refresh_in_background(binary_type, release_channel, cached)
+
+            return VersionLookup(cached.version, fresh=False)
+
+    try:
+        return VersionLookup(_fetch_version(binary_type, release_channel, cached).version, fresh=True)
+
+    except requests.RequestException as e:
+        if cached is None:
+            raise
+
+        LOG.warning(f"Could not fetch the Roblox version, using the cached one: {type(e).__name__}: {e}")
+
+        return VersionLookup(cached.version, fresh=False)
+
+
+def _client_version(binary_type: str, release_channel: RobloxReleaseChannel) -> str:
+    return _lookup_version(binary_type, release_channel, allow_stale=True).version
+
+
+@traced("roblox_version/player_version_lookup")
+def player_version_lookup(
+    release_channel: Optional[RobloxReleaseChannel] = MAIN_ROBLOX_RELEASE_CHANNEL,
+    allow_stale: bool = True
+) -> VersionLookup:
+    """
+    Look up the current Roblox player version, telling whether the answer might be outdated
+    :param release_channel: The release channel to look up
+    :param allow_stale: Use a cached version past its TTL while it is refreshed in the background, instead of waiting
+    for Roblox to answer
+    :return: The version and whether it is fresh
+    """
+    return _lookup_version(PLAYER_BINARY_TYPE, release_channel, allow_stale)
+
+
+@traced("roblox_version/studio_version_lookup")
+def studio_version_lookup(
+    release_channel: Optional[RobloxReleaseChannel] = MAIN_ROBLOX_RELEASE_CHANNEL,
+    allow_stale: bool = True
+) -> VersionLookup:
+    """
+    Look up the current Roblox Studio version, telling whether the answer might be outdated
+    :param release_channel: The release channel to look up
+    :param allow_stale: Use a cached version past its TTL while it is refreshed in the background, instead of waiting
+    for Roblox to answer
+    :return: The version and whether it is fresh
+    """
+    return _lookup_version(STUDIO_BINARY_TYPE, release_channel, allow_stale)
+
+
+# Not memoized, the cache on disk is cheap to read and knows when its versions expire
+@traced("roblox_version/current_player_version")
+def current_player_version(
     release_channel: Optional[RobloxReleaseChannel] = MAIN_ROBLOX_RELEASE_CHANNEL
 ) -> Optional[str]:
-    url = f"https://clientsettingscdn.roblox.com/v2/client-version/WindowsStudio/channel/{release_channel.value}"
-    response = requests.get(url)
-    response.raise_for_status()
+    return _client_version(PLAYER_BINARY_TYPE, release_channel)
 
-    # if not response.ok:
-    #     return None
 
-    return response.json()["clientVersionUpload"]
+@traced("roblox_version/current_studio_version")
+def current_studio_version(
+    release_channel: Optional[RobloxReleaseChannel] = MAIN_ROBLOX_RELEASE_CHANNEL
+) -> Optional[str]:
+    return _client_version(STUDIO_BINARY_TYPE, release_channel)
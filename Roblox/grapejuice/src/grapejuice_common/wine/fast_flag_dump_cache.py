@@ -0,0 +1,65 @@
+import gzip
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+from grapejuice_common import paths
+from grapejuice_common.roblox_product import RobloxReleaseChannel
+from grapejuice_common.util import atomic_write
+
+LOG = logging.getLogger(__name__)
+
+# Every Studio version has its own dump, old ones are useless once Studio has updated
+NUMBER_OF_DUMPS_TO_KEEP = 8
+
+_UNSAFE_CHARACTERS_PTN = re.compile(r"[^\w.-]")
+
+
+def dump_cache_path(studio_version: str, release_channel: RobloxReleaseChannel) -> Path:
+    safe_version = _UNSAFE_CHARACTERS_PTN.sub("_", studio_version)
+
+    return paths.fast_flag_dump_cache_directory() / f"{release_channel.value}-{safe_version}.json.gz"
+
+
+def load_dump(studio_version: str, release_channel: RobloxReleaseChannel) -> Optional[bytes]:
+    """
+    Get the fast flags that were dumped by a Studio version before
+    :param studio_version: Version of Roblox Studio, the name of its directory in Versions
+    :param release_channel: The release channel Studio was running on
+    :return: Contents of the dump, None when the version has not been dumped yet
+    """
+    path = dump_cache_path(studio_version, release_channel)
+
+    try:
+        with gzip.open(path, "rb") as fp:
+            return fp.read()
+
+    except FileNotFoundError:
+        return None
+
+    except (OSError, EOFError) as e:
+        LOG.warning(f"Ignoring broken fast flag dump {path}: {type(e).__name__}: {e}")
+        return None
+
+
+def _remove_old_dumps(directory: Path):
+    dumps = sorted(directory.glob("*.json.gz"), key=lambda p: p.stat().st_mtime, reverse=True)
+
+    for old_dump in dumps[NUMBER_OF_DUMPS_TO_KEEP:]:
+        LOG.info(f"Removing old fast flag dump {old_dump}")
+
+        try:
+            os.remove(old_dump)
+
+        except FileNotFoundError:
+            pass
+
+
+def store_dump(studio_version: str, release_channel: RobloxReleaseChannel, data: bytes):
+    path = dump_cache_path(studio_version, release_channel)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    atomic_write(path, gzip.compress(data))
+    _remove_old_dumps(path.parent)
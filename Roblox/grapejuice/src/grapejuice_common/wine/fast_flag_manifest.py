@@ -0,0 +1,105 @@
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict
+
+from grapejuice_common.util import atomic_write
+
+LOG = logging.getLogger(__name__)
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+@dataclass(frozen=True)
+class WrittenFile:
+    digest: str
+    size: int
+    mtime_ns: int
+
+
+class FastFlagManifest:
+    """
+    Remembers what Grapejuice last wrote to each settings file of a prefix. A file is only considered up to date when
+    its size and mtime still match what was recorded, so files that were changed by someone else are written again.
+    """
+    _path: Path
+    _files: Dict[str, WrittenFile]
+    _dirty: bool = False
+
+    def __init__(self, path: Path):
+        self._path = path
+        self._files = dict()
+
+    def load(self) -> "FastFlagManifest":
+        try:
+            with self._path.open("r", encoding="UTF-8") as fp:
+                self._files = {target: WrittenFile(**written) for target, written in json.load(fp).items()}
+
+        except FileNotFoundError:
+            self._files = dict()
+
+        except (ValueError, TypeError) as e:
+            LOG.warning(f"Ignoring invalid fast flag manifest {self._path}: {type(e).__name__}: {e}")
+            self._files = dict()
+
+        return self
+
+    def is_current(self, target: Path, digest: str) -> bool:
+        written = self._files.get(str(target), None)
+
+        if written is None or written.digest != digest:
+            return False
+
+        try:
+            stat = os.stat(target)
+
+        except FileNotFoundError:
+            return False
+
+        return stat.st_size == written.size and stat.st_mtime_ns == written.mtime_ns
+
+    def record(self, target: Path, digest: str):
+        stat = os.stat(target)
+
+        self._files[str(target)] = WrittenFile(digest=digest, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        self._dirty = True
+
+    def forget_missing(self):
+        for target in list(self._files):
+            if not os.path.exists(target):
+                del self._files[target]
+                self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+
+        serialized = json.dumps({target: asdict(written) for target, written in self._files.items()}, indent=2)
+        atomic_write(self._path, serialized.encode("UTF-8"))
+
+        self._dirty = False
+
+    def write_if_changed(self, target: Path, data: bytes) -> bool:
+        """
+        Write a settings file unless it already has the given contents
+        :param target: The file to write
+        :param data: The contents of the file
+        :return: Whether the file was written
+        """
+        digest = content_digest(data)
+
+        if self.is_current(target, digest):
+            return False
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(target, data)
+        self.record(target, digest)
+
+        return True
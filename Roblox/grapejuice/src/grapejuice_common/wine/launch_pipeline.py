@@ -0,0 +1,99 @@
+import contextvars
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from typing import List, Callable, Optional, TypeVar, Iterator
+
+from grapejuice_common.logs.tracing import span
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+
+StepResult = TypeVar("StepResult")
+
+
+class LaunchPipeline:
+    """
+    Runs the independent pre-launch steps of a Roblox launch at the same time, so their I/O overlaps.
+    A step may wait for the result of a step that was submitted before it. Steps are started in the order they are
+    submitted, so this can not deadlock as long as there are fewer waiting steps than workers.
+    """
+    _executor: ThreadPoolExecutor
+    _futures: List[Future]
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="launch-pipeline")
+        self._futures = []
+
+    def submit(self, name: str, fn: Callable[..., StepResult], *args, **kwargs) -> "Future[StepResult]":
+        """
+        Start a pre-launch step
+        :param name: Name of the step, used for logging and tracing
+        :param fn: The function that performs the step
+        :return: A future for the result of the step
+        """
+
+        def run_step():
+            with span(f"pipeline/{name}"):
+                return fn(*args, **kwargs)
+
+        LOG.debug(f"Starting pre-launch step {name}")
+
+        # Steps run in a copy of the submitting context, so their spans are children of the span they were submitted in
+        future = self._executor.submit(contextvars.copy_context().run, run_step)
+        self._futures.append(future)
+
+        return future
+
+    def join(self):
+        """
+        Wait for every step that has been submitted so far. When steps failed, the error of the step that was
+        submitted first is raised.
+        """
+        with span("pipeline/join"):
+            wait(self._futures)
+
+        for future in self._futures:
+            exception = future.exception()
+
+            if exception is not None:
+                raise exception
+
+    def close(self):
+        for future in self._futures:
+            future.cancel()
+
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            try:
+                self.join()
+
+            finally:
+                self.close()
+
+        else:
+            self.close()
+
+
+@contextmanager
+def ensure_pipeline(pipeline: Optional[LaunchPipeline]) -> Iterator[LaunchPipeline]:
+    """
+    Use a pipeline that was handed in by the caller, or start a new one. Either way, the steps are joined when the
+    context exits. Pipelines of the caller are left open.
+    :param pipeline: The pipeline of the caller, if any
+    :return: A context manager for the pipeline to use
+    """
+    if pipeline is None:
+        with LaunchPipeline() as owned_pipeline:
+            yield owned_pipeline
+
+        return
+
+    yield pipeline
+    pipeline.join()
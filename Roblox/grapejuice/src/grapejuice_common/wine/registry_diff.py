@@ -0,0 +1,180 @@
+import logging
+import mmap
+import os
+import re
+import shutil
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Union, Iterator
+
+from grapejuice_common import paths
+from grapejuice_common.logs.tracing import traced
+from grapejuice_common.util.reflink import reflink
+from grapejuice_common.wine.registry_file import RegistryFile, RegistryValue, KeySection, parse_key
+from grapejuice_common.wine.registry_hive_writer import escape_registry_path
+from grapejuice_common.wine.wineprefix import Wineprefix
+
+LOG = logging.getLogger(__name__)
+
+HIVE_NAMES = ("system.reg", "user.reg", "userdef.reg")
+
+# Wineserver updates the modification time of a key whenever it is written to, even when nothing changes
+_TIME_METADATA_PTN = re.compile(rb"^#time=[0-9a-fA-F]*\r?\n?", re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class ValueChange:
+    name: str
+    old: Optional[RegistryValue]
+    new: Optional[RegistryValue]
+
+
+@dataclass(frozen=True)
+class KeyChange:
+    path: str
+    # 'added', 'removed' or 'changed'
+    kind: str
+    values: List[ValueChange]
+
+
+@contextmanager
+def _mapped(path: Path) -> Iterator[Union[bytes, mmap.mmap]]:
+    with path.open("rb") as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            yield b""
+            return
+
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def _body(data: Union[bytes, mmap.mmap], section: KeySection) -> bytes:
+    return data[section.start:max(section.end, section.start)]
+
+
+def _value_changes(old: Dict[str, RegistryValue], new: Dict[str, RegistryValue]) -> List[ValueChange]:
+    changes = []
+
+    for name in sorted(set(old) | set(new), key=str.lower):
+        old_value = old.get(name, None)
+        new_value = new.get(name, None)
+
+        if old_value != new_value:
+            changes.append(ValueChange(name=name, old=old_value, new=new_value))
+
+    return changes
+
+
+@traced("wine/diff_hives")
+def diff_hives(old_hive: Path, new_hive: Path, key_prefix: Optional[str] = None) -> List[KeyChange]:
+    """
+    Compare two registry hives. Only the positions of the keys are indexed, sections that are byte for byte the
+    same are skipped without being decoded. Changes to the #time metadata are ignored.
+    :param old_hive: The hive before the change
+    :param new_hive: The hive after the change
+    :param key_prefix: Only compare this key and the keys below it, with single backslashes between the components
+    :return: The keys that were added, removed or changed, sorted by path
+    """
+    old_sections = RegistryFile(old_hive).sections
+    new_sections = RegistryFile(new_hive).sections
+
+    prefix = escape_registry_path(key_prefix).lower() if key_prefix else None
+
+    def is_wanted(path: str) -> bool:
+        return prefix is None or path == prefix or path.startswith(prefix + "\\\\")
+
+    changes = []
+
+    with _mapped(old_hive) as old_data, _mapped(new_hive) as new_data:
+        for path in sorted(set(old_sections) | set(new_sections)):
+            if not is_wanted(path):
+                continue
+
+            old_section = old_sections.get(path, None)
+            new_section = new_sections.get(path, None)
+
+            if old_section is None:
+                values = parse_key(new_section, _body(new_data, new_section)).values
+                changes.append(KeyChange(new_section.path, "added", _value_changes(dict(), values)))
+                continue
+
+            if new_section is None:
+                values = parse_key(old_section, _body(old_data, old_section)).values
+                changes.append(KeyChange(old_section.path, "removed", _value_changes(values, dict())))
+                continue
+
+            old_body = _body(old_data, old_section)
+            new_body = _body(new_data, new_section)
+
+            if old_body == new_body or _TIME_METADATA_PTN.sub(b"", old_body) == _TIME_METADATA_PTN.sub(b"", new_body):
+                continue
+
+            value_changes = _value_changes(
+                parse_key(old_section, old_body).values,
+                parse_key(new_section, new_body).values
+            )
+
+            if value_changes:
+                changes.append(KeyChange(new_section.path, "changed", value_changes))
+
+    return changes
+
+
+def snapshot_directory(prefix: Wineprefix) -> Path:
+    return paths.registry_snapshots_directory() / prefix.configuration.id
+
+
+def snapshot_registry(prefix: Wineprefix) -> List[Path]:
+    """
+    Save the hives of a prefix, so they can be compared to later versions of themselves
+    :param prefix: The prefix to take a snapshot of
+    :return: The hives in the snapshot
+    """
+    target_directory = snapshot_directory(prefix)
+    target_directory.mkdir(parents=True, exist_ok=True)
+    saved = []
+
+    for hive_name in HIVE_NAMES:
+        source = prefix.paths.base_directory / hive_name
+        target = target_directory / hive_name
+
+        if not source.exists():
+            try:
+                target.unlink()
+
+            except FileNotFoundError:
+                pass
+
+            continue
+
+        # Wineserver replaces hives instead of writing into them, so the copy is never torn
+        temporary = target_directory / f".{hive_name}.tmp"
+        if not reflink(source, temporary):
+            shutil.copyfile(source, temporary)
+
+        os.replace(temporary, target)
+        saved.append(target)
+
+    LOG.info(f"Saved a registry snapshot of {prefix.configuration.display_name} in {target_directory}")
+
+    return saved
+
+
+def diff_registry_snapshot(prefix: Wineprefix, key_prefix: Optional[str] = None) -> Dict[str, List[KeyChange]]:
+    """
+    Compare the hives of a prefix to its last snapshot
+    :param prefix: The prefix to compare
+    :param key_prefix: Only compare this key and the keys below it
+    :return: The changes by hive name, hives that are not in the snapshot or not in the prefix are left out
+    """
+    changes = dict()
+
+    for hive_name in HIVE_NAMES:
+        old_hive = snapshot_directory(prefix) / hive_name
+        new_hive = prefix.paths.base_directory / hive_name
+
+        if old_hive.exists() and new_hive.exists():
+            changes[hive_name] = diff_hives(old_hive, new_hive, key_prefix)
+
+    return changes
@@ -1,27 +1,288 @@
 import logging
+import mmap
+import os
 import re
-from copy import deepcopy
+from enum import Enum
 from pathlib import Path
-from typing import Union, IO, List, Callable, Dict
+from types import MappingProxyType
+from typing import Union, Dict, Optional, Iterable, Iterator, Tuple, NamedTuple, List, Mapping, Callable
 
 LOG = logging.getLogger(__name__)
 
-KEY_PTN = re.compile(r"\[(.*)?].*")
+KEY_PTN = re.compile(rb"\[(?P<path>.*)](?:\s+(?P<value>\S+))?\s*$")
+METADATA_ATTRIBUTE_PTN = re.compile(r"#([^=]*)=(.*)")
+VALUE_ATTRIBUTE_PTN = re.compile(r"(?:\"((?:[^\"\\]|\\.)*)\"|(@))\s*=\s*(.*)")
+TYPED_DATA_PTN = re.compile(r"(dword|hex|str)(?:\(([0-9a-fA-F]+)\))?:(.*)", re.DOTALL)
+
+ENCODING = "UTF-8"
+
+_SIMPLE_ESCAPES = {
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+    "a": "\a",
+    "b": "\b",
+    "f": "\f",
+    "v": "\v"
+}
+
+
+class KeySection(NamedTuple):
+    path: str
+    value: Optional[str]
+    # Offset of the first line after the header
+    start: int
+    # Offset of the next header
+    end: int
+
+
+class RegistryValueType(Enum):
+    REG_NONE = 0
+    REG_SZ = 1
+    REG_EXPAND_SZ = 2
+    REG_BINARY = 3
+    REG_DWORD = 4
+    REG_DWORD_BIG_ENDIAN = 5
+    REG_LINK = 6
+    REG_MULTI_SZ = 7
+    REG_RESOURCE_LIST = 8
+    REG_QWORD = 11
+    UNKNOWN = -1
+
+
+def unescape_registry_string(s: str) -> str:
+    """
+    Undo the escaping wineserver does when it saves a hive
+    :param s: An escaped string, without surrounding quotes
+    :return: The string
+    """
+    result = []
+    i = 0
+
+    while i < len(s):
+        char = s[i]
+        i += 1
+
+        if char != "\\" or i >= len(s):
+            result.append(char)
+            continue
+
+        escaped = s[i]
+        i += 1
+
+        if escaped == "x":
+            digits = re.match(r"[0-9a-fA-F]{1,4}", s[i:])
+            if digits:
+                result.append(chr(int(digits.group(0), 16)))
+                i += len(digits.group(0))
+
+            else:
+                result.append(escaped)
+
+        elif escaped in "01234567":
+            digits = re.match(r"[0-7]{1,3}", s[i - 1:]).group(0)
+            result.append(chr(int(digits, 8)))
+            i += len(digits) - 1
+
+        else:
+            result.append(_SIMPLE_ESCAPES.get(escaped, escaped))
+
+    # Characters outside the BMP are written as surrogate pairs
+    return "".join(result).encode("UTF-16-LE", errors="surrogatepass").decode("UTF-16-LE", errors="replace")
+
+
+def _utf16_strings(data: bytes) -> List[str]:
+    return data.decode("UTF-16-LE", errors="replace").split("\0")
+
+
+def _utf16_string(data: bytes) -> str:
+    return _utf16_strings(data)[0]
+
+
+def _utf16_multi_string(data: bytes) -> List[str]:
+    return [string for string in _utf16_strings(data) if string]
+
+
+def _little_endian_integer(size: int) -> Callable[[bytes], Union[int, bytes]]:
+    def decode(data: bytes) -> Union[int, bytes]:
+        return int.from_bytes(data, "little") if len(data) == size else data
+
+    return decode
+
+
+# How hex data of a type is turned into a Python value, types that are not listed are kept as bytes
+_HEX_DECODERS: Dict[RegistryValueType, Callable[[bytes], object]] = {
+    RegistryValueType.REG_SZ: _utf16_string,
+    RegistryValueType.REG_EXPAND_SZ: _utf16_string,
+    RegistryValueType.REG_LINK: _utf16_string,
+    RegistryValueType.REG_MULTI_SZ: _utf16_multi_string,
+    RegistryValueType.REG_DWORD: _little_endian_integer(4),
+    RegistryValueType.REG_QWORD: _little_endian_integer(8)
+}
+
+
+class RegistryValue:
+    """
+    A value as it is written in a hive, decoded when its type or data is asked for
+    """
+    _raw: str
+    _decoded: Optional[Tuple[RegistryValueType, object]] = None
+
+    def __init__(self, raw: str):
+        self._raw = raw
+
+    @property
+    def raw(self) -> str:
+        return self._raw
+
+    def _decode(self) -> Tuple[RegistryValueType, object]:
+        raw = self._raw
+
+        if raw.startswith("\"") and raw.endswith("\"") and len(raw) >= 2:
+            return RegistryValueType.REG_SZ, unescape_registry_string(raw[1:-1])
+
+        match = TYPED_DATA_PTN.match(raw)
+        if not match:
+            return RegistryValueType.UNKNOWN, raw
+
+        kind, type_number, data = match.groups()
+
+        if kind == "dword":
+            return RegistryValueType.REG_DWORD, int(data, 16)
+
+        if kind == "str":
+            string = data.strip()
+            if string.startswith("\"") and string.endswith("\"") and len(string) >= 2:
+                string = unescape_registry_string(string[1:-1])
+
+            return _value_type(type_number, RegistryValueType.REG_SZ), string
+
+        hex_digits = "".join(data.split()).replace(",", "")
+        try:
+            data_bytes = bytes.fromhex(hex_digits)
+
+        except ValueError:
+            return RegistryValueType.UNKNOWN, raw
+
+        value_type = _value_type(type_number, RegistryValueType.REG_BINARY)
+        decoder = _HEX_DECODERS.get(value_type, None)
+
+        return value_type, decoder(data_bytes) if decoder is not None else data_bytes
+
+    @property
+    def type(self) -> RegistryValueType:
+        if self._decoded is None:
+            self._decoded = self._decode()
+
+        return self._decoded[0]
+
+    @property
+    def data(self):
+        """
+        str for strings, List[str] for multi-strings, int for dwords and qwords and bytes for everything else
+        """
+        if self._decoded is None:
+            self._decoded = self._decode()
+
+        return self._decoded[1]
+
+    def __eq__(self, other):
+        return isinstance(other, RegistryValue) and self._raw == other._raw
+
+    def __hash__(self):
+        return hash(self._raw)
+
+    def __repr__(self):
+        return f"RegistryValue({self._raw!r})"
+
+
+def _value_type(type_number: Optional[str], default: RegistryValueType) -> RegistryValueType:
+    if type_number is None:
+        return default
+
+    try:
+        return RegistryValueType(int(type_number, 16))
+
+    except ValueError:
+        return RegistryValueType.UNKNOWN
 
 
-def line_iterator(fp: IO):
-    for line in fp.read().split("\n"):
-        yield line.strip("\r").strip()
+def _decode(b: bytes) -> str:
+    return b.decode(ENCODING, errors="surrogateescape")
+
+
+def _section_headers(data: Union[bytes, mmap.mmap]) -> Iterator[Tuple[int, int]]:
+    """
+    Find the key headers in a hive without looking at the lines in between
+    :return: Offsets of the start and the end of every header line
+    """
+    position = 0 if data[:1] == b"[" else data.find(b"\n[")
+
+    while position >= 0:
+        if data[position:position + 1] == b"\n":
+            position += 1
+
+        end = data.find(b"\n", position)
+        if end < 0:
+            end = len(data)
+
+        yield position, end
+
+        position = data.find(b"\n[", end)
+
+
+def _sections(data: Union[bytes, mmap.mmap]) -> Iterator[KeySection]:
+    previous: Optional[Tuple[str, Optional[str], int]] = None
+
+    for start, end in _section_headers(data):
+        match = KEY_PTN.match(data[start:end].rstrip(b"\r"))
+        if not match:
+            continue
+
+        if previous is not None:
+            yield KeySection(*previous, start)
+
+        value = match.group("value")
+        previous = _decode(match.group("path")), _decode(value) if value is not None else None, end + 1
+
+    if previous is not None:
+        yield KeySection(*previous, len(data))
+
+
+def _section_lines(body: bytes) -> Iterator[str]:
+    """
+    Lines of a key section, values that continue on the next lines are joined into one line
+    """
+    pending = ""
+
+    for raw_line in body.split(b"\n"):
+        line = _decode(raw_line).strip("\r").strip()
+
+        if line.endswith("\\") and not line.endswith("\\\\"):
+            pending += line[:-1]
+            continue
+
+        yield pending + line
+        pending = ""
+
+    if pending:
+        yield pending
 
 
 class RegistryKey:
     _path: str
-    _value: any
+    _value: any = None
     _attributes: Dict[str, str]
+    _metadata_names: List[str]
 
     def __init__(self, path: str):
         self._path = path
         self._attributes = dict()
+        self._metadata_names = []
+
+    @property
+    def path(self) -> str:
+        return self._path
 
     @property
     def value(self):
@@ -38,18 +299,75 @@ class RegistryKey:
         return self._attributes.get(key, None)
 
     @property
-    def attributes(self) -> Dict[str, str]:
-        return deepcopy(self._attributes)
+    def attributes(self) -> Mapping[str, str]:
+        return MappingProxyType(self._attributes)
+
+    def get_value(self, name: str) -> Optional[RegistryValue]:
+        """
+        :param name: Name of the value as it appears in the hive, '@' for the default value
+        :return: The value, None if the key does not have it
+        """
+        if name in self._metadata_names:
+            return None
+
+        raw = self._attributes.get(name, None)
+
+        return None if raw is None else RegistryValue(raw)
+
+    @property
+    def values(self) -> Dict[str, RegistryValue]:
+        """
+        The values of the key by their names as they appear in the hive, without metadata like #time
+        """
+        return {
+            name: RegistryValue(raw)
+            for name, raw in self._attributes.items()
+            if name not in self._metadata_names
+        }
+
+    def parse_lines(self, lines: Iterable[str]):
+        for line in lines:
+            if not line or line.startswith(";"):
+                continue
+
+            match = METADATA_ATTRIBUTE_PTN.match(line)
+            if match:
+                self.set_attribute(match.group(1), match.group(2))
+                self._metadata_names.append(match.group(1))
+                continue
+
+            match = VALUE_ATTRIBUTE_PTN.match(line)
+            if match:
+                self.set_attribute(match.group(1) if match.group(2) is None else "@", match.group(3))
+
+    def __repr__(self):
+        return f"RegistryKey({self._path!r})"
+
+
+def parse_key(section: KeySection, body: bytes) -> RegistryKey:
+    """
+    :param section: Where the key is in the hive
+    :param body: The lines of the section, from section.start to section.end
+    :return: The key with its values
+    """
+    key = RegistryKey(section.path)
+    key.value = section.value
+    key.parse_lines(_section_lines(body))
+
+    return key
 
 
 class RegistryFile:
+    """
+    Read-only view of a Wine registry hive. Loading only records where the key sections are in the file, the values
+    of a key are read when the key is asked for, so large hives can be queried without reading them into memory.
+    Key paths are written the way they appear in the hive, with escaped backslashes, and are case-insensitive.
+    """
     _path: Path
 
     _version: str = ""
-    _comments: List[str]
-    _root_key: RegistryKey
-    _keys: Dict[str, RegistryKey]
-    _last_key_read: Union[RegistryKey, None] = None
+    _index: Optional[Dict[str, KeySection]] = None
+    _stat: Optional[os.stat_result] = None
 
     def __init__(self, path: Union[str, Path]):
         if isinstance(path, str):
@@ -58,75 +376,100 @@ class RegistryFile:
         else:
             self._path = path.absolute()
 
-        self._comments = []
-        self._keys = dict()
-        self._root_key = RegistryKey("\\")
+    def load(self):
+        """
+        Build the index of the key sections in the hive
+        """
+        index = dict()
+
+        with self._path.open("rb") as fp:
+            file_stat = os.fstat(fp.fileno())
+            self._version = _decode(fp.readline()).strip()
+
+            if file_stat.st_size > 0:
+                with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    for section in _sections(data):
+                        # Wineserver writes every key once, for hand written hives the first section wins
+                        index.setdefault(section.path.lower(), section)
+
+        self._index = index
+        self._stat = file_stat
+
+        LOG.debug(f"Indexed {len(index)} keys in {self._path}")
 
     @property
-    def _current_key(self) -> RegistryKey:
-        if self._last_key_read is not None:
-            return self._last_key_read
+    def sections(self) -> Mapping[str, KeySection]:
+        """
+        Where the keys are in the file, by their lowercase paths. The hive is loaded if it has not been loaded yet.
+        """
+        if self._index is None:
+            self.load()
 
-        else:
-            return self._root_key
+        return MappingProxyType(self._index)
 
-    def find_key(self, path: str):
-        return self._keys.get(path, None)
+    def _is_stale(self, file_stat: os.stat_result) -> bool:
+        return (file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ino) != \
+            (self._stat.st_size, self._stat.st_mtime_ns, self._stat.st_ino)
 
-    def load(self):
-        class LoadState:
-            operator: Callable[[str], None]
+    def _read_keys(self, wanted: Dict[str, str]) -> Dict[str, RegistryKey]:
+        with self._path.open("rb") as fp:
+            if self._index is not None and self._is_stale(os.fstat(fp.fileno())):
+                LOG.info(f"{self._path} changed since it was indexed, indexing it again")
+                self.load()
 
-        def normal(ln: str):
-            if ln.startswith(";;"):
-                return comment(ln)
+            if self._index is not None:
+                sections = ((path, self._index[path]) for path in wanted if path in self._index)
 
-            match = KEY_PTN.match(ln)
-            if match:
-                return key(ln)
+            else:
+                sections = self._scan_for(fp, wanted)
 
-            return attribute(ln)
+            keys = dict()
 
-        def version(ln: str):
-            self._version = ln
-            LoadState.operator = normal
+            for path, section in sections:
+                fp.seek(section.start)
+                keys[path] = parse_key(section, fp.read(max(section.end - section.start, 0)))
 
-        def comment(ln: str):
-            self._comments.append(ln)
+            return keys
 
-        def key(ln: str):
-            split = ln.split(" ")
-            path = split[0].lstrip("[").strip("]")
-            registry_key = self._keys.setdefault(path, RegistryKey(path))
+    @staticmethod
+    def _scan_for(fp, wanted: Dict[str, str]) -> Iterator[Tuple[str, KeySection]]:
+        """
+        Find sections without indexing the hive, stopping as soon as every wanted key has been found
+        """
+        if os.fstat(fp.fileno()).st_size == 0:
+            return
 
-            if len(split) > 1:
-                registry_key.value = split[1].strip()
+        remaining = set(wanted)
+        found = []
 
-            self._last_key_read = registry_key
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for section in _sections(data):
+                path = section.path.lower()
 
-        def attribute(ln: str):
-            if not ln:
-                return
+                if path in remaining:
+                    remaining.remove(path)
+                    found.append((path, section))
 
-            match = re.match(r"#(.*)?=(.*)", ln)
-            if match:
-                self._current_key.set_attribute(match.group(1), match.group(2))
-                return
+                    if not remaining:
+                        break
 
-            match = re.match(r"\"(.*)?\"\s*=\s*(.*)", ln)
-            if match:
-                self._current_key.set_attribute(match.group(1), match.group(2))
-                return
+        yield from found
 
-        LoadState.operator = version
+    def find_keys(self, paths: Iterable[str]) -> Dict[str, Optional[RegistryKey]]:
+        """
+        Look up several keys with one pass over the file. When the hive has not been loaded, the file is only read up
+        to the last key that is found.
+        :param paths: Key paths as they appear in the hive
+        :return: The keys by the paths that were asked for, None for keys that do not exist
+        """
+        wanted = {path.lower(): path for path in paths}
 
-        with self._path.open("r") as fp:
-            if callable(LoadState.operator):
-                for line in line_iterator(fp):
-                    LoadState.operator(line)
+        keys = self._read_keys(wanted)
 
-            else:
-                LOG.warning("LoadState.operator is not callable")
+        return {path: keys.get(lowered, None) for lowered, path in wanted.items()}
+
+    def find_key(self, path: str) -> Optional[RegistryKey]:
+        return self.find_keys([path])[path]
 
     def __enter__(self):
         return self
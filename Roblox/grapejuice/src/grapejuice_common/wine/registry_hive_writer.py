@@ -0,0 +1,658 @@
+import logging
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Union, List, Optional, Dict, Iterable
+
+from grapejuice_common.errors import RegistryHiveChanged, UnsupportedOfflineRegistryEdit
+from grapejuice_common.wine.registry_transaction import REGISTRY_HEADER, LEGACY_REGISTRY_HEADER
+
+LOG = logging.getLogger(__name__)
+
+HIVE_SIGNATURE = "WINE REGISTRY Version 2"
+SECTION_HEADER_PTN = re.compile(r"^\[(?P<path>.*)](?:\s+(?P<timestamp>\d+))?\s*$")
+HIVE_ROOT_PTN = re.compile(r"^;; All keys relative to (?P<root>.+?)\s*$")
+
+LINK_METADATA = "#link"
+LINK_VALUE_PREFIX = "hex(6):"
+REGISTRY_ROOT = "\\Registry"
+
+# Wine gives up on chains of links that are longer than this as well
+MAX_LINK_DEPTH = 16
+
+# Seconds between the Windows epoch (1601) and the Unix epoch (1970)
+EPOCH_DIFFERENCE = 11644473600
+TICKS_PER_SECOND = 10 ** 7
+
+_CONTROL_CHARACTER_ESCAPES = {
+    "\n": "n",
+    "\r": "r",
+    "\t": "t",
+    "\a": "a",
+    "\b": "b",
+    "\f": "f",
+    "\v": "v",
+    "\0": "0"
+}
+
+
+def escape_registry_string(s: str, extra_characters: str = "\"") -> str:
+    """
+    Escape a string the way wineserver does when it saves a hive
+    :param s: The string to escape
+    :param extra_characters: Characters that need a backslash in front of them, besides the backslash itself
+    :return: The escaped string, without surrounding quotes
+    """
+    escaped = []
+
+    for char in s:
+        code_point = ord(char)
+
+        if char == "\\" or char in extra_characters:
+            escaped.append("\\" + char)
+
+        elif char in _CONTROL_CHARACTER_ESCAPES:
+            escaped.append("\\" + _CONTROL_CHARACTER_ESCAPES[char])
+
+        elif code_point < 32:
+            escaped.append(f"\\{code_point:03o}")
+
+        elif code_point > 127:
+            # Wine reads at most four hex digits, characters outside the BMP are written as a surrogate pair
+            encoded = char.encode("UTF-16-LE")
+
+            for i in range(0, len(encoded), 2):
+                escaped.append(f"\\x{int.from_bytes(encoded[i:i + 2], 'little'):04x}")
+
+        else:
+            escaped.append(char)
+
+    return "".join(escaped)
+
+
+def escape_registry_path(path: str) -> str:
+    """
+    Turn a key path as seen in regedit into the form used in hive section headers
+    :param path: Key path with single backslashes between the components, relative to the hive
+    :return: Key path as it appears in the hive
+    """
+    components = filter(None, path.split("\\"))
+
+    return "\\\\".join(escape_registry_string(component, extra_characters="[]") for component in components)
+
+
+def _filetime_now() -> int:
+    return int((time.time() + EPOCH_DIFFERENCE) * TICKS_PER_SECOND)
+
+
+def _value_name(line: str) -> Optional[str]:
+    """
+    :param line: A line in a key section
+    :return: The escaped name of the value the line defines, '@' for the default value, None if it is not a value
+    """
+    if line.startswith("@="):
+        return "@"
+
+    if not line.startswith("\""):
+        return None
+
+    i = 1
+    while i < len(line):
+        if line[i] == "\\":
+            i += 2
+            continue
+
+        if line[i] == "\"":
+            return line[1:i]
+
+        i += 1
+
+    return None
+
+
+class _HiveEntry:
+    """
+    A value or a metadata line in a key section, including any continuation lines and the comments and blank lines
+    that follow it.
+    """
+    lines: List[str]
+    value_name: Optional[str]
+
+    def __init__(self, lines: List[str], value_name: Optional[str] = None):
+        self.lines = lines
+        self.value_name = value_name
+
+    @property
+    def is_time(self) -> bool:
+        return bool(self.lines) and self.lines[0].startswith("#time=")
+
+    @property
+    def is_link(self) -> bool:
+        return bool(self.lines) and self.lines[0].strip() == LINK_METADATA
+
+
+class _HiveSection:
+    path: str
+    timestamp: Optional[int]
+    entries: List[_HiveEntry]
+
+    def __init__(self, path: str, timestamp: Optional[int]):
+        self.path = path
+        self.timestamp = timestamp
+        self.entries = []
+
+    @property
+    def header(self) -> str:
+        if self.timestamp is None:
+            return f"[{self.path}]"
+
+        return f"[{self.path}] {self.timestamp}"
+
+    def find_value(self, value_name: str) -> Optional[_HiveEntry]:
+        value_name = value_name.lower()
+
+        for entry in self.entries:
+            if entry.value_name is not None and entry.value_name.lower() == value_name:
+                return entry
+
+        return None
+
+    @property
+    def is_link(self) -> bool:
+        return any(entry.is_link for entry in self.entries)
+
+    def touch(self, with_time_metadata: bool):
+        now = time.time()
+        self.timestamp = int(now)
+
+        time_line = f"#time={_filetime_now():x}"
+        time_entry = next((entry for entry in self.entries if entry.is_time), None)
+
+        if time_entry is not None:
+            time_entry.lines[0] = time_line
+
+        elif with_time_metadata:
+            self.entries.insert(0, _HiveEntry([time_line]))
+
+    def lines(self) -> Iterable[str]:
+        yield self.header
+
+        for entry in self.entries:
+            yield from entry.lines
+
+
+class RegistryHiveWriter:
+    """
+    Edits a Wine registry hive (system.reg, user.reg) in place, without spawning Wine.
+    Everything that is not touched is written back exactly as it was read, including the preamble, comments and
+    timestamps. Key paths are relative to the hive and use single backslashes, as they would appear in regedit.
+    The hive must not be owned by a running wineserver, as it would overwrite the changes when it exits.
+    """
+    _path: Path
+    _preamble: List[str]
+    _sections: List[_HiveSection]
+    _index: Dict[str, _HiveSection]
+    _links: Dict[str, _HiveSection]
+    _uses_time_metadata: bool = False
+    _trailing_newline: bool = True
+    _loaded_stat: Optional[os.stat_result] = None
+    _dirty: bool = False
+
+    def __init__(self, path: Union[str, Path]):
+        self._path = Path(path).absolute()
+        self._preamble = []
+        self._sections = []
+        self._index = dict()
+        self._links = dict()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def is_dirty(self) -> bool:
+        return self._dirty
+
+    def load(self):
+        self._loaded_stat = os.stat(self._path)
+
+        with self._path.open("r", encoding="UTF-8", errors="surrogateescape", newline="\n") as fp:
+            text = fp.read()
+
+        self._trailing_newline = text.endswith("\n")
+        lines = text.split("\n")
+        if self._trailing_newline:
+            lines.pop()
+
+        if not lines or lines[0].strip() != HIVE_SIGNATURE:
+            raise ValueError(f"{self._path} is not a Wine registry hive")
+
+        self._preamble = []
+        self._sections = []
+        self._index = dict()
+
+        section: Optional[_HiveSection] = None
+        previous_line = ""
+
+        for line in lines:
+            match = SECTION_HEADER_PTN.match(line) if line.startswith("[") else None
+
+            if match:
+                timestamp = match.group("timestamp")
+                section = _HiveSection(match.group("path"), int(timestamp) if timestamp is not None else None)
+
+                self._sections.append(section)
+                self._index.setdefault(section.path.lower(), section)
+
+            elif section is None:
+                self._preamble.append(line)
+
+            else:
+                is_continuation = previous_line.endswith("\\") and section.entries
+                starts_entry = line.startswith(("\"", "@", "#"))
+
+                if is_continuation or (not starts_entry and section.entries):
+                    section.entries[-1].lines.append(line)
+
+                else:
+                    section.entries.append(_HiveEntry([line], _value_name(line)))
+
+            previous_line = line
+
+        self._uses_time_metadata = any(entry.is_time for section in self._sections for entry in section.entries)
+        self._index_links()
+        self._dirty = False
+
+    def _index_links(self):
+        self._links = {path: section for path, section in self._index.items() if section.is_link}
+
+    @property
+    def _hive_root(self) -> Optional[str]:
+        """
+        :return: The registry path of the key the hive is relative to, e.g. \\Registry\\Machine
+        """
+        for line in self._preamble:
+            match = HIVE_ROOT_PTN.match(line)
+
+            if match:
+                return REGISTRY_ROOT + _unescape_reg_string(match.group("root"))
+
+        return None
+
+    def _link_target(self, section: _HiveSection) -> List[str]:
+        entry = section.find_value("SymbolicLinkValue")
+        data = "".join(line.strip().rstrip("\\") for line in entry.lines).partition("=")[2] if entry else ""
+
+        if not data.lower().startswith(LINK_VALUE_PREFIX):
+            raise UnsupportedOfflineRegistryEdit(f"Cannot read the target of link key {section.path}")
+
+        hex_bytes = bytes(int(byte, 16) for byte in data[len(LINK_VALUE_PREFIX):].split(",") if byte)
+        target = hex_bytes.decode("UTF-16-LE", errors="replace").rstrip("\0")
+
+        root = self._hive_root
+        if root is None or not target.lower().startswith(root.lower() + "\\"):
+            raise UnsupportedOfflineRegistryEdit(f"Link key {section.path} points outside of {self._path.name}")
+
+        return list(filter(None, target[len(root):].split("\\")))
+
+    def _resolve_key_path(self, key_path: str, follow_last: bool = True) -> str:
+        """
+        Follow link keys, like CurrentControlSet, the way wineserver does when a key is opened
+        :param key_path: Path of the key, relative to the hive
+        :param follow_last: Whether the key itself is followed when it is a link
+        :return: Path of the key the edit ends up in, relative to the hive
+        """
+        if not self._links:
+            return key_path
+
+        components = list(filter(None, key_path.split("\\")))
+        resolved: List[str] = []
+        followed_links = 0
+
+        for index, component in enumerate(components):
+            resolved.append(component)
+
+            if index == len(components) - 1 and not follow_last:
+                break
+
+            link = self._links.get(escape_registry_path("\\".join(resolved)).lower(), None)
+
+            while link is not None:
+                followed_links += 1
+                if followed_links > MAX_LINK_DEPTH:
+                    raise UnsupportedOfflineRegistryEdit(f"Too many links in key path {key_path}")
+
+                resolved = self._link_target(link)
+                link = self._links.get(escape_registry_path("\\".join(resolved)).lower(), None)
+
+        return "\\".join(resolved)
+
+    def _find_section(self, key_path: str) -> Optional[_HiveSection]:
+        return self._index.get(escape_registry_path(self._resolve_key_path(key_path)).lower(), None)
+
+    def has_key(self, key_path: str) -> bool:
+        return self._find_section(key_path) is not None
+
+    def add_key(self, key_path: str) -> bool:
+        """
+        Make sure a key exists, creating it when it doesn't
+        :param key_path: Path of the key, relative to the hive
+        :return: Whether the key was created
+        """
+        if self.has_key(key_path):
+            return False
+
+        section = _HiveSection(escape_registry_path(self._resolve_key_path(key_path)), None)
+        section.touch(self._uses_time_metadata)
+
+        # Wine separates key sections with a blank line
+        if self._sections:
+            last_entries = self._sections[-1].entries
+
+            if not last_entries or last_entries[-1].lines[-1].strip():
+                last_entries.append(_HiveEntry([""]))
+
+        elif self._preamble and self._preamble[-1].strip():
+            self._preamble.append("")
+
+        self._sections.append(section)
+        self._index[section.path.lower()] = section
+        self._dirty = True
+
+        return True
+
+    def delete_key(self, key_path: str) -> bool:
+        """
+        Delete a key and all of its subkeys
+        :param key_path: Path of the key, relative to the hive
+        :return: Whether anything was deleted
+        """
+        # Whether the link or the key it points to goes away is up to wineserver, regedit has to do this
+        resolved_path = self._resolve_key_path(key_path, follow_last=False)
+        if escape_registry_path(resolved_path).lower() in self._links:
+            raise UnsupportedOfflineRegistryEdit(f"Cannot delete link key {key_path}")
+
+        escaped_path = escape_registry_path(resolved_path).lower()
+        subkey_prefix = escaped_path + "\\\\"
+
+        def should_delete(section: _HiveSection) -> bool:
+            section_path = section.path.lower()
+            return section_path == escaped_path or section_path.startswith(subkey_prefix)
+
+        remaining = [section for section in self._sections if not should_delete(section)]
+        if len(remaining) == len(self._sections):
+            return False
+
+        self._sections = remaining
+        self._index = dict()
+
+        for section in self._sections:
+            self._index.setdefault(section.path.lower(), section)
+
+        self._index_links()
+        self._dirty = True
+
+        return True
+
+    def set_raw_value(self, key_path: str, value_name: Optional[str], raw_data: str):
+        """
+        Set a value, creating its key when needed
+        :param key_path: Path of the key, relative to the hive
+        :param value_name: Name of the value, None or '@' for the default value
+        :param raw_data: The data as it appears in the hive, e.g. 'dword:00000001' or '"a string"'
+        """
+        self.add_key(key_path)
+        section = self._find_section(key_path)
+
+        if value_name is None or value_name == "@":
+            escaped_name = "@"
+            line = f"@={raw_data}"
+
+        else:
+            escaped_name = escape_registry_string(value_name)
+            line = f"\"{escaped_name}\"={raw_data}"
+
+        entry = section.find_value(escaped_name)
+
+        if entry is None:
+            # Keep the blank line that separates this key from the next one at the end
+            insert_at = len(section.entries)
+            while insert_at > 0 and not section.entries[insert_at - 1].lines[0].strip():
+                insert_at -= 1
+
+            section.entries.insert(insert_at, _HiveEntry([line], escaped_name))
+
+        else:
+            trailing_lines = [ln for ln in entry.lines[1:] if not ln.strip() or ln.startswith(";")]
+            entry.lines = [line, *trailing_lines]
+
+        section.touch(self._uses_time_metadata)
+        self._dirty = True
+
+    def set_string_value(self, key_path: str, value_name: Optional[str], value: str):
+        self.set_raw_value(key_path, value_name, f"\"{escape_registry_string(value)}\"")
+
+    def set_dword_value(self, key_path: str, value_name: Optional[str], value: int):
+        self.set_raw_value(key_path, value_name, f"dword:{value & 0xFFFFFFFF:08x}")
+
+    def delete_value(self, key_path: str, value_name: Optional[str]) -> bool:
+        section = self._find_section(key_path)
+        if section is None:
+            return False
+
+        escaped_name = "@" if value_name is None or value_name == "@" else escape_registry_string(value_name)
+        entry = section.find_value(escaped_name)
+
+        if entry is None:
+            return False
+
+        # Comments and blank lines after the value stay where they are
+        trailing_lines = [ln for ln in entry.lines[1:] if not ln.strip() or ln.startswith(";")]
+        index = section.entries.index(entry)
+        section.entries[index:index + 1] = [_HiveEntry([ln]) for ln in trailing_lines]
+
+        section.touch(self._uses_time_metadata)
+        self._dirty = True
+
+        return True
+
+    def lines(self) -> Iterable[str]:
+        yield from self._preamble
+
+        for section in self._sections:
+            yield from section.lines()
+
+    def save(self):
+        """
+        Atomically replace the hive with the edited version.
+        Refuses to save when the hive was changed on disk since it was loaded.
+        """
+        if not self._dirty:
+            LOG.debug(f"Hive {self._path} has no changes, not saving")
+            return
+
+        current_stat = os.stat(self._path)
+        if self._loaded_stat is not None and \
+                (current_stat.st_mtime_ns, current_stat.st_size) != \
+                (self._loaded_stat.st_mtime_ns, self._loaded_stat.st_size):
+            raise RegistryHiveChanged(self._path)
+
+        text = "\n".join(self.lines())
+        if self._trailing_newline:
+            text += "\n"
+
+        fd, temp_path = tempfile.mkstemp(prefix=f".{self._path.name}.", dir=self._path.parent)
+
+        try:
+            with os.fdopen(fd, "w", encoding="UTF-8", errors="surrogateescape", newline="\n") as fp:
+                fp.write(text)
+                fp.flush()
+                os.fsync(fp.fileno())
+
+            os.chmod(temp_path, current_stat.st_mode & 0o7777)
+            os.replace(temp_path, self._path)
+
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+            raise
+
+        LOG.info(f"Saved registry hive {self._path}")
+
+        self._loaded_stat = os.stat(self._path)
+        self._dirty = False
+
+    def __enter__(self):
+        self.load()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.save()
+
+
+ROOT_KEY_HIVES = {
+    "HKEY_LOCAL_MACHINE": "system.reg",
+    "HKLM": "system.reg",
+    "HKEY_CURRENT_USER": "user.reg",
+    "HKCU": "user.reg"
+}
+
+# These parts of HKEY_LOCAL_MACHINE are mirrored for 32-bit applications, regedit has to run twice to cover them
+REDIRECTED_HKLM_PREFIXES = ("software",)
+
+
+def _join_continuation_lines(text: str) -> List[str]:
+    lines = []
+    pending = ""
+
+    for line in text.splitlines():
+        stripped = line.strip()
+
+        if pending:
+            stripped = pending + stripped
+            pending = ""
+
+        if stripped.endswith("\\") and not stripped.startswith(("[", ";")) and "=" in stripped:
+            pending = stripped[:-1]
+            continue
+
+        lines.append(stripped)
+
+    if pending:
+        lines.append(pending)
+
+    return lines
+
+
+def _unescape_reg_string(s: str) -> str:
+    result = []
+    i = 0
+
+    while i < len(s):
+        char = s[i]
+
+        if char == "\\" and i + 1 < len(s):
+            result.append(s[i + 1])
+            i += 2
+            continue
+
+        result.append(char)
+        i += 1
+
+    return "".join(result)
+
+
+def _split_reg_value_line(line: str):
+    if line.startswith("@="):
+        return None, line[2:]
+
+    name = _value_name(line)
+    if name is None:
+        raise UnsupportedOfflineRegistryEdit(f"Cannot parse registry line: {line}")
+
+    data = line[len(name) + 2:].lstrip()
+    if not data.startswith("="):
+        raise UnsupportedOfflineRegistryEdit(f"Cannot parse registry line: {line}")
+
+    return _unescape_reg_string(name), data[1:].strip()
+
+
+def _reg_data_to_hive_data(data: str) -> str:
+    if data.startswith("\"") and data.endswith("\"") and len(data) >= 2:
+        return f"\"{escape_registry_string(_unescape_reg_string(data[1:-1]))}\""
+
+    lowered = data.lower()
+    if lowered.startswith(("dword:", "hex:", "hex(")):
+        return data.replace(" ", "")
+
+    raise UnsupportedOfflineRegistryEdit(f"Unsupported registry data: {data}")
+
+
+def apply_registry_text(text: str, prefix_directory: Path, writers: Optional[Dict[str, RegistryHiveWriter]] = None):
+    """
+    Apply the contents of a .reg file to the hives of a prefix, like 'regedit /S' would.
+    Only keys under HKEY_LOCAL_MACHINE\\System and HKEY_CURRENT_USER are supported, because other parts of the
+    registry are redirected for 32-bit applications. UnsupportedOfflineRegistryEdit is raised for anything else, before
+    any hive is saved.
+    :param text: Contents of the .reg file
+    :param prefix_directory: The prefix that contains the hives
+    :param writers: Hive writers that are already loaded, by hive file name. Missing writers are loaded on demand.
+    :return: The writers that were used, the caller is responsible for saving them
+    """
+    writers = writers if writers is not None else dict()
+
+    hive: Optional[RegistryHiveWriter] = None
+    key_path: Optional[str] = None
+
+    def get_writer(hive_name: str) -> RegistryHiveWriter:
+        if hive_name not in writers:
+            writer = RegistryHiveWriter(prefix_directory / hive_name)
+            writer.load()
+            writers[hive_name] = writer
+
+        return writers[hive_name]
+
+    for line in _join_continuation_lines(text):
+        if not line or line.startswith(";") or line in (REGISTRY_HEADER, LEGACY_REGISTRY_HEADER):
+            continue
+
+        if line.startswith("["):
+            delete = line.startswith("[-")
+            full_path = line[2 if delete else 1:].rstrip("]").strip()
+            root, _, relative_path = full_path.partition("\\")
+
+            hive_name = ROOT_KEY_HIVES.get(root.upper(), None)
+            if hive_name is None:
+                raise UnsupportedOfflineRegistryEdit(f"Unsupported root key: {root}")
+
+            if hive_name == "system.reg" and relative_path.lower().startswith(REDIRECTED_HKLM_PREFIXES):
+                raise UnsupportedOfflineRegistryEdit(f"Key is redirected for 32-bit applications: {full_path}")
+
+            hive = get_writer(hive_name)
+            key_path = relative_path
+
+            if delete:
+                hive.delete_key(key_path)
+                hive, key_path = None, None
+
+            else:
+                hive.add_key(key_path)
+
+            continue
+
+        if hive is None:
+            continue
+
+        value_name, data = _split_reg_value_line(line)
+
+        if data == "-":
+            hive.delete_value(key_path, value_name)
+
+        else:
+            hive.set_raw_value(key_path, value_name, _reg_data_to_hive_data(data))
+
+    return writers
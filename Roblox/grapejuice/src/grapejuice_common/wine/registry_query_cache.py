@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, asdict, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, TypeVar
+
+from grapejuice_common.util import atomic_write
+from grapejuice_common.wine.registry_file import RegistryFile
+
+LOG = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_cache_lock = threading.Lock()
+
+
+def hive_signature(hive_path: Path) -> List[int]:
+    """
+    Wineserver saves a hive by writing a new file and renaming it over the old one, so the inode changes along with
+    the mtime and the size
+    """
+    hive_stat = os.stat(hive_path)
+
+    return [hive_stat.st_size, hive_stat.st_mtime_ns, hive_stat.st_ino]
+
+
+@dataclass
+class CachedHive:
+    signature: List[int]
+    results: Dict[str, Any] = field(default_factory=dict)
+
+
+class RegistryQueryCache:
+    """
+    Results of queries on the registry hives of a prefix, stored next to the hives. The results for a hive are
+    thrown away as soon as the hive changes. Only results are stored, so queries that look at secrets should return
+    something that does not contain them.
+    """
+    _path: Path
+
+    def __init__(self, path: Path):
+        self._path = path
+
+    def _load(self) -> Dict[str, CachedHive]:
+        try:
+            with self._path.open("r", encoding="UTF-8") as fp:
+                return {name: CachedHive(**hive) for name, hive in json.load(fp).items()}
+
+        except FileNotFoundError:
+            return dict()
+
+        except (ValueError, TypeError) as e:
+            LOG.warning(f"Ignoring invalid registry query cache {self._path}: {type(e).__name__}: {e}")
+            return dict()
+
+    def _store(self, hive_name: str, signature: List[int], query_name: str, result: Any):
+        with _cache_lock:
+            # Another Grapejuice process might have written the cache in the meantime
+            hives = self._load()
+
+            hive = hives.get(hive_name, None)
+            if hive is None or hive.signature != signature:
+                hive = hives[hive_name] = CachedHive(signature=signature)
+
+            hive.results[query_name] = result
+
+            serialized = json.dumps({name: asdict(hive) for name, hive in hives.items()}, indent=2)
+
+            try:
+                atomic_write(self._path, serialized.encode("UTF-8"))
+
+            except OSError as e:
+                LOG.warning(f"Could not store registry query cache {self._path}: {type(e).__name__}: {e}")
+
+    def query(self, hive_path: Path, query_name: str, query: Callable[[RegistryFile], T]) -> T:
+        """
+        Run a query on a hive, unless its result is cached for the hive as it is on disk now
+        :param hive_path: Path to the hive
+        :param query_name: Name that identifies the query, its result has to be JSON serializable
+        :param query: Function that answers the query from the hive
+        :return: The result of the query
+        """
+        # Taken before the hive is read, a hive that changes while it is read is queried again next time
+        signature = hive_signature(hive_path)
+        hive = self._load().get(hive_path.name, None)
+
+        if hive is not None and hive.signature == signature and query_name in hive.results:
+            LOG.debug(f"Using cached result of {query_name} on {hive_path}")
+            return hive.results[query_name]
+
+        result = query(RegistryFile(hive_path))
+        self._store(hive_path.name, signature, query_name, result)
+
+        return result
@@ -0,0 +1,147 @@
+import codecs
+import logging
+from pathlib import Path
+from string import Template
+from typing import List, Callable, Optional, Dict
+
+from grapejuice_common.errors import LegacyRegistryFormat
+
+LOG = logging.getLogger(__name__)
+
+REGISTRY_HEADER = "Windows Registry Editor Version 5.00"
+LEGACY_REGISTRY_HEADER = "REGEDIT4"
+REGISTRY_LINE_SEPARATOR = "\r\n"
+
+
+def decode_registry_file(data: bytes) -> str:
+    """
+    Registry files exported by regedit are UTF-16 with a byte order mark, hand written ones are usually UTF-8
+    :param data: Raw contents of a .reg file
+    :return: The decoded contents
+    """
+    if data.startswith(codecs.BOM_UTF16_LE) or data.startswith(codecs.BOM_UTF16_BE):
+        return data.decode("UTF-16")
+
+    return data.decode("UTF-8-sig")
+
+
+def is_legacy_registry_file(text: str) -> bool:
+    """
+    REGEDIT4 files hold hex(1), hex(2) and hex(7) strings as ANSI bytes, version 5 files hold them as UTF-16
+    :param text: Contents of a .reg file
+    :return: Whether the file has a REGEDIT4 header
+    """
+    for line in text.splitlines():
+        if line.strip():
+            return line.strip() == LEGACY_REGISTRY_HEADER
+
+    return False
+
+
+def registry_fragment_body(text: str) -> List[str]:
+    """
+    Strip the header from a registry file, leaving the key and value lines
+    :param text: Contents of a .reg file
+    :return: The lines of the file after the header
+    """
+    lines = text.splitlines()
+
+    while lines and not lines[0].strip():
+        lines.pop(0)
+
+    if lines and lines[0].strip() in (REGISTRY_HEADER, LEGACY_REGISTRY_HEADER):
+        lines.pop(0)
+
+    while lines and not lines[-1].strip():
+        lines.pop()
+
+    return lines
+
+
+def merge_registry_fragments(fragments: List[str]) -> str:
+    """
+    Merge any number of registry files into one that can be imported with a single regedit call
+    :param fragments: Contents of the .reg files, in the order they should be applied
+    :return: Contents of the merged .reg file
+    """
+    lines = [REGISTRY_HEADER, ""]
+
+    for fragment in fragments:
+        body = registry_fragment_body(fragment)
+
+        if body:
+            lines.extend(body)
+            lines.append("")
+
+    return REGISTRY_LINE_SEPARATOR.join(lines) + REGISTRY_LINE_SEPARATOR
+
+
+def encode_registry_file(text: str) -> bytes:
+    return codecs.BOM_UTF16_LE + text.encode("UTF-16-LE")
+
+
+class RegistryTransaction:
+    """
+    Collects registry fragments and imports all of them at once when committed.
+    Using the transaction as a context manager commits it when the block exits without an error.
+    """
+    _fragments: List[str]
+    _import_function: Callable[[str], None]
+    _committed: bool = False
+
+    def __init__(self, import_function: Callable[[str], None]):
+        self._fragments = []
+        self._import_function = import_function
+
+    @property
+    def is_empty(self) -> bool:
+        return not any(registry_fragment_body(fragment) for fragment in self._fragments)
+
+    def add_fragment(self, text: str) -> "RegistryTransaction":
+        """
+        Add the contents of a registry file to the transaction
+        :param text: Contents of a version 5 .reg file
+        :return: The transaction, so calls can be chained
+        """
+        if is_legacy_registry_file(text):
+            raise LegacyRegistryFormat()
+
+        self._fragments.append(text)
+        return self
+
+    def add_file(self, registry_file: Path, patches: Optional[Dict[str, str]] = None) -> "RegistryTransaction":
+        """
+        Add the contents of a registry file to the transaction
+        :param registry_file: Path to the .reg file
+        :param patches: When given, the file is treated as a template and the patches are substituted into it
+        :return: The transaction, so calls can be chained
+        """
+        LOG.info(f"Adding registry file {registry_file} to transaction")
+        text = decode_registry_file(registry_file.read_bytes())
+
+        if patches is not None:
+            text = Template(text).safe_substitute(patches)
+
+        return self.add_fragment(text)
+
+    @property
+    def merged(self) -> str:
+        return merge_registry_fragments(self._fragments)
+
+    def commit(self):
+        assert not self._committed, "A registry transaction can only be committed once"
+        self._committed = True
+
+        if self.is_empty:
+            LOG.info("Registry transaction is empty, nothing to import")
+            return
+
+        LOG.info(f"Committing registry transaction with {len(self._fragments)} fragment(s)")
+        self._import_function(self.merged)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
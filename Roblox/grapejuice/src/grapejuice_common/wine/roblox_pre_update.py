@@ -0,0 +1,191 @@
+import logging
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+import requests
+
+from grapejuice_common import paths
+from grapejuice_common.errors import RobloxExecutableNotFound
+from grapejuice_common.logs.tracing import traced
+from grapejuice_common.roblox_product import RobloxProduct
+from grapejuice_common.util import roblox_version, file_lock
+from grapejuice_common.wine.wine_functions import prefixes_on_disk
+from grapejuice_common.wine.wine_process_scanner import scan_wine_processes
+from grapejuice_common.wine.wineprefix import Wineprefix
+from grapejuice_common.wine.wineprefix_roblox import PLAYER_EXECUTABLE_NAME
+
+LOG = logging.getLogger(__name__)
+
+STUDIO_EXECUTABLE_NAME = "RobloxStudioBeta.exe"
+
+
+@dataclass(frozen=True)
+class OutdatedProduct:
+    product: RobloxProduct
+    current_version: str
+
+
+def _update_lock_path(prefix: Wineprefix) -> Path:
+    # The lock lives outside the prefix, so taking it does not create a prefix that was not set up yet
+    return paths.roblox_update_locks_directory() / f"{prefix.configuration.id}.lock"
+
+
+@contextmanager
+def launch_lock(prefix: Wineprefix):
+    """
+    Hold off background updates of a prefix while a launch starts Roblox in it. When an update is already running,
+    the launch waits for it, the launcher would otherwise install the same version a second time.
+    :param prefix: The prefix that is being launched
+    """
+    lock_path = _update_lock_path(prefix)
+
+    with file_lock(lock_path, blocking=False) as locked:
+        if locked:
+            yield
+            return
+
+    LOG.info(f"Waiting for the background update of {prefix.configuration.display_name} to finish")
+
+    with file_lock(lock_path):
+        yield
+
+
+def _current_version(product: RobloxProduct, prefix: Wineprefix) -> Optional[str]:
+    release_channel = prefix.configuration.roblox_release_channel
+
+    # Checks run for as long as Grapejuice is open, a cached version that expired must not hide a new release
+    try:
+        if product is RobloxProduct.studio:
+            return roblox_version.studio_version_lookup(release_channel, allow_stale=False).version
+
+        return roblox_version.player_version_lookup(release_channel, allow_stale=False).version
+
+    except (requests.RequestException, ValueError, KeyError) as e:
+        LOG.warning(f"Could not determine the current {product.value} version: {type(e).__name__}: {e}")
+        return None
+
+
+def outdated_products(prefix: Wineprefix) -> List[OutdatedProduct]:
+    """
+    Compare the versions Roblox currently serves with the versions installed in a prefix.
+    Products that were never installed in the prefix are not reported.
+    :param prefix: The prefix to check
+    :return: The products that have a newer version available
+    """
+    index = prefix.roblox.version_index
+    outdated = []
+
+    for product, executable_name in (
+        (RobloxProduct.player, PLAYER_EXECUTABLE_NAME),
+        (RobloxProduct.studio, STUDIO_EXECUTABLE_NAME)
+    ):
+        if not index.executables(executable_name):
+            continue
+
+        current_version = _current_version(product, prefix)
+        if current_version is None:
+            continue
+
+        if index.find_version(current_version, executable_name) is None:
+            outdated.append(OutdatedProduct(product=product, current_version=current_version))
+
+    return outdated
+
+
+def machine_is_idle(prefix: Wineprefix, max_load: float) -> bool:
+    """
+    Check whether an update can run without getting in the way
+    :param prefix: The prefix that would be updated, it should not be running anything
+    :param max_load: Highest one minute load average per CPU that still counts as idle
+    :return: Whether the machine is idle
+    """
+    if scan_wine_processes(prefix.paths.base_directory):
+        LOG.info(f"Not updating {prefix.configuration.display_name}, it is running programs")
+        return False
+
+    try:
+        load = os.getloadavg()[0] / (os.cpu_count() or 1)
+
+    except OSError:
+        # The load average is not available, the prefix being unused will have to do
+        return True
+
+    if load > max_load:
+        LOG.info(f"Not updating {prefix.configuration.display_name}, the load average per CPU is {load:.2f}")
+        return False
+
+    return True
+
+
+@traced("roblox/pre_update")
+def pre_update_prefix(prefix: Wineprefix, max_load: float, force: bool = False) -> List[OutdatedProduct]:
+    """
+    Install the current Roblox player in a prefix before anyone asks for it, so the next launch does not have to
+    wait for the launcher to update. The launcher has no way to update without showing its installer window, so
+    that window shows up while the update runs.
+    Only the player is updated. The Studio launcher always opens Studio once it has updated, so an outdated Studio
+    is just reported.
+    :param prefix: The prefix to update
+    :param max_load: Highest one minute load average per CPU that still counts as idle
+    :param force: Update even when the machine is not idle
+    :return: The products that were outdated
+    """
+    name = prefix.configuration.display_name
+    outdated = outdated_products(prefix)
+
+    if not outdated:
+        LOG.info(f"Roblox is up to date in {name}")
+        return outdated
+
+    for product in outdated:
+        LOG.info(f"{product.product.value} in {name} is outdated, the current version is {product.current_version}")
+
+    player = next((product for product in outdated if product.product is RobloxProduct.player), None)
+
+    if player is None:
+        return outdated
+
+    try:
+        launcher = prefix.roblox.roblox_player_launcher_path
+
+    except RobloxExecutableNotFound:
+        LOG.warning(f"Cannot update {name}, the Roblox player launcher is missing")
+        return outdated
+
+    # Launches wait for the lock, and the prefix is checked for running programs while holding it. A launch that
+    # started before the lock was taken is found by that check.
+    with file_lock(_update_lock_path(prefix), blocking=False) as locked:
+        if not locked:
+            LOG.info(f"Not updating {name}, Roblox is being launched in it")
+            return outdated
+
+        if not force and not machine_is_idle(prefix, max_load):
+            return outdated
+
+        # Without arguments the launcher installs the current version in its installer window and exits, just like
+        # during installation
+        prefix.core_control.run_exe(launcher)
+
+    if prefix.roblox.version_index.refresh().find_version(player.current_version, PLAYER_EXECUTABLE_NAME):
+        LOG.info(f"Installed Roblox {player.current_version} in {name}")
+
+    else:
+        LOG.warning(f"The launcher exited, but Roblox {player.current_version} is not installed in {name}")
+
+    return outdated
+
+
+def pre_update_all_prefixes(force: bool = False):
+    """
+    Pre-update Roblox in every prefix, using the background update settings
+    :param force: Update even when the machine is not idle
+    """
+    from grapejuice_common.features.settings import current_settings
+
+    max_load = current_settings.get_model().roblox_background_update_max_load
+
+    for prefix in prefixes_on_disk():
+        pre_update_prefix(prefix, max_load, force=force)
@@ -0,0 +1,396 @@
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, FrozenSet, Iterable, Any
+
+from grapejuice_common.util import atomic_write
+
+LOG = logging.getLogger(__name__)
+
+EXECUTABLE_SUFFIX = ".exe"
+
+# Changes made within the timestamp granularity of the file system do not necessarily change the mtime of a
+# directory, so directories that were modified very recently are read again until they have settled
+SETTLE_TIME_NS = 2_000_000_000
+
+# Grapejuice and Roblox write settings into this directory of a version, the rest of a version never changes
+SETTINGS_DIRECTORY_NAME = "ClientSettings"
+
+
+def app_settings_path(executable_path: Path) -> Path:
+    return executable_path.parent / SETTINGS_DIRECTORY_NAME / "ClientAppSettings.json"
+
+
+@dataclass(frozen=True)
+class RobloxVersion:
+    name: str
+    path: Path
+    mtime_ns: int
+    executables: FrozenSet[str]
+
+    def has_executable(self, executable_name: str) -> bool:
+        return executable_name in self.executables
+
+    def executable(self, executable_name: str) -> Path:
+        return self.path / executable_name
+
+    def settings_path(self, executable_name: str) -> Path:
+        return app_settings_path(self.executable(executable_name))
+
+
+@dataclass
+class _VersionsDirectory:
+    path: Path
+    mtime_ns: Optional[int] = None
+    loose_executables: FrozenSet[str] = frozenset()
+    versions: List[RobloxVersion] = field(default_factory=list)
+    # Versions that were still being written to when they were read, they are checked again on every query
+    unsettled: FrozenSet[str] = frozenset()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "mtime_ns": self.mtime_ns,
+            "loose_executables": sorted(self.loose_executables),
+            "versions": [
+                {"name": version.name, "mtime_ns": version.mtime_ns, "executables": sorted(version.executables)}
+                for version in self.versions
+            ],
+            "unsettled": sorted(self.unsettled)
+        }
+
+    def apply_dict(self, data: Dict[str, Any]):
+        self.mtime_ns = int(data["mtime_ns"]) if data["mtime_ns"] is not None else None
+        self.loose_executables = frozenset(data["loose_executables"])
+        self.versions = [
+            RobloxVersion(
+                name=version["name"],
+                path=self.path / version["name"],
+                mtime_ns=int(version["mtime_ns"]),
+                executables=frozenset(version["executables"])
+            )
+            for version in data["versions"]
+        ]
+        self.unsettled = frozenset(data["unsettled"])
+
+
+def _executable_names(entries: Iterable[os.DirEntry]) -> FrozenSet[str]:
+    names = set()
+
+    for entry in entries:
+        try:
+            if entry.name.lower().endswith(EXECUTABLE_SUFFIX) and entry.is_file():
+                names.add(entry.name)
+
+        except OSError:
+            continue
+
+    return frozenset(names)
+
+
+def _scan_version(path: Path, mtime_ns: int) -> Optional[RobloxVersion]:
+    try:
+        with os.scandir(path) as entries:
+            executables = _executable_names(entries)
+
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+    return RobloxVersion(name=path.name, path=path, mtime_ns=mtime_ns, executables=executables)
+
+
+def _settled(mtime_ns: int) -> bool:
+    return time.time_ns() - mtime_ns > SETTLE_TIME_NS
+
+
+def _mtime_ns(path: Path) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+def _unsettled_names(versions: List[RobloxVersion]) -> FrozenSet[str]:
+    return frozenset(version.name for version in versions if not _settled(version.mtime_ns))
+
+
+def _reuse_or_scan(
+    path: Path,
+    mtime_ns: int,
+    known: Optional[RobloxVersion],
+    unsettled: bool
+) -> Optional[RobloxVersion]:
+    if known is not None and known.mtime_ns == mtime_ns and not unsettled:
+        return known
+
+    return _scan_version(path, mtime_ns)
+
+
+def _update_versions(directory: _VersionsDirectory, check_all: bool) -> bool:
+    previous_unsettled = directory.unsettled
+    versions = []
+    changed = False
+
+    for version in directory.versions:
+        unsettled = version.name in directory.unsettled
+
+        if not (check_all or unsettled):
+            versions.append(version)
+            continue
+
+        version_mtime_ns = _mtime_ns(version.path)
+        updated = None
+
+        if version_mtime_ns is not None:
+            updated = _reuse_or_scan(version.path, version_mtime_ns, version, unsettled)
+
+        changed = changed or updated != version
+
+        if updated is not None:
+            versions.append(updated)
+
+    directory.versions = versions
+    directory.unsettled = _unsettled_names(versions)
+
+    return changed or directory.unsettled != previous_unsettled
+
+
+def _scan_directory(directory: _VersionsDirectory, mtime_ns: int):
+    LOG.debug(f"Indexing Roblox versions in {directory.path}")
+
+    known = {version.name: version for version in directory.versions}
+    loose_entries = []
+    versions = []
+
+    try:
+        with os.scandir(directory.path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        version = _reuse_or_scan(
+                            Path(entry.path),
+                            entry.stat().st_mtime_ns,
+                            known.get(entry.name, None),
+                            entry.name in directory.unsettled
+                        )
+
+                        if version is not None:
+                            versions.append(version)
+
+                    else:
+                        loose_entries.append(entry)
+
+                except OSError:
+                    continue
+
+    except (FileNotFoundError, NotADirectoryError):
+        mtime_ns = None
+
+    directory.mtime_ns = mtime_ns
+    directory.loose_executables = _executable_names(loose_entries)
+    directory.versions = versions
+    directory.unsettled = _unsettled_names(versions)
+
+
+class RobloxVersionIndex:
+    """
+    Index of the Roblox versions installed in the Versions directories of a prefix, stored in the prefix so new
+    Grapejuice processes do not have to read every version again.
+    Queries cost one stat call per Versions directory. Creating or removing a version changes the mtime of the
+    Versions directory, which makes the index look at the versions in it again, only versions with a changed mtime are
+    read. Extracting files into a version only changes the mtime of that version, refresh checks the mtime of every
+    version to pick that up.
+    """
+    _directories: List[_VersionsDirectory]
+    _cache_path: Optional[Path]
+
+    def __init__(self, versions_directories: Iterable[Path], cache_path: Optional[Path] = None):
+        self._directories = [_VersionsDirectory(path) for path in versions_directories]
+        self._cache_path = cache_path
+        self._lock = threading.Lock()
+
+        self._load()
+
+    def _load(self):
+        if self._cache_path is None:
+            return
+
+        try:
+            with self._cache_path.open("r", encoding="UTF-8") as fp:
+                stored = json.load(fp)["directories"]
+
+            for directory in self._directories:
+                # Paths that are not in the stored index, e.g. after the prefix was cloned, are indexed from scratch
+                if str(directory.path) in stored:
+                    directory.apply_dict(stored[str(directory.path)])
+
+        except FileNotFoundError:
+            pass
+
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            LOG.warning(f"Ignoring invalid Roblox version index {self._cache_path}: {type(e).__name__}: {e}")
+            self._directories = [_VersionsDirectory(directory.path) for directory in self._directories]
+
+    def _store(self):
+        if self._cache_path is None:
+            return
+
+        stored = {"directories": {str(directory.path): directory.as_dict() for directory in self._directories}}
+
+        try:
+            atomic_write(self._cache_path, json.dumps(stored, indent=2).encode("UTF-8"))
+
+        except OSError as e:
+            LOG.warning(f"Could not store Roblox version index {self._cache_path}: {type(e).__name__}: {e}")
+
+    def _refresh_directory(self, directory: _VersionsDirectory, check_versions: bool) -> bool:
+        """
+        :return: Whether the index of the directory has changed
+        """
+        mtime_ns = _mtime_ns(directory.path)
+
+        if mtime_ns is None:
+            changed = directory.mtime_ns is not None or bool(directory.versions)
+            directory.mtime_ns = None
+            directory.loose_executables = frozenset()
+            directory.versions = []
+            directory.unsettled = frozenset()
+
+            return changed
+
+        if mtime_ns == directory.mtime_ns and _settled(mtime_ns):
+            if not (check_versions or directory.unsettled):
+                return False
+
+            return _update_versions(directory, check_all=check_versions)
+
+        _scan_directory(directory, mtime_ns)
+
+        return True
+
+    def _refresh(self, check_versions: bool):
+        with self._lock:
+            changed = False
+
+            for directory in self._directories:
+                changed = self._refresh_directory(directory, check_versions) or changed
+
+            if changed:
+                self._store()
+
+    def refresh(self) -> "RobloxVersionIndex":
+        """
+        Check every version for changes, use this after something might have written into an existing version
+        :return: The index
+        """
+        self._refresh(check_versions=True)
+
+        return self
+
+    def _snapshot(self) -> List[Tuple[Path, FrozenSet[str], List[RobloxVersion]]]:
+        self._refresh(check_versions=False)
+
+        with self._lock:
+            return [
+                (directory.path, directory.loose_executables, list(directory.versions))
+                for directory in self._directories
+            ]
+
+    @property
+    def versions(self) -> List[RobloxVersion]:
+        return [version for _, _, versions in self._snapshot() for version in versions]
+
+    def loose_executable(self, versions_directory: Path, executable_name: str) -> Optional[Path]:
+        """
+        Find an executable that is placed directly in a Versions directory, which is where the launcher installs itself
+        :param versions_directory: The Versions directory to look in
+        :param executable_name: File name of the executable
+        :return: Path to the executable, or None when it is not there
+        """
+        for path, loose_executables, _ in self._snapshot():
+            if path == versions_directory and executable_name in loose_executables:
+                return path / executable_name
+
+        return None
+
+    def executables(self, executable_name: str) -> List[Path]:
+        """
+        Find every copy of an executable. For each Versions directory, the copy placed directly in it comes first,
+        followed by the copies in the versions it contains.
+        :param executable_name: File name of the executable
+        :return: Paths to the executable
+        """
+        found = []
+
+        for path, loose_executables, versions in self._snapshot():
+            if executable_name in loose_executables:
+                found.append(path / executable_name)
+
+            found.extend(
+                version.executable(executable_name)
+                for version in versions
+                if version.has_executable(executable_name)
+            )
+
+        return found
+
+    def settings_paths(self, executable_name: str) -> List[Path]:
+        return [app_settings_path(executable) for executable in self.executables(executable_name)]
+
+    def find_version(self, version_name: str, executable_name: Optional[str] = None) -> Optional[RobloxVersion]:
+        """
+        Find an installed version by name
+        :param version_name: Name of the version, like the clientVersionUpload reported by Roblox
+        :param executable_name: Only consider versions that contain this executable
+        :return: The version, or None when it is not installed
+        """
+        return next(
+            (
+                version
+                for version in self.versions
+                if version.name == version_name and (executable_name is None or version.has_executable(executable_name))
+            ),
+            None
+        )
+
+    def latest_version(self, executable_name: Optional[str] = None) -> Optional[RobloxVersion]:
+        """
+        Find the version that was changed most recently
+        :param executable_name: Only consider versions that contain this executable
+        :return: The latest version, or None when there are no matching versions
+        """
+        candidates = [
+            version
+            for version in self.versions
+            if executable_name is None or version.has_executable(executable_name)
+        ]
+
+        return max(candidates, key=lambda version: version.mtime_ns, default=None)
+
+
+_indexes: Dict[Tuple[Tuple[Path, ...], Optional[Path]], RobloxVersionIndex] = dict()
+_indexes_lock = threading.Lock()
+
+
+def roblox_version_index(versions_directories: Iterable[Path], cache_path: Optional[Path] = None) -> RobloxVersionIndex:
+    """
+    Get the shared index for a set of Versions directories, so every Wineprefix object of a prefix uses the same one
+    :param versions_directories: The Versions directories of a prefix
+    :param cache_path: Where the index is stored between Grapejuice processes
+    :return: The index for the directories
+    """
+    directories = tuple(versions_directories)
+    key = (directories, cache_path)
+
+    with _indexes_lock:
+        index = _indexes.get(key, None)
+
+        if index is None:
+            index = RobloxVersionIndex(directories, cache_path)
+            _indexes[key] = index
+
+    return index
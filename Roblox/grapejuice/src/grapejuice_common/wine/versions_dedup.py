@@ -0,0 +1,278 @@
+import json
+import logging
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from grapejuice_common import paths
+from grapejuice_common.logs.tracing import traced
+from grapejuice_common.util import atomic_write
+from grapejuice_common.util.download import file_digest
+from grapejuice_common.util.reflink import reflink
+from grapejuice_common.wine.roblox_version_index import SETTINGS_DIRECTORY_NAME
+from grapejuice_common.wine.wine_process_scanner import scan_wine_processes
+from grapejuice_common.wine.wineprefix import Wineprefix
+
+LOG = logging.getLogger(__name__)
+
+# Hashing is mostly waiting on the disk, hashlib releases the GIL for the rest
+DEFAULT_JOBS = min(8, (os.cpu_count() or 1) * 2)
+
+
+@dataclass(frozen=True)
+class HashedFile:
+    size: int
+    mtime_ns: int
+    inode: int
+    digest: str
+    # Reflinked by an earlier run, reflinks can not be told apart from copies by looking at the file
+    shared: bool = False
+
+
+@dataclass
+class DedupReport:
+    files: int = 0
+    bytes: int = 0
+    hashed_files: int = 0
+    duplicate_files: int = 0
+    bytes_saved: int = 0
+    reflinked: int = 0
+    hardlinked: int = 0
+    skipped_prefixes: int = 0
+
+
+@dataclass(frozen=True)
+class _File:
+    path: Path
+    stat: os.stat_result
+
+
+class HashIndex:
+    """
+    Digests of the files in the Versions directories, so files that have not changed since the last run are not read
+    again
+    """
+    _path: Path
+    _files: Dict[str, HashedFile]
+
+    def __init__(self, path: Path):
+        self._path = path
+        self._files = dict()
+
+    def load(self) -> "HashIndex":
+        try:
+            with self._path.open("r", encoding="UTF-8") as fp:
+                self._files = {path: HashedFile(**hashed) for path, hashed in json.load(fp).items()}
+
+        except FileNotFoundError:
+            self._files = dict()
+
+        except (ValueError, TypeError) as e:
+            LOG.warning(f"Ignoring invalid hash index {self._path}: {type(e).__name__}: {e}")
+            self._files = dict()
+
+        return self
+
+    def get(self, file: _File) -> Optional[HashedFile]:
+        hashed = self._files.get(str(file.path), None)
+
+        if hashed is None:
+            return None
+
+        if (hashed.size, hashed.mtime_ns, hashed.inode) != (file.stat.st_size, file.stat.st_mtime_ns, file.stat.st_ino):
+            return None
+
+        return hashed
+
+    def put(self, file: _File, digest: str, shared: bool = False):
+        self._files[str(file.path)] = HashedFile(
+            size=file.stat.st_size,
+            mtime_ns=file.stat.st_mtime_ns,
+            inode=file.stat.st_ino,
+            digest=digest,
+            shared=shared
+        )
+
+    def keep_only(self, files: Iterable[_File], directories: Iterable[Path]):
+        """
+        Forget the files in the scanned directories that were not found again. Files elsewhere belong to prefixes that
+        were skipped or not asked for this time, they are kept for as long as they exist.
+        :param files: The files that were found
+        :param directories: The directories that were scanned
+        """
+        keep = {str(file.path) for file in files}
+        scanned = tuple(os.path.join(str(directory), "") for directory in directories)
+
+        def is_kept(path: str) -> bool:
+            if path in keep:
+                return True
+
+            if path.startswith(scanned):
+                return False
+
+            return os.path.lexists(path)
+
+        self._files = {path: hashed for path, hashed in self._files.items() if is_kept(path)}
+
+    def save(self):
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+
+        serialized = json.dumps({path: asdict(hashed) for path, hashed in self._files.items()})
+        atomic_write(self._path, serialized.encode("UTF-8"))
+
+
+def _version_files(version_directory: Path) -> Iterable[_File]:
+    for directory, directory_names, file_names in os.walk(version_directory):
+        # Settings are changed in place, sharing them between prefixes would be wrong
+        directory_names[:] = [name for name in directory_names if name != SETTINGS_DIRECTORY_NAME]
+
+        for name in file_names:
+            path = Path(directory, name)
+            file_stat = os.lstat(path)
+
+            if stat.S_ISREG(file_stat.st_mode):
+                yield _File(path, file_stat)
+
+
+def _collect_files(prefixes: Iterable[Wineprefix], report: DedupReport) -> Tuple[List[_File], List[Path]]:
+    """
+    :return: The files in the Roblox versions, and the base directories of the prefixes that were scanned for them
+    """
+    files = []
+    scanned = []
+
+    for prefix in prefixes:
+        if scan_wine_processes(prefix.paths.base_directory):
+            LOG.info(f"Skipping {prefix.configuration.display_name}, it is running programs")
+            report.skipped_prefixes += 1
+            continue
+
+        for version in prefix.roblox.version_index.versions:
+            files.extend(_version_files(version.path))
+
+        scanned.append(prefix.paths.base_directory)
+
+    return files, scanned
+
+
+def _replace_with_link(canonical: _File, duplicate: _File) -> str:
+    """
+    Replace a file with a reflink or hardlink of an identical file, without ever leaving the path missing
+    :return: 'reflinked' or 'hardlinked'
+    """
+    temporary_path = duplicate.path.parent / f".{duplicate.path.name}.dedup"
+
+    if reflink(canonical.path, temporary_path):
+        kind = "reflinked"
+
+    else:
+        os.link(canonical.path, temporary_path)
+        kind = "hardlinked"
+
+    try:
+        if kind == "reflinked":
+            os.chmod(temporary_path, duplicate.stat.st_mode & 0o7777)
+            os.utime(temporary_path, ns=(duplicate.stat.st_atime_ns, duplicate.stat.st_mtime_ns))
+
+        os.replace(temporary_path, duplicate.path)
+
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+    return kind
+
+
+@traced("wine/dedup_versions")
+def dedup_versions(prefixes: Iterable[Wineprefix], dry_run: bool = False, jobs: int = DEFAULT_JOBS) -> DedupReport:
+    """
+    Replace identical files in the Roblox versions of several prefixes with reflinks, or hardlinks when the file
+    system has no reflinks. Prefixes that are running programs are left alone.
+    :param prefixes: The prefixes to deduplicate
+    :param dry_run: Only report what would be saved
+    :param jobs: Number of files to hash at the same time
+    :return: What was found and done
+    """
+    report = DedupReport()
+    index = HashIndex(paths.versions_hash_index_location()).load()
+    files, scanned_directories = _collect_files(prefixes, report)
+
+    report.files = len(files)
+    report.bytes = sum(file.stat.st_size for file in files)
+
+    # Only files that have the same size and live on the same device can be linked, the rest is not even hashed
+    by_size: Dict[Tuple[int, int], List[_File]] = dict()
+    for file in files:
+        by_size.setdefault((file.stat.st_dev, file.stat.st_size), []).append(file)
+
+    candidates = [file for group in by_size.values() if len(group) > 1 for file in group]
+    to_hash = [file for file in candidates if index.get(file) is None]
+
+    def hash_file(file: _File) -> str:
+        return file_digest(file.path)
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1), thread_name_prefix="dedup") as executor:
+        for file, digest in zip(to_hash, executor.map(hash_file, to_hash)):
+            index.put(file, digest)
+
+    report.hashed_files = len(to_hash)
+
+    by_digest: Dict[Tuple[int, str], List[_File]] = dict()
+    for file in candidates:
+        by_digest.setdefault((file.stat.st_dev, index.get(file).digest), []).append(file)
+
+    reflinked_paths = set()
+
+    for group in by_digest.values():
+        canonical = group[0]
+        counted_inodes = {canonical.stat.st_ino}
+
+        for duplicate in group[1:]:
+            if duplicate.stat.st_ino == canonical.stat.st_ino or index.get(duplicate).shared:
+                continue
+
+            report.duplicate_files += 1
+
+            # Hardlinked copies only free their space once all of them are replaced
+            if duplicate.stat.st_ino not in counted_inodes:
+                counted_inodes.add(duplicate.stat.st_ino)
+                report.bytes_saved += duplicate.stat.st_size
+
+            if dry_run:
+                continue
+
+            kind = _replace_with_link(canonical, duplicate)
+            setattr(report, kind, getattr(report, kind) + 1)
+
+            if kind == "reflinked":
+                reflinked_paths.add(duplicate.path)
+
+            LOG.debug(f"{kind.capitalize()} {duplicate.path} to {canonical.path}")
+
+    if not dry_run:
+        # Linked files have new inodes, they would be hashed again on the next run unless they are updated here
+        previous = {file.path: index.get(file) for file in files}
+        files = list(_refresh_stats(files))
+
+        for file in files:
+            hashed = previous.get(file.path, None)
+
+            if hashed is not None:
+                index.put(file, hashed.digest, shared=hashed.shared or file.path in reflinked_paths)
+
+    index.keep_only(files, scanned_directories)
+    index.save()
+
+    return report
+
+
+def _refresh_stats(files: Iterable[_File]) -> Iterable[_File]:
+    for file in files:
+        try:
+            yield _File(file.path, os.lstat(file.path))
+
+        except FileNotFoundError:
+            continue
@@ -0,0 +1,211 @@
+import logging
+import os
+import shutil
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+import requests
+
+from grapejuice_common.logs.tracing import traced
+from grapejuice_common.roblox_product import RobloxProduct
+from grapejuice_common.util import roblox_version
+from grapejuice_common.wine.roblox_version_index import RobloxVersion
+from grapejuice_common.wine.wine_process_scanner import scan_wine_processes
+from grapejuice_common.wine.wineprefix import Wineprefix
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_VERSIONS_TO_KEEP = 1
+SIZE_JOBS = 4
+
+_PRODUCT_EXECUTABLES = (
+    (RobloxProduct.player, "RobloxPlayerBeta.exe"),
+    (RobloxProduct.studio, "RobloxStudioBeta.exe")
+)
+
+
+@dataclass(frozen=True)
+class StaleVersion:
+    version: RobloxVersion
+    product: Optional[RobloxProduct]
+    size: int
+    # Files that are hardlinked from elsewhere do not free anything when they are removed
+    reclaimable_size: int
+
+
+@dataclass(frozen=True)
+class GcPlan:
+    prefix: Wineprefix
+    kept: List[RobloxVersion]
+    stale: List[StaleVersion]
+
+    @property
+    def reclaimable_size(self) -> int:
+        return sum(stale.reclaimable_size for stale in self.stale)
+
+
+def _product_of(version: RobloxVersion) -> Optional[RobloxProduct]:
+    for product, executable_name in _PRODUCT_EXECUTABLES:
+        if version.has_executable(executable_name):
+            return product
+
+    return None
+
+
+def _current_version(prefix: Wineprefix, product: RobloxProduct) -> Optional[str]:
+    release_channel = prefix.configuration.roblox_release_channel
+
+    try:
+        if product is RobloxProduct.studio:
+            return roblox_version.current_studio_version(release_channel)
+
+        return roblox_version.current_player_version(release_channel)
+
+    except (requests.RequestException, ValueError, KeyError) as e:
+        LOG.warning(f"Could not determine the current {product.value} version: {type(e).__name__}: {e}")
+        return None
+
+
+def _directory_size(path: Path) -> Tuple[int, int]:
+    size = 0
+    reclaimable_size = 0
+
+    for directory, _, file_names in os.walk(path):
+        for name in file_names:
+            try:
+                file_stat = os.lstat(os.path.join(directory, name))
+
+            except FileNotFoundError:
+                continue
+
+            if not stat.S_ISREG(file_stat.st_mode):
+                continue
+
+            size += file_stat.st_size
+
+            if file_stat.st_nlink <= 1:
+                reclaimable_size += file_stat.st_size
+
+    return size, reclaimable_size
+
+
+def versions_in_use(prefix: Wineprefix) -> Set[str]:
+    """
+    Find the versions that running programs were started from
+    :param prefix: The prefix to look in
+    :return: Lowercase names of the versions
+    """
+    in_use = set()
+
+    for process in scan_wine_processes(prefix.paths.base_directory):
+        command_line = " ".join(process.command_line).lower().replace("/", "\\")
+
+        for part in command_line.split("\\"):
+            if part.startswith("version-"):
+                in_use.add(part.split(" ", 1)[0])
+
+    return in_use
+
+
+@traced("roblox/plan_versions_gc")
+def plan_gc(prefix: Wineprefix, keep: int = DEFAULT_VERSIONS_TO_KEEP) -> GcPlan:
+    """
+    Decide which Roblox versions of a prefix can be removed. For every product, the current version of the configured
+    release channel is kept, along with the given number of other versions that were installed most recently. When
+    the current version is unknown or not installed, the newest version takes its place. Versions that are in use and
+    versions of unknown products are always kept.
+    :param prefix: The prefix to clean up
+    :param keep: Number of versions to keep per product besides the current one
+    :return: What would be kept and removed
+    """
+    versions = prefix.roblox.version_index.versions
+    in_use = versions_in_use(prefix)
+    kept = []
+    stale = []
+
+    for product, _ in _PRODUCT_EXECUTABLES:
+        product_versions = sorted(
+            (version for version in versions if _product_of(version) is product),
+            key=lambda version: version.mtime_ns,
+            reverse=True
+        )
+
+        if not product_versions:
+            continue
+
+        current = _current_version(prefix, product)
+
+        if current is None or all(version.name != current for version in product_versions):
+            # Without knowing which version is current, the newest one is the best guess. Removing every version
+            # would leave nothing to start.
+            LOG.info(f"Current {product.value} version is not installed or unknown, keeping the newest one")
+            current = product_versions[0].name
+
+        previous_kept = 0
+
+        for version in product_versions:
+            if version.name == current or version.name.lower() in in_use:
+                kept.append(version)
+
+            elif previous_kept < keep:
+                previous_kept += 1
+                kept.append(version)
+
+            else:
+                stale.append(version)
+
+    kept.extend(version for version in versions if _product_of(version) is None)
+
+    with ThreadPoolExecutor(max_workers=SIZE_JOBS, thread_name_prefix="versions-gc") as executor:
+        sizes = list(executor.map(lambda version: _directory_size(version.path), stale))
+
+    return GcPlan(
+        prefix=prefix,
+        kept=kept,
+        stale=[
+            StaleVersion(version=version, product=_product_of(version), size=size, reclaimable_size=reclaimable_size)
+            for version, (size, reclaimable_size) in zip(stale, sizes)
+        ]
+    )
+
+
+@traced("roblox/run_versions_gc")
+def run_gc(plan: GcPlan) -> List[StaleVersion]:
+    """
+    Remove the stale versions of a plan. Every version is moved out of its Versions directory before it is deleted,
+    so Roblox and Grapejuice never see half removed versions. Versions that came into use after the plan was made
+    are left alone.
+    :param plan: The plan made by plan_gc
+    :return: The versions that were removed
+    """
+    prefix = plan.prefix
+    trash = prefix.paths.base_directory / ".grapejuice_trash"
+
+    # Left over from a run that was interrupted
+    shutil.rmtree(trash, ignore_errors=True)
+    trash.mkdir()
+    removed = []
+
+    for stale in plan.stale:
+        if stale.version.name.lower() in versions_in_use(prefix):
+            LOG.info(f"Not removing {stale.version.name}, it is in use")
+            continue
+
+        trashed_path = trash / stale.version.name
+
+        try:
+            os.rename(stale.version.path, trashed_path)
+
+        except FileNotFoundError:
+            continue
+
+        LOG.info(f"Removing Roblox version {stale.version.path}")
+        shutil.rmtree(trashed_path, ignore_errors=True)
+        removed.append(stale)
+
+    shutil.rmtree(trash, ignore_errors=True)
+
+    return removed
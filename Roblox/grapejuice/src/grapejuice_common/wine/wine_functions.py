@@ -2,7 +2,7 @@ import logging
 import uuid
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Generator
 
 from grapejuice_common.errors import WineprefixNotFoundUsingHints, HardwareProfilingError
 from grapejuice_common.hardware_info.hardware_profile import HardwareProfile
@@ -65,6 +65,17 @@ def find_wineprefix(prefix_id: str) -> Wineprefix:
     return Wineprefix(configuration=current_settings.find_wineprefix(prefix_id))
 
 
+def prefixes_on_disk() -> Generator[Wineprefix, None, None]:
+    from grapejuice_common.features.settings import current_settings
+
+    for configuration in current_settings.get_model().wineprefixes:
+        # Copy the object so the `Wineprefix` object cannot interfere with existing settings
+        prefix = Wineprefix(configuration=configuration.copy(deep=True))
+
+        if prefix.paths.present_on_disk:
+            yield prefix
+
+
 def _dll_overrides(settings) -> str:
     return settings.get("dll_overrides", "dxdiagn=;winemenubuilder.exe=")
 
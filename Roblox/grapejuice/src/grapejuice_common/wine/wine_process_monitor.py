@@ -0,0 +1,140 @@
+import os
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import List, Dict, Optional, Any
+
+from grapejuice_common.wine.wine_process_scanner import PROC, read_proc_file, scan_wine_processes, stat_field
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+@dataclass(frozen=True)
+class _Counters:
+    start_time: int
+    cpu_ticks: int
+    read_bytes: int
+    write_bytes: int
+    context_switches: int
+    sampled_at: float
+
+
+@dataclass(frozen=True)
+class ProcessSample:
+    pid: int
+    image: str
+    cpu_percent: float
+    rss_bytes: int
+    threads: int
+    read_bytes: int
+    write_bytes: int
+    read_bytes_per_second: float
+    write_bytes_per_second: float
+    voluntary_context_switches: int
+    involuntary_context_switches: int
+    context_switches_per_second: float
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _status_values(status: bytes) -> Dict[bytes, bytes]:
+    values = dict()
+
+    for line in status.split(b"\n"):
+        key, _, value = line.partition(b":")
+        values[key] = value.strip()
+
+    return values
+
+
+def _io_values(io: Optional[bytes]) -> Dict[bytes, int]:
+    values = dict()
+
+    for line in (io or b"").split(b"\n"):
+        key, _, value = line.partition(b":")
+
+        if value.strip():
+            values[key] = int(value)
+
+    return values
+
+
+def _rate(current: int, previous: int, seconds: float) -> float:
+    if seconds <= 0:
+        return 0.0
+
+    return max(current - previous, 0) / seconds
+
+
+class WineProcessMonitor:
+    """
+    Samples resource usage of the processes in a prefix from /proc, like 'top -p' would.
+    CPU usage and rates are computed against the previous sample, so the first sample reports them as zero.
+    CPU usage is relative to a single core.
+    """
+    _prefix_directory: Path
+    _previous: Dict[int, _Counters]
+
+    def __init__(self, prefix_directory: Path):
+        self._prefix_directory = prefix_directory
+        self._previous = dict()
+
+    def sample(self) -> List[ProcessSample]:
+        samples = []
+        current = dict()
+
+        for process in scan_wine_processes(self._prefix_directory):
+            process_directory = PROC / str(process.unix_pid)
+
+            stat = read_proc_file(process_directory / "stat")
+            status = read_proc_file(process_directory / "status")
+
+            if stat is None or status is None:
+                continue
+
+            sampled_at = time.monotonic()
+            status_values = _status_values(status)
+            io_values = _io_values(read_proc_file(process_directory / "io"))
+
+            voluntary = int(status_values.get(b"voluntary_ctxt_switches", 0))
+            involuntary = int(status_values.get(b"nonvoluntary_ctxt_switches", 0))
+
+            counters = _Counters(
+                start_time=int(stat_field(stat, 22)),
+                cpu_ticks=int(stat_field(stat, 14)) + int(stat_field(stat, 15)),
+                read_bytes=io_values.get(b"read_bytes", 0),
+                write_bytes=io_values.get(b"write_bytes", 0),
+                context_switches=voluntary + involuntary,
+                sampled_at=sampled_at
+            )
+
+            previous = self._previous.get(process.unix_pid, None)
+
+            # A different start time means the pid was reused by another process
+            if previous is None or previous.start_time != counters.start_time:
+                previous = counters
+
+            seconds = counters.sampled_at - previous.sampled_at
+
+            samples.append(ProcessSample(
+                pid=process.unix_pid,
+                image=process.image,
+                cpu_percent=_rate(counters.cpu_ticks, previous.cpu_ticks, seconds) / CLOCK_TICKS * 100.0,
+                rss_bytes=int(stat_field(stat, 24)) * PAGE_SIZE,
+                threads=int(stat_field(stat, 20)),
+                read_bytes=counters.read_bytes,
+                write_bytes=counters.write_bytes,
+                read_bytes_per_second=_rate(counters.read_bytes, previous.read_bytes, seconds),
+                write_bytes_per_second=_rate(counters.write_bytes, previous.write_bytes, seconds),
+                voluntary_context_switches=voluntary,
+                involuntary_context_switches=involuntary,
+                context_switches_per_second=_rate(counters.context_switches, previous.context_switches, seconds)
+            ))
+
+            current[process.unix_pid] = counters
+
+        self._previous = current
+
+        return samples
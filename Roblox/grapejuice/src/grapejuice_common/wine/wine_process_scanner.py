@@ -0,0 +1,168 @@
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+LOG = logging.getLogger(__name__)
+
+PROC = Path(os.path.sep, "proc")
+WINEPREFIX_VARIABLE = b"WINEPREFIX="
+
+# Processes Wine keeps around in a prefix after the programs in it have exited, they go away with the wineserver
+WINE_INFRASTRUCTURE_IMAGES = {
+    "wineserver",
+    "wine",
+    "wine64",
+    "wine-preloader",
+    "wine64-preloader",
+    "services.exe",
+    "explorer.exe",
+    "winedevice.exe",
+    "plugplay.exe",
+    "svchost.exe",
+    "rpcss.exe",
+    "conhost.exe"
+}
+
+
+@dataclass(frozen=True)
+class WineProcess:
+    pid: str
+    threads: int
+    image: str
+    unix_pid: Optional[int] = None
+    command_line: Tuple[str, ...] = ()
+
+
+def read_proc_file(path: Path) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as fp:
+            return fp.read()
+
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        # The process exited while we were looking at it, or it is not ours to look at
+        return None
+
+
+def _environment_value(environ: bytes, variable: bytes) -> Optional[bytes]:
+    for entry in environ.split(b"\0"):
+        if entry.startswith(variable):
+            return entry[len(variable):]
+
+    return None
+
+
+def stat_field(stat: bytes, number: int) -> bytes:
+    """
+    Get a field from the contents of /proc/<pid>/stat
+    :param stat: Contents of the stat file
+    :param number: Number of the field as documented in proc(5), starting at 1
+    :return: The raw field
+    """
+    assert number >= 3, "The pid and command name cannot be read with stat_field"
+
+    # The command name is in parentheses and may contain spaces, fields after it are separated by spaces
+    fields = stat[stat.rfind(b")") + 2:].split(b" ")
+
+    # The state field, number 3, is the first one after the command name
+    return fields[number - 3]
+
+
+def _thread_count(stat: bytes) -> int:
+    return int(stat_field(stat, 20))
+
+
+def image_name(command_line: Tuple[str, ...], fallback: str = "") -> str:
+    """
+    Wine replaces argv[0] of a process with the Windows path of its executable
+    :param command_line: The command line of the process
+    :param fallback: Name to use when the command line is empty
+    :return: The file name of the executable
+    """
+    if not command_line or not command_line[0]:
+        return fallback
+
+    return command_line[0].replace("\\", "/").rstrip("/").split("/")[-1]
+
+
+def _canonical_prefix(prefix: Union[bytes, str, Path]) -> str:
+    if isinstance(prefix, bytes):
+        prefix = os.fsdecode(prefix)
+
+    return os.path.realpath(os.path.expanduser(str(prefix)))
+
+
+def scan_wine_processes(prefix_directory: Path) -> List[WineProcess]:
+    """
+    Find the processes that run in a Wineprefix by looking at their environment in /proc.
+    This does not talk to the wineserver at all, so it is cheap and never starts one.
+    :param prefix_directory: Base directory of the prefix
+    :return: The processes that have WINEPREFIX pointing at the prefix
+    """
+    target = _canonical_prefix(prefix_directory)
+    uid = os.getuid()
+    resolved_prefixes = dict()
+    found = []
+
+    try:
+        entries = list(os.scandir(PROC))
+
+    except FileNotFoundError:
+        LOG.warning(f"{PROC} is not available, cannot scan for wine processes")
+        return []
+
+    for entry in entries:
+        if not entry.name.isdigit():
+            continue
+
+        try:
+            if entry.stat().st_uid != uid:
+                continue
+
+        except FileNotFoundError:
+            continue
+
+        process_directory = PROC / entry.name
+        environ = read_proc_file(process_directory / "environ")
+
+        if not environ or WINEPREFIX_VARIABLE not in environ:
+            continue
+
+        wineprefix = _environment_value(environ, WINEPREFIX_VARIABLE)
+        if wineprefix is None:
+            continue
+
+        if wineprefix not in resolved_prefixes:
+            resolved_prefixes[wineprefix] = _canonical_prefix(wineprefix)
+
+        if resolved_prefixes[wineprefix] != target:
+            continue
+
+        stat = read_proc_file(process_directory / "stat")
+        cmdline = read_proc_file(process_directory / "cmdline")
+
+        if stat is None or cmdline is None:
+            continue
+
+        command_line = tuple(os.fsdecode(arg) for arg in cmdline.rstrip(b"\0").split(b"\0") if arg)
+        comm = os.fsdecode(stat[stat.find(b"(") + 1:stat.rfind(b")")])
+
+        found.append(WineProcess(
+            pid=entry.name,
+            threads=_thread_count(stat),
+            image=image_name(command_line, fallback=comm),
+            unix_pid=int(entry.name),
+            command_line=command_line
+        ))
+
+    return found
+
+
+def running_programs(processes: List[WineProcess]) -> List[WineProcess]:
+    """
+    Leave out the processes that are part of Wine itself
+    :param processes: Processes as found by scan_wine_processes
+    :return: The processes that run actual programs
+    """
+    return [p for p in processes if p.image.lower() not in WINE_INFRASTRUCTURE_IMAGES]
@@ -0,0 +1,260 @@
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from grapejuice_common.errors import WineprefixInUse
+from grapejuice_common.logs.tracing import traced
+from grapejuice_common.util import atomic_write
+from grapejuice_common.util.reflink import reflink
+from grapejuice_common.wine.registry_hive_writer import RegistryHiveWriter
+from grapejuice_common.wine.roblox_version_index import SETTINGS_DIRECTORY_NAME
+from grapejuice_common.wine.wine_process_scanner import scan_wine_processes, running_programs
+from grapejuice_common.wine.wineprefix import Wineprefix
+
+LOG = logging.getLogger(__name__)
+
+# Roblox installs every version in a directory of its own and never changes it afterwards, except for the settings
+# that are written next to the executables
+_VERSION_DIRECTORY_PREFIX = "version-"
+_MUTABLE_VERSION_SUBDIRECTORIES = {SETTINGS_DIRECTORY_NAME.lower()}
+
+# Things that belong to the template and not to its clones: logs, cookies and temporary files.
+# Skipped directories are created empty.
+_SKIPPED_NAMES = {"logs", "localstorage", "temp", "grapejuice_fast_flags.json", "grapejuice_registry_cache.json",
+                  "grapejuice_versions_index.json"}
+
+_MACHINE_GUID_KEYS = (
+    r"Software\Microsoft\Cryptography",
+    r"Software\Wow6432Node\Microsoft\Cryptography"
+)
+_STUDIO_SESSION_KEY = r"Software\Roblox\RobloxStudioBrowser"
+
+# A path in a hive ends at a path separator, the closing quote of a value or the end of a list of paths
+_PATH_END = rb'(?=[/\\";\r\n]|$)'
+
+WINE_SERVER_SHUTDOWN_TIMEOUT = 10.0
+WINE_SERVER_SHUTDOWN_POLL_INTERVAL = 0.1
+
+
+@dataclass
+class CloneStatistics:
+    reflinked: int = 0
+    hardlinked: int = 0
+    copied: int = 0
+    symlinks: int = 0
+
+
+class _Cloner:
+    _source: Path
+    _target: Path
+    _statistics: CloneStatistics
+    _can_reflink: bool = True
+
+    def __init__(self, source: Path, target: Path):
+        self._source = source
+        self._target = target
+        self._statistics = CloneStatistics()
+
+    @property
+    def statistics(self) -> CloneStatistics:
+        return self._statistics
+
+    def _reflink(self, source: Path, target: Path) -> bool:
+        if not self._can_reflink:
+            return False
+
+        if reflink(source, target):
+            return True
+
+        LOG.info("File system does not support reflinks, falling back to copies")
+        self._can_reflink = False
+
+        return False
+
+    def _clone_file(self, source: Path, target: Path, immutable: bool):
+        if self._reflink(source, target):
+            shutil.copystat(source, target)
+            self._statistics.reflinked += 1
+
+        elif immutable:
+            os.link(source, target)
+            self._statistics.hardlinked += 1
+
+        else:
+            shutil.copy2(source, target)
+            self._statistics.copied += 1
+
+    def _clone_symlink(self, source: Path, target: Path):
+        link = os.readlink(source)
+
+        # Links into the template itself have to point into the clone
+        if os.path.isabs(link) and os.path.commonpath([link, str(self._source)]) == str(self._source):
+            link = str(self._target / os.path.relpath(link, self._source))
+
+        os.symlink(link, target)
+        self._statistics.symlinks += 1
+
+    def clone_directory(self, source: Path, target: Path, immutable: bool = False):
+        target.mkdir()
+
+        for entry in os.scandir(source):
+            source_path = Path(entry.path)
+            target_path = target / entry.name
+
+            if entry.name.lower() in _SKIPPED_NAMES:
+                if entry.is_dir(follow_symlinks=False):
+                    target_path.mkdir()
+
+            elif entry.is_symlink():
+                self._clone_symlink(source_path, target_path)
+
+            elif entry.is_dir():
+                name = entry.name.lower()
+
+                if name.startswith(_VERSION_DIRECTORY_PREFIX) and source_path.parent.name.lower() == "versions":
+                    child_is_immutable = True
+
+                elif name in _MUTABLE_VERSION_SUBDIRECTORIES:
+                    child_is_immutable = False
+
+                else:
+                    child_is_immutable = immutable
+
+                self.clone_directory(source_path, target_path, child_is_immutable)
+
+            elif entry.is_file():
+                self._clone_file(source_path, target_path, immutable)
+
+        shutil.copystat(source, target)
+
+
+def _replace_paths(hive_path: Path, source: Path, target: Path):
+    """
+    Point paths to the template in a hive to the clone, as unix paths and as paths on the Z: drive.
+    Paths of other prefixes that start with the path of the template, like 'player2' for 'player', are left alone.
+    """
+    def windows_path(p: Path) -> bytes:
+        return ("Z:" + str(p).replace("/", "\\\\")).encode("UTF-8")
+
+    def replace(data: bytes, old: bytes, new: bytes) -> bytes:
+        return re.sub(re.escape(old) + _PATH_END, lambda _: new, data, flags=re.MULTILINE)
+
+    data = hive_path.read_bytes()
+    replaced = replace(data, str(source).encode("UTF-8"), str(target).encode("UTF-8"))
+    replaced = replace(replaced, windows_path(source), windows_path(target))
+
+    if replaced != data:
+        LOG.info(f"Updated paths to the template in {hive_path}")
+        atomic_write(hive_path, replaced)
+
+
+def _give_own_identity(prefix: Wineprefix):
+    paths = prefix.paths
+
+    if paths.system_registry_hive.exists():
+        with RegistryHiveWriter(paths.system_registry_hive) as hive:
+            for key in _MACHINE_GUID_KEYS:
+                if hive.has_key(key):
+                    hive.set_string_value(key, "MachineGuid", str(uuid.uuid4()))
+
+    if paths.user_registry_hive.exists():
+        with RegistryHiveWriter(paths.user_registry_hive) as hive:
+            # Clones should not be logged into the account that was used in the template
+            hive.delete_key(_STUDIO_SESSION_KEY)
+
+
+def _stop_wine_server(template: Wineprefix):
+    """
+    A template that was used recently still has its wineserver and Wine's own processes running. Those are shut down,
+    which also makes the wineserver write the registry hives to disk before they are copied.
+    :param template: The prefix that is going to be cloned
+    :raises WineprefixInUse: When the template is running programs
+    """
+    source = template.paths.base_directory
+    processes = scan_wine_processes(source)
+
+    if not processes:
+        return
+
+    if running_programs(processes):
+        raise WineprefixInUse(source)
+
+    LOG.info(f"Shutting down the wineserver of {source} before cloning it")
+    template.core_control.kill_wine_server()
+
+    deadline = time.monotonic() + WINE_SERVER_SHUTDOWN_TIMEOUT
+    while scan_wine_processes(source):
+        if time.monotonic() > deadline:
+            raise WineprefixInUse(source)
+
+        time.sleep(WINE_SERVER_SHUTDOWN_POLL_INTERVAL)
+
+
+@traced("wine/clone_prefix")
+def clone_prefix(template: Wineprefix, prefix: Wineprefix) -> CloneStatistics:
+    """
+    Create a prefix by cloning a template prefix, which is a lot faster than setting up a prefix and installing
+    Roblox. Files are reflinked where the file system supports it. Otherwise, the Roblox versions are hardlinked
+    because they are never changed, and everything else is copied.
+    :param template: The prefix to clone
+    :param prefix: The prefix to create, it should not exist on disk yet
+    :return: What was done to the files
+    """
+    source = template.paths.base_directory
+    target = prefix.paths.base_directory
+
+    if target.exists():
+        raise FileExistsError(target)
+
+    _stop_wine_server(template)
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    # The clone is built next to the target and renamed into place, so a failed clone leaves nothing behind
+    staging = target.parent / f".{target.name}.clone"
+    shutil.rmtree(staging, ignore_errors=True)
+
+    cloner = _Cloner(source, target)
+
+    try:
+        cloner.clone_directory(source, staging)
+
+        for hive_name in ("system.reg", "user.reg", "userdef.reg"):
+            hive_path = staging / hive_name
+
+            if hive_path.exists():
+                _replace_paths(hive_path, source, target)
+
+        os.rename(staging, target)
+
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    _give_own_identity(prefix)
+
+    statistics = cloner.statistics
+    LOG.info(f"Cloned {source} to {target}: {statistics}")
+
+    return statistics
+
+
+def find_template_prefix(exclude_id: Optional[str] = None) -> Optional[Wineprefix]:
+    """
+    Find a prefix that is marked as a template and has been set up
+    :param exclude_id: Id of a prefix that should not be used, like the one that is being created
+    :return: The template prefix, None when there is none
+    """
+    from grapejuice_common.features.settings import current_settings
+
+    for configuration in current_settings.get_model().wineprefixes:
+        if configuration.is_template and configuration.id != exclude_id and configuration.exists_on_disk:
+            return Wineprefix(configuration=configuration.copy(deep=True))
+
+    return None
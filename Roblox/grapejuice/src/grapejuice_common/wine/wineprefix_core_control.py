@@ -3,22 +3,31 @@ import json
 import logging
 import os
 import re
-import shutil
 import signal
+import struct
 import subprocess
-import time
-from dataclasses import dataclass
-from datetime import datetime
+import uuid
+from contextlib import nullcontext
+from dataclasses import dataclass, field
 from pathlib import Path
-from string import Template
-from typing import Union, List, Dict, Optional
+from typing import Union, List, Dict, Optional, Tuple
 
 from grapejuice_common import paths
-from grapejuice_common.errors import HardwareProfilingError, WineHomeInvalid
+from grapejuice_common.errors import \
+    HardwareProfilingError, \
+    WineHomeInvalid, \
+    RegistryHiveInUse, \
+    RegistryHiveChanged, \
+    UnsupportedOfflineRegistryEdit
 from grapejuice_common.hardware_info.graphics_card import GPUVendor
 from grapejuice_common.logs.log_util import log_function
+from grapejuice_common.logs.tracing import span, traced
+from grapejuice_common.logs.process_log_capture import ProcessLogCapture, LogCaptureSettings, close_log_captures
 from grapejuice_common.models.wineprefix_configuration_model import WineprefixConfigurationModel, ThirdPartyKeys
 from grapejuice_common.util.string_util import non_empty_string
+from grapejuice_common.wine.registry_hive_writer import RegistryHiveWriter, apply_registry_text
+from grapejuice_common.wine.registry_transaction import RegistryTransaction, encode_registry_file
+from grapejuice_common.wine.wine_process_scanner import WineProcess, scan_wine_processes
 from grapejuice_common.wine.wineprefix_paths import WineprefixPaths
 
 log = logging.getLogger(__name__)
@@ -26,6 +35,7 @@ log = logging.getLogger(__name__)
 
 class ProcessWrapper:
     on_exit: callable = None
+    child_watched: bool = False
 
     def __init__(self, proc: subprocess.Popen, on_exit: callable = None):
         self.proc = proc
@@ -36,7 +46,13 @@ class ProcessWrapper:
         proc = self.proc
 
         if proc.returncode is None:
-            proc.poll()
+            if self.child_watched:
+                # The child watch reaps the process once the main loop gets to it. Reaping it here would race the
+                # watch for the exit status, so the process is only looked at.
+                proc.returncode = _peek_exit_code(proc.pid)
+
+            else:
+                proc.poll()
 
         return proc.returncode is not None
 
@@ -48,12 +64,77 @@ class ProcessWrapper:
         del self.proc
 
 
-open_fds = []
-
 processes: List[ProcessWrapper] = []
 is_polling = False
 
 
+def _exit_code_from_wait_status(status: int) -> int:
+    """
+    Convert a raw waitpid status into a return code the way subprocess.Popen would
+    :param status: Status as returned by waitpid
+    :return: The exit code, or the negated signal number if the process was killed by a signal
+    """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+
+    if os.WIFEXITED(status):
+        return os.WEXITSTATUS(status)
+
+    return status
+
+
+def _peek_exit_code(pid: int) -> Optional[int]:
+    """
+    Check whether a child process exited, without reaping it
+    :param pid: The child process to check
+    :return: The exit code, or the negated signal number if the process was killed by a signal. None while the process
+    is running.
+    """
+    try:
+        result = os.waitid(os.P_PID, pid, os.WEXITED | os.WNOHANG | os.WNOWAIT)
+
+    except ChildProcessError:
+        # Reaped already, the child watch fills in the exit code
+        return None
+
+    if result is None or result.si_pid == 0:
+        return None
+
+    if result.si_code == os.CLD_EXITED:
+        return result.si_status
+
+    return -result.si_status
+
+
+def _main_loop_running() -> bool:
+    """
+    A child watch only fires while the default GLib main context is being iterated, by this thread or another one
+    """
+    from gi.repository import GLib
+
+    context = GLib.MainContext.default()
+
+    if context.is_owner():
+        return True
+
+    if context.acquire():
+        context.release()
+        return False
+
+    return True
+
+
+def _finalize_process(proc: ProcessWrapper):
+    if proc.proc.returncode != 0:
+        log.error(f"Process returned with non-zero exit code {proc.proc.returncode}")
+
+    if proc in processes:
+        processes.remove(proc)
+
+    if callable(proc.on_exit):
+        proc.on_exit()
+
+
 @log_function
 def _poll_processes() -> bool:
     """
@@ -64,21 +145,15 @@ def _poll_processes() -> bool:
     exited = []
 
     for proc in processes:
-        if proc.exited:
+        if not proc.child_watched and proc.exited:
             exited.append(proc)
 
-            if proc.proc.returncode != 0:
-                log.error(f"Process returned with non-zero exit code {proc.proc.returncode}")
-
     for proc in exited:
-        processes.remove(proc)
-
-        if callable(proc.on_exit):
-            proc.on_exit()
+        _finalize_process(proc)
 
         del proc
 
-    processes_left = len(processes) > 0
+    processes_left = any(not proc.child_watched for proc in processes)
     if not processes_left:
         is_polling = False
         log.info("No processes left to poll, exiting thread")
@@ -87,6 +162,8 @@ def _poll_processes() -> bool:
 
 
 def poll_processes():
+    global is_polling
+
     if is_polling:
         return
 
@@ -95,14 +172,65 @@ def poll_processes():
     from gi.repository import GObject
     GObject.timeout_add(100, _poll_processes)
 
+    is_polling = True
+
+
+def _watch_process(wrapper: ProcessWrapper) -> bool:
+    """
+    Have GLib notify us when the process exits, instead of polling for it. GLib uses a pidfd or SIGCHLD under the hood,
+    so nothing is woken up while the process is running.
+    :param wrapper: The process to watch
+    :return: Whether a child watch could be installed
+    """
+    try:
+        from gi.repository import GLib
+
+    except ImportError as e:
+        log.warning(f"Cannot watch child processes without GLib: {e}")
+        return False
+
+    if not _main_loop_running():
+        # Nothing would dispatch the watch, the process would never be reaped
+        log.info(f"Not watching process {wrapper.proc.pid}, there is no main loop running")
+        return False
+
+    def on_child_exit(pid: int, status: int, *_):
+        if wrapper.proc.returncode is None:
+            wrapper.proc.returncode = _exit_code_from_wait_status(status)
+
+        log.info(f"Process {pid} exited with code {wrapper.proc.returncode}")
+        GLib.spawn_close_pid(pid)
+
+        _finalize_process(wrapper)
+
+    try:
+        GLib.child_watch_add(GLib.PRIORITY_DEFAULT, wrapper.proc.pid, on_child_exit)
+
+    except Exception as e:
+        log.warning(f"Could not install a child watch for process {wrapper.proc.pid}: {type(e).__name__}: {e}")
+        return False
+
+    wrapper.child_watched = True
+
+    return True
+
+
+def track_process(wrapper: ProcessWrapper):
+    """
+    Keep track of an asynchronously running process, so its exit callback is called once it exits.
+    Falls back to polling when the process cannot be watched.
+    :param wrapper: The process to keep track of
+    """
+    processes.append(wrapper)
+
+    if not _watch_process(wrapper):
+        poll_processes()
+
 
 def close_fds(*_, **__):
     log.info("Closing fds")
 
-    for fd in open_fds:
-        os.close(fd)
-
-    open_fds.clear()
+    close_log_captures()
 
     from grapejuice_common.logs.log_vacuum import remove_empty_logs
     remove_empty_logs()
@@ -115,56 +243,49 @@ def do_run_exe(
     run_async: bool,
     env: Dict[str, str],
     working_directory: Optional[Path] = None,
-    post_run_function: callable = None
+    post_run_function: callable = None,
+    log_settings: Optional[LogCaptureSettings] = None
 ) -> Union[ProcessWrapper, None]:
     log.info(f"Running exe {exe_name}")
 
-    log_dir = paths.logging_directory()
-    os.makedirs(log_dir, exist_ok=True)
-
-    log.info("Opening log fds")
+    log.info("Opening log capture")
+    capture = ProcessLogCapture(exe_name, log_settings)
 
-    ts = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    stdout_path = log_dir / f"{ts}_{exe_name}_stdout.log"
-    stderr_path = log_dir / f"{ts}_{exe_name}_stderr.log"
+    try:
+        with span("wine/exec", exe_name=exe_name, run_async=run_async):
+            proc = subprocess.Popen(
+                command,
+                env=env,
+                stdin=capture.stdin,
+                stdout=capture.stdout,
+                stderr=capture.stderr,
+                cwd=working_directory
+            )
 
-    stdout_fd = os.open(stdout_path, os.O_WRONLY | os.O_CREAT)
-    stderr_fd = os.open(stderr_path, os.O_WRONLY | os.O_CREAT)
-    pty_fd, tty_fd = os.openpty()
+    except Exception:
+        capture.close()
+        raise
 
-    open_fds.extend((stdout_fd, stderr_fd, pty_fd, tty_fd))
+    capture.start()
 
     if run_async:
         log.info("Running process asynchronously")
 
-        wrapper = ProcessWrapper(
-            subprocess.Popen(
-                command,
-                env=env,
-                stdin=tty_fd,
-                stdout=stdout_fd,
-                stderr=stderr_fd,
-                cwd=working_directory
-            ),
-            on_exit=post_run_function
-        )
-
-        processes.append(wrapper)
-        poll_processes()
+        wrapper = ProcessWrapper(proc, on_exit=post_run_function)
+        track_process(wrapper)
 
         return wrapper
 
     else:
         log.info("Running process synchronously")
 
-        subprocess.call(
-            command,
-            env=env,
-            stdin=tty_fd,
-            stdout=stdout_fd,
-            stderr=stderr_fd,
-            cwd=working_directory
-        )
+        try:
+            with span("wine/wait", exe_name=exe_name):
+                proc.wait()
+
+        except BaseException:
+            proc.kill()
+            raise
 
         if callable(post_run_function):
             post_run_function()
@@ -175,15 +296,11 @@ def do_run_exe(
 WINE_PROCESS_PTN = re.compile(r"^\s*([a-f0-9]+)\s+(\d+).*\'([\w.]+)\'")
 
 
-@dataclass(frozen=True)
-class WineProcess:
-    pid: str
-    threads: int
-    image: str
-
-
 DLL_OVERRIDE_SEP = ";"
 
+# struct flock as passed to fcntl: l_type, l_whence, l_start, l_len and l_pid
+_FLOCK_FORMAT = "hhqqi"
+
 
 def default_dll_overrides() -> List[str]:
     return [
@@ -226,16 +343,112 @@ def _validate_wine_home(home_path: Path):
         raise WineHomeInvalid(home_path, f"'{wine_bin}' must be a directory")
 
 
+def _file_is_locked(lock_path: Path) -> bool:
+    """
+    Check whether another process holds a lock on a file, without taking the lock
+    :param lock_path: The file to check
+    :return: Whether the file exists and is locked
+    """
+    import fcntl
+
+    try:
+        fd = os.open(lock_path, os.O_RDONLY)
+
+    except FileNotFoundError:
+        return False
+
+    try:
+        query = struct.pack(_FLOCK_FORMAT, fcntl.F_WRLCK, os.SEEK_SET, 0, 0, 0)
+        result = fcntl.fcntl(fd, fcntl.F_GETLK, query)
+
+    finally:
+        os.close(fd)
+
+    return struct.unpack(_FLOCK_FORMAT, result)[0] != fcntl.F_UNLCK
+
+
+EnvironmentCacheKey = Tuple[int, int, int]
+
+
+@dataclass
+class _EnvironmentCache:
+    """
+    Everything make_env derives from the prefix configuration, the user settings and os.environ.
+    The cache is only valid as long as its key matches the fingerprints of those inputs.
+    """
+    key: Optional[EnvironmentCacheKey] = None
+    wine_home: Optional[Path] = None
+    environments: Dict[bool, Dict[str, str]] = field(default_factory=dict)
+
+
+def _configuration_fingerprint(configuration: WineprefixConfigurationModel) -> int:
+    """
+    Hash the configuration fields make_env reads, so fields that are changed in place are noticed as well
+    """
+    return hash((
+        configuration.wine_home,
+        configuration.dll_overrides,
+        frozenset(configuration.env.items()),
+        tuple(configuration.env_passthrough),
+        frozenset(configuration.third_party.items()),
+        tuple(configuration.dxvk_overrides),
+        configuration.prime_offload_sink,
+        configuration.use_mesa_gl_override,
+        configuration.use_feral_gamemode,
+        configuration.use_enable_esync,
+        configuration.use_enable_fsync,
+        configuration.enable_winedebug,
+        configuration.winedebug_string
+    ))
+
+
+def _environment_cache_key(configuration: WineprefixConfigurationModel) -> EnvironmentCacheKey:
+    from grapejuice_common.features.settings import current_settings
+
+    return (
+        _configuration_fingerprint(configuration),
+        current_settings.revision,
+        hash(frozenset(os.environ.items()))
+    )
+
+
 class WineprefixCoreControl:
     _prefix_paths: WineprefixPaths
     _configuration: WineprefixConfigurationModel
+    _environment_cache: _EnvironmentCache
 
     def __init__(self, prefix_paths: WineprefixPaths, configuration: WineprefixConfigurationModel):
         self._prefix_paths = prefix_paths
         self._configuration = configuration
+        self._environment_cache = _EnvironmentCache()
+
+    def _current_environment_cache(self) -> _EnvironmentCache:
+        key = _environment_cache_key(self._configuration)
+
+        if self._environment_cache.key != key:
+            if self._environment_cache.key is not None:
+                log.info("Inputs for the process environment changed, invalidating the environment cache")
+
+            self._environment_cache = _EnvironmentCache(key=key)
+
+        return self._environment_cache
+
+    def invalidate_environment(self):
+        """
+        Forget the cached Wine home and process environments, they will be rebuilt on the next launch
+        """
+        self._environment_cache = _EnvironmentCache()
 
     @property
     def wine_home(self) -> Path:
+        cache = self._current_environment_cache()
+
+        if cache.wine_home is None:
+            cache.wine_home = self._resolve_wine_home()
+
+        return cache.wine_home
+
+    def _resolve_wine_home(self) -> Path:
         from grapejuice_common import variables
         from grapejuice_common.features.settings import current_settings
 
@@ -305,6 +518,72 @@ class WineprefixCoreControl:
 
         return path
 
+    @property
+    def wine_server_directory(self) -> Optional[Path]:
+        """
+        Wineserver places its socket and lock file in a directory that is derived from the device and inode of the
+        prefix
+        :return: Where the wineserver for this prefix keeps its files, None if the prefix does not exist yet
+        """
+        try:
+            stat = os.stat(self._prefix_paths.base_directory)
+
+        except FileNotFoundError:
+            return None
+
+        return Path(os.path.sep, "tmp", f".wine-{os.getuid()}", f"server-{stat.st_dev:x}-{stat.st_ino:x}")
+
+    @property
+    def wine_server_running(self) -> bool:
+        """
+        A wineserver that crashed leaves its socket behind, so the server only counts as running while it holds the
+        lock on its lock file. Connecting to the socket instead would make the server register a client and restart
+        its linger time.
+        """
+        server_directory = self.wine_server_directory
+
+        if server_directory is None:
+            return False
+
+        return _file_is_locked(server_directory / "lock")
+
+    @traced("wine/ensure_wine_server")
+    def ensure_wine_server(self):
+        """
+        Start a persistent wineserver for this prefix when the prefix is configured to keep one warm.
+        Wine processes started afterwards connect to it instead of bringing up a server of their own.
+        """
+        if not self._configuration.persistent_wineserver:
+            return
+
+        if self.wine_server_running or not self._prefix_paths.present_on_disk:
+            return
+
+        linger_time = self._configuration.wineserver_linger_time
+        persistence = f"-p{linger_time}" if linger_time > 0 else "-p"
+
+        log.info(f"Starting persistent wineserver for {self._prefix_paths.base_directory} ({persistence})")
+
+        # Wineserver daemonizes itself, so this returns as soon as the server is up
+        return_code = subprocess.call([str(self.wine_server()), persistence], env=self.make_env())
+        if return_code != 0:
+            log.warning(f"Persistent wineserver exited with code {return_code}, another server might own the prefix")
+
+    def shutdown_wine_server(self):
+        """
+        Managed replacement for killing the wineserver after a task.
+        A persistent wineserver is left alone, it exits by itself once its linger time has passed without clients.
+        """
+        if self._configuration.persistent_wineserver:
+            log.info("Keeping the persistent wineserver warm")
+            return
+
+        if not self.wine_server_running:
+            log.info("There is no wineserver to shut down")
+            return
+
+        self.kill_wine_server()
+
     def wine_dbg(self) -> Path:
         path = self.wine_bin / "winedbg"
         assert path.exists(), f"Could not find winedbg at: {path}"
@@ -342,7 +621,26 @@ class WineprefixCoreControl:
 
         return prime_env
 
+    def _log_capture_settings(self) -> LogCaptureSettings:
+        return LogCaptureSettings(
+            max_bytes=self._configuration.log_max_bytes,
+            backup_count=self._configuration.log_backup_count,
+            compress=self._configuration.compress_logs
+        )
+
     def make_env(self, accelerate_graphics: bool = False) -> Dict[str, str]:
+        cache = self._current_environment_cache()
+        process_environment = cache.environments.get(accelerate_graphics, None)
+
+        if process_environment is None:
+            process_environment = self._build_env(accelerate_graphics)
+            cache.environments[accelerate_graphics] = process_environment
+
+        # Hand out a copy so callers cannot modify the cached environment
+        return dict(process_environment)
+
+    @traced("wine/build_env")
+    def _build_env(self, accelerate_graphics: bool) -> Dict[str, str]:
         user_env = self._configuration.env
         dll_overrides = list(filter(non_empty_string, self._configuration.dll_overrides.split(DLL_OVERRIDE_SEP)))
         dll_overrides.extend(default_dll_overrides())
@@ -418,7 +716,8 @@ class WineprefixCoreControl:
             path_components.insert(0, wine_bin_string)
             process_environment["PATH"] = os.path.pathsep.join(path_components)
 
-        log.debug("Process environment: " + json.dumps(process_environment))
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Process environment: " + json.dumps(process_environment))
 
         if sanitize_environment:
             # Pass through user_passed_env
@@ -429,43 +728,86 @@ class WineprefixCoreControl:
 
         return process_environment
 
-    def load_registry_file(
-        self,
-        registry_file: Path
-    ):
-        log.info(f"Loading registry file {registry_file} into the wineprefix")
+    def edit_registry_hive(self, hive_path: Path) -> RegistryHiveWriter:
+        """
+        Get a writer for one of the hives of this prefix. Use it as a context manager to load and save the hive.
+        :param hive_path: The hive to edit, e.g. WineprefixPaths.system_registry_hive
+        :return: A writer for the hive
+        """
+        if self.wine_server_running:
+            raise RegistryHiveInUse(hive_path)
+
+        return RegistryHiveWriter(hive_path)
+
+    def _import_registry_text_offline(self, text: str) -> bool:
+        if not self._configuration.offline_registry_edits:
+            return False
+
+        if self.wine_server_running:
+            log.info("Wineserver owns the registry, cannot import registry contents offline")
+            return False
+
+        try:
+            writers = apply_registry_text(text, self._prefix_paths.base_directory)
+
+            for writer in writers.values():
+                writer.save()
+
+        except (UnsupportedOfflineRegistryEdit, RegistryHiveChanged, FileNotFoundError, ValueError) as e:
+            log.info(f"Cannot import registry contents offline, falling back to regedit. {type(e).__name__}: {e}")
+            return False
+
+        log.info("Imported registry contents offline")
+
+        return True
+
+    @traced("wine/import_registry_text")
+    def import_registry_text(self, text: str):
+        """
+        Import registry contents into the prefix. The hives are edited directly when no wineserver owns them,
+        otherwise regedit is called once per architecture.
+        :param text: Contents of a .reg file
+        """
+        if self._import_registry_text_offline(text):
+            return
 
-        target_filename = str(int(time.time())) + ".reg"
+        target_filename = f"grapejuice_{uuid.uuid4().hex}.reg"
         target_path = self._prefix_paths.temp_directory / target_filename
         target_path.parent.mkdir(parents=True, exist_ok=True)
 
-        shutil.copyfile(registry_file, target_path)
+        target_path.write_bytes(encode_registry_file(text))
 
-        winreg = f"C:\\windows\\temp\\{target_filename}"
-        self.run_exe("regedit", "/S", winreg, run_async=False, use_wine64=False)
-        self.run_exe("regedit", "/S", winreg, run_async=False, use_wine64=True)
+        try:
+            winreg = f"C:\\windows\\temp\\{target_filename}"
+            self.run_exe("regedit", "/S", winreg, run_async=False, use_wine64=False)
+            self.run_exe("regedit", "/S", winreg, run_async=False, use_wine64=True)
+
+        finally:
+            os.remove(target_path)
+
+    def registry_transaction(self) -> RegistryTransaction:
+        """
+        Start collecting registry files, which are all imported at once when the transaction is committed
+        :return: A new registry transaction for this prefix
+        """
+        return RegistryTransaction(self.import_registry_text)
+
+    def load_registry_file(
+        self,
+        registry_file: Path
+    ):
+        log.info(f"Loading registry file {registry_file} into the wineprefix")
 
-        os.remove(target_path)
+        with self.registry_transaction() as transaction:
+            transaction.add_file(registry_file)
 
     def load_patched_registry_files(
         self,
         registry_file: Path,
         patches: dict = None
     ):
-        target_filename = str(int(time.time())) + ".reg"
-        target_path = self._prefix_paths.temp_directory / target_filename
-
-        with registry_file.open("r") as fp:
-            template = Template(fp.read())
-
-        with target_path.open("w+") as fp:
-            fp.write(template.safe_substitute(patches))
-
-        winreg = f"C:\\windows\\temp\\{target_filename}"
-        self.run_exe("regedit", "/S", winreg, run_async=False, use_wine64=False)
-        self.run_exe("regedit", "/S", winreg, run_async=False, use_wine64=True)
-
-        os.remove(target_path)
+        with self.registry_transaction() as transaction:
+            transaction.add_file(registry_file, patches=patches or dict())
 
     def block_microsoft_edge_webview2_installation(self):
         self._prefix_paths.program_files_x86_microsoft.mkdir(parents=True, mode=0x400, exist_ok=True)
@@ -476,8 +818,8 @@ class WineprefixCoreControl:
         if path.exists():
             path.chmod(0o777)
 
-    def disable_mime_associations(self):
-        self.load_registry_file(paths.assets_directory() / "disable_mime_assoc.reg")
+    def disable_mime_associations(self, transaction: RegistryTransaction):
+        transaction.add_file(paths.assets_directory() / "disable_mime_assoc.reg")
 
     def sandbox(self):
         user_dir = self._prefix_paths.user_directory
@@ -489,13 +831,20 @@ class WineprefixCoreControl:
                     os.remove(file)
                     os.makedirs(file, exist_ok=True)
 
-    def configure_prefix(self):
-        self.disable_mime_associations()
+    def configure_prefix(self, transaction: Optional[RegistryTransaction] = None):
+        """
+        Bring the prefix into the state Grapejuice expects it to be in
+        :param transaction: Transaction to add the registry changes to, they are imported right away when None
+        """
+        with self.registry_transaction() if transaction is None else nullcontext(transaction) as prefix_transaction:
+            self.disable_mime_associations(prefix_transaction)
+
         self.sandbox()
 
-    def create_prefix(self):
-        self.configure_prefix()
+    def create_prefix(self, transaction: Optional[RegistryTransaction] = None):
+        self.configure_prefix(transaction)
 
+    @traced("wine/run_exe")
     def run_exe(
         self,
         exe_path: Union[Path, str],
@@ -524,6 +873,8 @@ class WineprefixCoreControl:
 
         log.info(f"Resolved exe path to {exe_path_string}")
 
+        self.ensure_wine_server()
+
         env = self.make_env(accelerate_graphics)
         wine_binary = self.wine_binary("64" if use_wine64 else "")
         command = [str(wine_binary), exe_path_string, *args]
@@ -534,7 +885,8 @@ class WineprefixCoreControl:
             run_async,
             env,
             post_run_function=post_run_function,
-            working_directory=working_directory
+            working_directory=working_directory,
+            log_settings=self._log_capture_settings()
         )
 
     def run_linux_command(
@@ -543,6 +895,8 @@ class WineprefixCoreControl:
         arguments: Optional[List[str]] = None,
         working_directory: Optional[Path] = None
     ):
+        self.ensure_wine_server()
+
         env = self.make_env()
         command_name = Path(command).name
         command = [command]
@@ -555,9 +909,11 @@ class WineprefixCoreControl:
             command_name,
             run_async=False,
             env=env,
-            working_directory=working_directory
+            working_directory=working_directory,
+            log_settings=self._log_capture_settings()
         )
 
+    @traced("wine/kill_wine_server")
     def kill_wine_server(self):
         env = self.make_env()
 
@@ -565,6 +921,17 @@ class WineprefixCoreControl:
 
     @property
     def process_list(self) -> List[WineProcess]:
+        """
+        The processes running in this prefix, found through /proc. Looking them up does not start a wineserver.
+        """
+        return scan_wine_processes(self._prefix_paths.base_directory)
+
+    @property
+    def detailed_process_list(self) -> List[WineProcess]:
+        """
+        The processes running in this prefix, as reported by winedbg. The pids are Windows pids.
+        This starts the wineserver for the prefix when it is not running, prefer process_list.
+        """
         env = self.make_env()
 
         try:
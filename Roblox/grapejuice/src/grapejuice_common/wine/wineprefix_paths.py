@@ -17,6 +17,18 @@ class WineprefixPaths:
     def present_on_disk(self) -> bool:
         return self._base_directory.exists()
 
+    @property
+    def fast_flag_manifest(self) -> Path:
+        return self._base_directory / "grapejuice_fast_flags.json"
+
+    @property
+    def registry_query_cache(self) -> Path:
+        return self._base_directory / "grapejuice_registry_cache.json"
+
+    @property
+    def roblox_version_index(self) -> Path:
+        return self._base_directory / "grapejuice_versions_index.json"
+
     @property
     def drive_c(self) -> Path:
         return self._base_directory / "drive_c"
@@ -1,32 +1,38 @@
 import json
 import logging
 import os
-import shutil
 import time
 from pathlib import Path
-from typing import Generator, List, Iterable, Optional
+from concurrent.futures import Future
+from typing import Generator, List, Iterable, Optional, Callable
+
+import requests
 
 from grapejuice_common import paths, variables
-from grapejuice_common.errors import RobloxExecutableNotFound
+from grapejuice_common.errors import RobloxExecutableNotFound, FastFlagExtractionFailed
+from grapejuice_common.logs.tracing import traced
 from grapejuice_common.models.launch_uri import LaunchUri
 from grapejuice_common.models.wineprefix_configuration_model import WineprefixConfigurationModel
 from grapejuice_common.roblox_product import RobloxProduct, MAIN_ROBLOX_RELEASE_CHANNEL
 from grapejuice_common.roblox_renderer import RobloxRenderer
-from grapejuice_common.util import download_file, roblox_version
+from grapejuice_common.util import roblox_version, atomic_write
+from grapejuice_common.util.download_cache import cached_download
 from grapejuice_common.util.enum_utils import enum_value_constrained_string
+from grapejuice_common.util.file_watch import wait_for_file, is_complete_json_document
+from grapejuice_common.wine import fast_flag_dump_cache
+from grapejuice_common.wine.fast_flag_manifest import FastFlagManifest
+from grapejuice_common.wine.launch_pipeline import LaunchPipeline, ensure_pipeline
 from grapejuice_common.wine.registry_file import RegistryFile
+from grapejuice_common.wine.registry_query_cache import RegistryQueryCache
+from grapejuice_common.wine.roblox_version_index import RobloxVersionIndex, roblox_version_index, app_settings_path
 from grapejuice_common.wine.wineprefix_core_control import WineprefixCoreControl, ProcessWrapper
 from grapejuice_common.wine.wineprefix_paths import WineprefixPaths
 
 LOG = logging.getLogger(__name__)
 
 ROBLOX_DOWNLOAD_URL = "https://www.roblox.com/download/client"
-
-
-def _app_settings_path(executable_path: Path) -> Path:
-    client_app_settings = executable_path.parent / "ClientSettings" / "ClientAppSettings.json"
-
-    return client_app_settings
+STUDIO_EXIT_GRACE_PERIOD = 1.0
+PLAYER_EXECUTABLE_NAME = "RobloxPlayerBeta.exe"
 
 
 class WineprefixRoblox:
@@ -44,22 +50,19 @@ class WineprefixRoblox:
         self._core_control = core_control
         self._configuration = configuration
 
+    @traced("roblox/download_installer")
     def download_installer(self):
         path = self.current_player_version_path / "RobloxPlayerLauncher.exe"
 
-        path.parent.mkdir(parents=True, exist_ok=True)
-
-        if path.exists():
-            LOG.debug(f"Removing old installer at {path}")
-            os.remove(path)
-
-        download_file(ROBLOX_DOWNLOAD_URL, path)
+        # The installer is shared by every prefix, it is only downloaded again when Roblox has published a new one
+        cached_download(ROBLOX_DOWNLOAD_URL, path)
 
         if not self.is_installed:
             LOG.warning(f"Installer was downloaded to {path} but is_installed is false")
 
         return path
 
+    @traced("roblox/install_roblox")
     def install_roblox(self, post_install_function: callable = None):
         self._core_control.create_prefix()
         self._core_control.block_microsoft_edge_webview2_installation()
@@ -70,42 +73,46 @@ class WineprefixRoblox:
         )
 
     def is_logged_into_studio(self) -> bool:
-        with RegistryFile(self._prefix_paths.user_reg) as registry_file:
-            registry_file.load()
-
+        def query(registry_file: RegistryFile) -> bool:
             roblox_com = registry_file.find_key(r"Software\\Roblox\\RobloxStudioBrowser\\roblox.com")
             return (roblox_com is not None) and (roblox_com.get_attribute(".ROBLOSECURITY") is not None)
 
-    def locate_all_roblox_executables_in_versions(self, executable_name: str) -> Generator[Path, None, None]:
-        search_locations = [
-            self._prefix_paths.roblox_appdata,
-            self._prefix_paths.roblox_program_files
-        ]
-
-        for location in search_locations:
-            versions_directory = location / "Versions"
+        # Only whether there is a cookie is cached, not the cookie itself
+        return RegistryQueryCache(self._prefix_paths.registry_query_cache) \
+            .query(self._prefix_paths.user_reg, "logged_into_studio", query)
 
-            if location.exists() and versions_directory.exists() and versions_directory.is_dir():
-                executable_path = versions_directory / executable_name
-
-                if executable_path.exists() and executable_path.is_file():
-                    yield executable_path
-
-                for version in filter(Path.is_dir, versions_directory.glob("*")):
-                    executable_path = version / executable_name
+    @property
+    def version_index(self) -> RobloxVersionIndex:
+        """
+        Index of the installed Roblox versions, shared by every Wineprefix object of this prefix
+        """
+        return roblox_version_index(
+            [
+                *map(lambda p: p / "Versions", self._prefix_paths.possible_roblox_appdata),
+                self._prefix_paths.roblox_program_files / "Versions"
+            ],
+            self._prefix_paths.roblox_version_index
+        )
 
-                    if executable_path.exists() and executable_path.is_file():
-                        yield executable_path
+    def locate_all_roblox_executables_in_versions(self, executable_name: str) -> Generator[Path, None, None]:
+        yield from self.version_index.executables(executable_name)
 
     def locate_all_roblox_executables(self, executable_name: str) -> Generator[Path, None, None]:
-        executable_path = self._prefix_paths.roblox_program_files / "Versions" / executable_name
+        index = self.version_index
+        seen = set()
 
-        if executable_path.exists():
-            yield executable_path
+        # The launcher in Program Files takes priority over the ones in AppData
+        program_files_executable = index.loose_executable(
+            self._prefix_paths.roblox_program_files / "Versions",
+            executable_name
+        )
 
-        for executable_path in self.locate_all_roblox_executables_in_versions(executable_name):
-            yield executable_path
+        for executable_path in filter(None, [program_files_executable, *index.executables(executable_name)]):
+            if executable_path not in seen:
+                seen.add(executable_path)
+                yield executable_path
 
+    @traced("roblox/locate_executable")
     def locate_roblox_executable(self, executable_name: str) -> Path:
         executable = next(self.locate_all_roblox_executables(executable_name), None)
 
@@ -166,30 +173,30 @@ class WineprefixRoblox:
 
     @property
     def current_player_version_settings_path(self):
-        return _app_settings_path(self.current_player_version_path / "RobloxPlayerBeta.exe")
+        return app_settings_path(self.current_player_version_path / "RobloxPlayerBeta.exe")
 
     @property
     def current_studio_version_settings_path(self):
-        return _app_settings_path(self.current_studio_version_path / "RobloxPlayerBeta.exe")
+        return app_settings_path(self.current_studio_version_path / "RobloxPlayerBeta.exe")
 
     @property
     def roblox_studio_app_settings_path(self) -> Path:
-        return _app_settings_path(self.roblox_studio_executable_path)
+        return app_settings_path(self.roblox_studio_executable_path)
 
     @property
     def roblox_player_app_settings_path(self) -> Path:
-        return _app_settings_path(self.roblox_player_launcher_path)
+        return app_settings_path(self.roblox_player_launcher_path)
 
     @property
     def all_studio_app_settings_paths(self) -> List[Path]:
-        ls = list(map(_app_settings_path, self.locate_all_roblox_executables("RobloxStudioBeta.exe")))
+        ls = list(map(app_settings_path, self.locate_all_roblox_executables("RobloxStudioBeta.exe")))
         ls.append(self.current_studio_version_settings_path)
 
         return list(set(ls))
 
     @property
     def all_player_app_settings_paths(self) -> List[Path]:
-        ls = list(map(_app_settings_path, self.locate_all_roblox_executables("RobloxPlayerLauncher.exe")))
+        ls = list(map(app_settings_path, self.locate_all_roblox_executables("RobloxPlayerLauncher.exe")))
         ls.append(self.current_player_version_settings_path)
 
         return list(set(ls))
@@ -203,6 +210,42 @@ class WineprefixRoblox:
         except RobloxExecutableNotFound:
             return False
 
+    @traced("roblox/direct_player_executable")
+    def _direct_player_executable(self) -> Optional[Path]:
+        """
+        Find the player that the launcher would start when it has nothing to update. Starting it directly saves the
+        launcher process, which takes several seconds under Wine.
+        :return: Path to RobloxPlayerBeta.exe, None when the launcher should be used
+        """
+        if not self._configuration.roblox_direct_player_launch:
+            return None
+
+        release_channel = self._configuration.roblox_release_channel
+
+        try:
+            lookup = roblox_version.player_version_lookup(release_channel)
+
+        except (requests.RequestException, ValueError, KeyError) as e:
+            LOG.warning(f"Could not determine the current Roblox version, using the launcher: {type(e).__name__}: {e}")
+            return None
+
+        current_version = lookup.version
+
+        if not lookup.fresh:
+            # Roblox might have released a version since, only the launcher would install it
+            LOG.info(f"Roblox {current_version} might be outdated, using the launcher")
+            return None
+
+        version = self.version_index.find_version(current_version, PLAYER_EXECUTABLE_NAME)
+
+        if version is None:
+            LOG.info(f"Roblox {current_version} on {release_channel.value} is not installed, using the launcher")
+            return None
+
+        LOG.info(f"Roblox {current_version} is up to date, starting the player directly")
+
+        return version.executable(PLAYER_EXECUTABLE_NAME)
+
     def _rewrite_uri(self, uri: Optional[str] = None) -> Optional[str]:
         """
         Add custom launch options to the URI provided by roblox
@@ -221,6 +264,7 @@ class WineprefixRoblox:
 
         return parsed_uri.as_string
 
+    @traced("roblox/write_flags")
     def _write_flags(self, product: RobloxProduct, settings_paths: Iterable[Path]):
         flags = self._configuration.fast_flags.get(enum_value_constrained_string(product), None) or dict()
 
@@ -237,22 +281,71 @@ class WineprefixRoblox:
         if len(flags) <= 0:
             return
 
-        json_dump = json.dumps(flags, indent=2)
+        json_dump = json.dumps(flags, indent=2).encode(variables.text_encoding())
+        manifest = FastFlagManifest(self._prefix_paths.fast_flag_manifest).load()
 
         for p in settings_paths:
-            LOG.info(f"Writing flags for {product} to: {p}")
-            p.parent.mkdir(parents=True, exist_ok=True)
+            if manifest.write_if_changed(p, json_dump):
+                LOG.info(f"Wrote flags for {product} to: {p}")
 
-            with p.open("w+", encoding=variables.text_encoding()) as fp:
-                fp.write(json_dump)
+            else:
+                LOG.debug(f"Flags for {product} are up to date in: {p}")
 
-    def run_roblox_studio(self, uri: str = None, ide: bool = False):
-        launcher_path = self.roblox_studio_launcher_path
-        uri = self._rewrite_uri(uri)
+        manifest.forget_missing()
+        manifest.save()
+
+    def _prepare_launch(
+        self,
+        pipeline: LaunchPipeline,
+        executable_name: str,
+        product: RobloxProduct,
+        flags_executable_name: str,
+        current_version_settings_path: Callable[[], Path]
+    ) -> "Future[Path]":
+        """
+        Submit the pre-launch steps for a Roblox product to a pipeline. The steps only touch the prefix directory and
+        the Roblox web API, so they can run next to each other and next to the registry work of the caller.
+        Leaving the pipeline block waits for every step, so wine is only started once the flags have been written.
+        :param pipeline: The pipeline to submit the steps to
+        :param executable_name: Name of the executable that will be launched
+        :param product: The product that flags should be written for
+        :param flags_executable_name: Name of the executable that lives next to the settings directories
+        :param current_version_settings_path: Looks up the settings path of the current version, this is an HTTP call
+        :return: Future for the path of the executable that will be launched
+        """
+        executable = pipeline.submit("locate_executable", self.locate_roblox_executable, executable_name)
+
+        # Building the environment may profile hardware, the result is cached for run_exe
+        pipeline.submit("make_env", self._core_control.make_env, accelerate_graphics=True)
+
+        version_settings_path = pipeline.submit("current_version_settings_path", current_version_settings_path)
+        located_settings_paths = pipeline.submit(
+            "locate_settings_paths",
+            lambda: list(map(app_settings_path, self.locate_all_roblox_executables(flags_executable_name)))
+        )
+
+        def write_flags():
+            settings_paths = {*located_settings_paths.result(), version_settings_path.result()}
+            self._write_flags(product, settings_paths)
+
+        pipeline.submit("write_flags", write_flags)
+
+        return executable
+
+    @traced("roblox/run_studio")
+    def run_roblox_studio(self, uri: str = None, ide: bool = False, pipeline: Optional[LaunchPipeline] = None):
+        with ensure_pipeline(pipeline) as launch_pipeline:
+            launcher = self._prepare_launch(
+                launch_pipeline,
+                "RobloxStudioLauncherBeta.exe",
+                RobloxProduct.studio,
+                "RobloxStudioBeta.exe",
+                lambda: self.current_studio_version_settings_path
+            )
 
-        self._write_flags(RobloxProduct.studio, self.all_studio_app_settings_paths)
+            uri = self._rewrite_uri(uri)
 
-        launch_args = [launcher_path]
+        launch_args = [launcher.result()]
         launch_args.extend(list(
             filter(
                 None,
@@ -265,26 +358,50 @@ class WineprefixRoblox:
 
         self._core_control.run_exe(*launch_args, accelerate_graphics=True)
 
-    def run_roblox_player(self, uri):
-        player_launcher_path = self.roblox_player_launcher_path
+    @traced("roblox/run_player")
+    def run_roblox_player(self, uri, pipeline: Optional[LaunchPipeline] = None):
         uri = self._rewrite_uri(uri)
-
         product = RobloxProduct.app if uri == variables.roblox_app_experience_url() else RobloxProduct.player
-        self._write_flags(product, self.all_player_app_settings_paths)
 
-        self._core_control.run_exe(player_launcher_path, uri, accelerate_graphics=True)
+        with ensure_pipeline(pipeline) as launch_pipeline:
+            player_launcher = self._prepare_launch(
+                launch_pipeline,
+                "RobloxPlayerLauncher.exe",
+                product,
+                "RobloxPlayerLauncher.exe",
+                lambda: self.current_player_version_settings_path
+            )
 
-    def launch_app(self):
-        player_executable_path = self.locate_roblox_executable("RobloxPlayerLauncher.exe")
+            direct_player = launch_pipeline.submit("direct_player_executable", self._direct_player_executable)
+
+        # The player takes the launch URI just like the launcher does
+        executable = direct_player.result() or player_launcher.result()
+        self._core_control.run_exe(executable, uri, accelerate_graphics=True)
+
+    @traced("roblox/launch_app")
+    def launch_app(self, pipeline: Optional[LaunchPipeline] = None):
+        with ensure_pipeline(pipeline) as launch_pipeline:
+            player_executable = self._prepare_launch(
+                launch_pipeline,
+                "RobloxPlayerLauncher.exe",
+                RobloxProduct.app,
+                "RobloxPlayerLauncher.exe",
+                lambda: self.current_player_version_settings_path
+            )
 
-        product = RobloxProduct.app
-        self._write_flags(product, self.all_player_app_settings_paths)
+            direct_player = launch_pipeline.submit("direct_player_executable", self._direct_player_executable)
+
+        if direct_player.result() is not None:
+            # The version of the player is already on the configured channel, so no channel argument is needed.
+            # The player takes '--app' where the launcher takes '-app', like the launcher passes it on.
+            self._core_control.run_exe(direct_player.result(), "--app", accelerate_graphics=True)
+            return
 
         launch_args = ["-app"]
         if self._configuration.roblox_release_channel != MAIN_ROBLOX_RELEASE_CHANNEL:
             launch_args = ["-channel", self._configuration.roblox_release_channel.value, *launch_args]
 
-        self._core_control.run_exe(player_executable_path, *launch_args, accelerate_graphics=True)
+        self._core_control.run_exe(player_executable.result(), *launch_args, accelerate_graphics=True)
 
     def run_roblox_studio_with_events(self, run_async: bool = True, **events) -> ProcessWrapper:
         roblox_studio_path = self.roblox_studio_executable_path
@@ -300,7 +417,47 @@ class WineprefixRoblox:
 
         return self._core_control.run_exe(*launch_args, run_async=run_async)
 
-    def extract_fast_flags(self):
+    @property
+    def installed_studio_version(self) -> Optional[str]:
+        """
+        The version of Roblox Studio that would be started, which is the name of its directory in Versions
+        """
+        try:
+            studio_executable = self.roblox_studio_executable_path
+
+        except RobloxExecutableNotFound:
+            return None
+
+        if studio_executable.parent.name == "Versions":
+            return None
+
+        return studio_executable.parent.name
+
+    @traced("roblox/extract_fast_flags")
+    def extract_fast_flags(self, timeout: Optional[float] = None, force: bool = False):
+        """
+        Make Roblox Studio dump its fast flags and copy the dump to the Grapejuice cache.
+        Dumps are kept per Studio version and release channel, Studio is only started for versions that have not been
+        dumped before.
+        :param timeout: Seconds to wait for the dump, defaults to the fast_flag_extraction_timeout setting
+        :param force: Start Studio even when there is a dump for the installed version
+        """
+        studio_version = self.installed_studio_version
+        release_channel = self._configuration.roblox_release_channel
+
+        if studio_version and not force:
+            dump = fast_flag_dump_cache.load_dump(studio_version, release_channel)
+
+            if dump is not None:
+                LOG.info(f"Using the fast flag dump of Roblox Studio {studio_version} on {release_channel.value}")
+                atomic_write(paths.fast_flag_cache_location(), dump)
+
+                return
+
+        if timeout is None:
+            from grapejuice_common.features.settings import current_settings
+            timeout = current_settings.get_model().fast_flag_extraction_timeout
+
         fast_flag_path = self.fast_flag_dump_path
 
         if fast_flag_path.exists():
@@ -308,28 +465,48 @@ class WineprefixRoblox:
 
         studio_process = self.run_roblox_studio_with_events(startEvent="FFlagExtract", showEvent="NoSplashScreen")
 
-        def fast_flags_present():
-            if fast_flag_path.exists():
-                stat = os.stat(fast_flag_path)
+        try:
+            dump_is_complete = wait_for_file(
+                fast_flag_path,
+                is_complete_json_document,
+                timeout,
+                should_abort=lambda: studio_process is not None and studio_process.exited
+            )
 
-                if stat.st_size > 0:
-                    return True
+            if not dump_is_complete:
+                if studio_process is not None and studio_process.exited:
+                    raise FastFlagExtractionFailed(fast_flag_path, "Roblox Studio exited before writing the dump")
 
-            return False
+                raise FastFlagExtractionFailed(fast_flag_path, f"Roblox Studio did not write it within {timeout}s")
+
+            dump = fast_flag_path.read_bytes()
+            atomic_write(paths.fast_flag_cache_location(), dump)
 
-        while not fast_flags_present():
-            time.sleep(0.1)
+            if studio_version:
+                fast_flag_dump_cache.store_dump(studio_version, release_channel, dump)
 
-        shutil.copy(fast_flag_path, paths.fast_flag_cache_location())
+        finally:
+            if studio_process:
+                studio_process.kill()
 
-        if studio_process:
-            studio_process.kill()
-            time.sleep(1)  # Give Roblox a chance
-            self._core_control.kill_wine_server()
+                # Give Roblox a chance to exit by itself
+                deadline = time.monotonic() + STUDIO_EXIT_GRACE_PERIOD
+                while not studio_process.exited and time.monotonic() < deadline:
+                    time.sleep(0.05)
 
-    def authenticate_studio(self, ticket: str):
-        self._write_flags(RobloxProduct.studio, self.all_studio_app_settings_paths)
+                self._core_control.kill_wine_server()
+
+    @traced("roblox/authenticate_studio")
+    def authenticate_studio(self, ticket: str, pipeline: Optional[LaunchPipeline] = None):
+        with ensure_pipeline(pipeline) as launch_pipeline:
+            studio_executable = self._prepare_launch(
+                launch_pipeline,
+                "RobloxStudioBeta.exe",
+                RobloxProduct.studio,
+                "RobloxStudioBeta.exe",
+                lambda: self.current_studio_version_settings_path
+            )
 
-        run_args = [self.roblox_studio_executable_path, ticket]
+        run_args = [studio_executable.result(), ticket]
 
         self._core_control.run_exe(*run_args, accelerate_graphics=True)
@@ -0,0 +1,113 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from grapejuice_common.errors import DownloadVerificationFailed
+from grapejuice_common.util import download
+
+PAYLOAD = bytes(range(256)) * 1024
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Number of requests that get cut off halfway
+    truncate_requests = 0
+    range_requests = []
+    # Bytes by which resumed responses start before the requested offset
+    misplaced_ranges = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        start = 0
+        range_header = self.headers.get("Range", None)
+
+        if range_header is not None:
+            start = int(range_header[len("bytes="):-1])
+            _Handler.range_requests.append(start)
+            start -= _Handler.misplaced_ranges
+
+        body = PAYLOAD[start:]
+
+        self.send_response(206 if start else 200)
+        self.send_header("ETag", '"payload"')
+        self.send_header("Content-Length", str(len(body)))
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}")
+        self.end_headers()
+
+        if _Handler.truncate_requests > 0:
+            _Handler.truncate_requests -= 1
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.connection.close()
+            return
+
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    _Handler.truncate_requests = 0
+    _Handler.range_requests = []
+    _Handler.misplaced_ranges = 0
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/file"
+
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_download_reports_progress(server, tmp_path):
+    target = tmp_path / "file.bin"
+    progress = []
+
+    download.download_file(
+        server,
+        target,
+        sha256=hashlib.sha256(PAYLOAD).hexdigest(),
+        progress=lambda done, total: progress.append((done, total)),
+        chunk_size=4096
+    )
+
+    assert target.read_bytes() == PAYLOAD
+    assert progress[-1] == (len(PAYLOAD), len(PAYLOAD))
+    assert not download.partial_path(target).exists()
+
+
+def test_interrupted_download_is_resumed(server, tmp_path):
+    target = tmp_path / "file.bin"
+    _Handler.truncate_requests = 1
+
+    download.download_file(server, target, chunk_size=4096)
+
+    assert target.read_bytes() == PAYLOAD
+    assert _Handler.range_requests == [len(PAYLOAD) // 2]
+
+
+def test_misplaced_range_is_not_appended(server, tmp_path):
+    target = tmp_path / "file.bin"
+    _Handler.truncate_requests = 1
+    _Handler.misplaced_ranges = 1024
+
+    download.download_file(server, target, chunk_size=4096)
+
+    assert target.read_bytes() == PAYLOAD
+    assert _Handler.range_requests == [len(PAYLOAD) // 2]
+
+
+def test_corrupt_download_is_discarded(server, tmp_path):
+    target = tmp_path / "file.bin"
+    target.write_bytes(b"old")
+
+    with pytest.raises(DownloadVerificationFailed):
+        download.download_file(server, target, sha256="0" * 64)
+
+    assert target.read_bytes() == b"old"
+    assert not download.partial_path(target).exists()
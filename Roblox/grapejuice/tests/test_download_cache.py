@@ -0,0 +1,105 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from grapejuice_common import paths
+from grapejuice_common.util import download_cache
+
+
+class _Handler(BaseHTTPRequestHandler):
+    files = dict()
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = _Handler.files[self.path]
+        etag = f'"{len(body)}"'
+        revalidation = self.headers.get("If-None-Match", None) == etag
+        _Handler.requests.append((self.path, revalidation))
+
+        if revalidation:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, "download_cache_directory", lambda: tmp_path / "cache")
+    monkeypatch.setattr(download_cache, "_max_size", lambda: 1000)
+
+    _Handler.files = {"/a": b"a" * 400, "/b": b"b" * 400, "/c": b"c" * 400}
+    _Handler.requests = []
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_file_is_downloaded_once(server, tmp_path):
+    for i in range(10):
+        target = download_cache.cached_download(f"{server}/a", tmp_path / f"prefix-{i}" / "installer.exe")
+        assert target.read_bytes() == b"a" * 400
+
+    assert _Handler.requests == [("/a", False)]
+
+
+def test_stale_file_is_revalidated(server, monkeypatch):
+    first = download_cache.cached_file(f"{server}/a")
+
+    monkeypatch.setattr(download_cache, "FRESH_FOR", 0)
+    assert download_cache.cached_file(f"{server}/a") == first
+
+    assert _Handler.requests == [("/a", False), ("/a", True)]
+
+
+def test_least_recently_used_file_is_evicted(server):
+    a = download_cache.cached_file(f"{server}/a")
+    time.sleep(0.01)
+    b = download_cache.cached_file(f"{server}/b")
+    time.sleep(0.01)
+    download_cache.cached_file(f"{server}/a")
+    time.sleep(0.01)
+    c = download_cache.cached_file(f"{server}/c")
+
+    assert a.exists() and c.exists()
+    assert not b.exists()
+
+
+def _objects(tmp_path):
+    return sorted(path.name for path in (tmp_path / "cache" / "objects").iterdir())
+
+
+def test_changed_file_replaces_the_old_one(server, tmp_path, monkeypatch):
+    first = download_cache.cached_file(f"{server}/a")
+
+    monkeypatch.setattr(download_cache, "FRESH_FOR", 0)
+    _Handler.files["/a"] = b"A" * 300
+    second = download_cache.cached_file(f"{server}/a")
+
+    assert second != first and not first.exists()
+    assert _objects(tmp_path) == [second.name]
+
+
+def test_orphaned_files_are_removed(server, tmp_path):
+    orphan = tmp_path / "cache" / "objects" / "0123"
+    orphan.parent.mkdir(parents=True)
+    orphan.write_bytes(b"left behind")
+
+    a = download_cache.cached_file(f"{server}/a")
+
+    assert _objects(tmp_path) == [a.name]
@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+from grapejuice_common import paths
+from grapejuice_common.roblox_product import RobloxReleaseChannel
+from grapejuice_common.wine import fast_flag_dump_cache
+
+
+@pytest.fixture
+def dump_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, "fast_flag_dump_cache_directory", lambda: tmp_path)
+    return tmp_path
+
+
+def test_dumps_are_keyed_by_version_and_channel(dump_directory):
+    fast_flag_dump_cache.store_dump("version-a", RobloxReleaseChannel.LIVE, b"{\"FFlag\": true}")
+
+    assert fast_flag_dump_cache.load_dump("version-a", RobloxReleaseChannel.LIVE) == b"{\"FFlag\": true}"
+    assert fast_flag_dump_cache.load_dump("version-a", RobloxReleaseChannel.Canary) is None
+    assert fast_flag_dump_cache.load_dump("version-b", RobloxReleaseChannel.LIVE) is None
+
+
+def test_old_dumps_are_removed(dump_directory):
+    for index in range(fast_flag_dump_cache.NUMBER_OF_DUMPS_TO_KEEP + 2):
+        fast_flag_dump_cache.store_dump(f"version-{index}", RobloxReleaseChannel.LIVE, b"{}")
+
+        path = fast_flag_dump_cache.dump_cache_path(f"version-{index}", RobloxReleaseChannel.LIVE)
+        os.utime(path, (index, index))
+
+    fast_flag_dump_cache.store_dump("version-latest", RobloxReleaseChannel.LIVE, b"{}")
+
+    assert len(list(dump_directory.glob("*.json.gz"))) == fast_flag_dump_cache.NUMBER_OF_DUMPS_TO_KEEP
+    assert fast_flag_dump_cache.load_dump("version-0", RobloxReleaseChannel.LIVE) is None
+    assert fast_flag_dump_cache.load_dump("version-latest", RobloxReleaseChannel.LIVE) == b"{}"
@@ -0,0 +1,33 @@
+import os
+
+from grapejuice_common.wine.fast_flag_manifest import FastFlagManifest
+
+
+def test_unchanged_files_are_skipped(tmp_path):
+    manifest_path = tmp_path / "manifest.json"
+    target = tmp_path / "Versions" / "version-a" / "ClientSettings" / "ClientAppSettings.json"
+
+    manifest = FastFlagManifest(manifest_path).load()
+    assert manifest.write_if_changed(target, b"{}")
+    manifest.save()
+
+    assert target.read_bytes() == b"{}"
+    assert oct(os.stat(target).st_mode & 0o777) == oct(0o644)
+
+    manifest = FastFlagManifest(manifest_path).load()
+    assert not manifest.write_if_changed(target, b"{}")
+    assert manifest.write_if_changed(target, b"{\"FFlag\": true}")
+
+
+def test_files_changed_by_others_are_written_again(tmp_path):
+    manifest = FastFlagManifest(tmp_path / "manifest.json")
+    target = tmp_path / "ClientAppSettings.json"
+
+    assert manifest.write_if_changed(target, b"{}")
+
+    target.write_bytes(b"{\"Changed\": 1}")
+    assert manifest.write_if_changed(target, b"{}")
+    assert target.read_bytes() == b"{}"
+
+    os.remove(target)
+    assert manifest.write_if_changed(target, b"{}")
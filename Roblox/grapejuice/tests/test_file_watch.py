@@ -0,0 +1,42 @@
+import threading
+import time
+
+from grapejuice_common.util.file_watch import wait_for_file, is_complete_json_document
+
+
+def test_partial_json_is_not_complete(tmp_path):
+    path = tmp_path / "StudioAppSettings.json"
+    assert not is_complete_json_document(path)
+
+    path.write_text("{\"FFlagOne\": true, ")
+    assert not is_complete_json_document(path)
+
+    path.write_text("{\"FFlagOne\": true}")
+    assert is_complete_json_document(path)
+
+
+def test_wait_for_file_wakes_up_when_the_file_is_written(tmp_path):
+    path = tmp_path / "ClientSettings" / "StudioAppSettings.json"
+
+    def write_dump():
+        time.sleep(0.2)
+        path.parent.mkdir()
+        path.write_text("{\"FFlagOne\": ")
+        time.sleep(0.2)
+        path.write_text("{\"FFlagOne\": true}")
+
+    writer = threading.Thread(target=write_dump)
+    writer.start()
+
+    started = time.monotonic()
+    assert wait_for_file(path, is_complete_json_document, timeout=10)
+    assert time.monotonic() - started < 5
+
+    writer.join()
+
+
+def test_wait_for_file_times_out_and_aborts(tmp_path):
+    path = tmp_path / "missing.json"
+
+    assert not wait_for_file(path, is_complete_json_document, timeout=0.2)
+    assert not wait_for_file(path, is_complete_json_document, timeout=10, should_abort=lambda: True)
@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+from grapejuice_common.wine.launch_pipeline import LaunchPipeline, ensure_pipeline
+
+
+def test_steps_overlap():
+    barrier = threading.Barrier(2, timeout=5)
+
+    with LaunchPipeline() as pipeline:
+        first = pipeline.submit("first", barrier.wait)
+        second = pipeline.submit("second", barrier.wait)
+
+    # Both steps can only pass the barrier when they run at the same time
+    assert {first.result(), second.result()} == {0, 1}
+
+
+def test_steps_can_depend_on_earlier_steps():
+    with LaunchPipeline() as pipeline:
+        base = pipeline.submit("base", lambda: 20)
+        derived = pipeline.submit("derived", lambda: base.result() + 22)
+
+    assert derived.result() == 42
+
+
+def test_first_failure_is_raised():
+    def fail(message: str):
+        raise ValueError(message)
+
+    with pytest.raises(ValueError, match="first"):
+        with LaunchPipeline() as pipeline:
+            pipeline.submit("first", fail, "first")
+            pipeline.submit("second", fail, "second")
+
+
+def test_borrowed_pipeline_waits_for_steps_of_its_owner():
+    event = threading.Event()
+
+    with LaunchPipeline() as pipeline:
+        owner_step = pipeline.submit("owner", event.wait, 5)
+
+        with ensure_pipeline(pipeline) as borrowed:
+            borrowed.submit("set", event.set)
+
+        assert owner_step.done()
+
+        # The borrowed pipeline leaves the executor of its owner running
+        assert pipeline.submit("after", lambda: True).result()
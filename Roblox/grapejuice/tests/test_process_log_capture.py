@@ -0,0 +1,123 @@
+import gzip
+import subprocess
+import sys
+import time
+
+from grapejuice_common import paths
+from grapejuice_common.logs import process_log_capture
+from grapejuice_common.logs.process_log_capture import LogCaptureSettings, RotatingLogWriter, ProcessLogCapture, \
+    close_log_captures
+
+
+def test_rotating_log_writer_caps_size(tmp_path):
+    path = tmp_path / "test_stdout.log"
+    writer = RotatingLogWriter(path, LogCaptureSettings(max_bytes=10, backup_count=2))
+
+    writer.write(b"a" * 10)
+    writer.write(b"b" * 10)
+    writer.write(b"c" * 15)
+    writer.close()
+
+    assert path.read_bytes() == b"c" * 5
+    assert (tmp_path / "test_stdout.1.log").read_bytes() == b"c" * 10
+    assert (tmp_path / "test_stdout.2.log").read_bytes() == b"b" * 10
+    assert not (tmp_path / "test_stdout.3.log").exists()
+
+
+def test_rotating_log_writer_compresses(tmp_path):
+    path = tmp_path / "test_stdout.log"
+    writer = RotatingLogWriter(path, LogCaptureSettings(max_bytes=4, backup_count=1, compress=True))
+
+    writer.write(b"12345678")
+    writer.close()
+
+    assert path.read_bytes() == b"5678"
+
+    with gzip.open(tmp_path / "test_stdout.1.log.gz", "rb") as fp:
+        assert fp.read() == b"1234"
+
+
+def _wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    return condition()
+
+
+def _log_text(directory, pattern):
+    log_path = next(directory.glob(pattern), None)
+    return log_path.read_text() if log_path else None
+
+
+def _run_captured(name, command, **kwargs):
+    capture = ProcessLogCapture(name, **kwargs)
+    proc = subprocess.Popen(command, stdin=capture.stdin, stdout=capture.stdout, stderr=capture.stderr)
+    capture.start()
+
+    return capture, proc
+
+
+def test_process_log_capture(tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, "logging_directory", lambda: tmp_path)
+
+    capture, proc = _run_captured("echo", ["sh", "-c", "echo out; echo err >&2"])
+    proc.wait()
+
+    assert capture._closed
+    assert _wait_for(lambda: _log_text(tmp_path, "*_echo_stdout.log") == "out\n")
+    assert _wait_for(lambda: _log_text(tmp_path, "*_echo_stderr.log") == "err\n")
+
+
+def test_captures_share_one_writer(tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, "logging_directory", lambda: tmp_path)
+
+    writers = set()
+
+    for name in ("first", "second"):
+        _capture, proc = _run_captured(name, ["sh", "-c", f"echo {name}"])
+        proc.wait()
+        writers.add(process_log_capture._session._process.pid)
+
+        assert _wait_for(lambda: _log_text(tmp_path, f"*_{name}_stdout.log") == f"{name}\n")
+
+    assert len(writers) == 1
+
+
+def test_output_is_captured_after_grapejuice_exits(tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, "logging_directory", lambda: tmp_path)
+
+    capture = ProcessLogCapture("late", LogCaptureSettings(max_bytes=4, backup_count=1, compress=True))
+    proc = subprocess.Popen(
+        ["sh", "-c", "read -r line; echo 12345678"],
+        stdin=subprocess.PIPE,
+        stdout=capture.stdout,
+        stderr=capture.stderr
+    )
+    capture.start()
+    writer = process_log_capture._session._process
+
+    # Grapejuice holds none of the descriptors anymore, as if the CLI had exited while the process keeps running
+    close_log_captures()
+    assert capture._closed
+    assert not capture._child_fds and not capture._log_paths and capture._pty_fd is None
+
+    proc.communicate(b"go\n", timeout=5)
+    writer.wait(5)
+
+    assert next(tmp_path.glob("*_late_stdout.log")).read_bytes() == b"\n"
+
+    with gzip.open(next(tmp_path.glob("*_late_stdout.1.log.gz")), "rb") as fp:
+        assert fp.read() == b"5678"
+
+
+def test_process_log_capture_falls_back_to_a_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, "logging_directory", lambda: tmp_path)
+    monkeypatch.setattr(process_log_capture, "_session", None)
+    monkeypatch.setattr(sys, "executable", str(tmp_path / "missing-python"))
+
+    capture, proc = _run_captured("echo", ["sh", "-c", "echo out"])
+    proc.wait()
+
+    assert _wait_for(lambda: capture._closed)
+    assert _log_text(tmp_path, "*_echo_stdout.log") == "out\n"
@@ -0,0 +1,100 @@
+import uuid
+
+from grapejuice_common import paths
+from grapejuice_common.models.wineprefix_configuration_model import WineprefixConfigurationModel
+from grapejuice_common.wine import registry_diff
+from grapejuice_common.wine.registry_file import RegistryValueType
+from grapejuice_common.wine.wineprefix import Wineprefix
+
+OLD_HIVE = """WINE REGISTRY Version 2
+
+[Software\\\\Roblox\\\\Changed] 1690000000
+#time=1d9b9a5c2f0e3b1
+"Kept"="same"
+"Removed"=dword:00000001
+"Version"="version-a"
+
+[Software\\\\Roblox\\\\Gone] 1690000000
+"Value"="old"
+
+[Software\\\\Roblox\\\\Touched] 1690000000
+#time=1d9b9a5c2f0e3b1
+"Value"="same"
+
+[Software\\\\Wine] 1690000000
+"Version"="win10"
+"""
+
+NEW_HIVE = """WINE REGISTRY Version 2
+
+[Software\\\\Roblox\\\\Changed] 1690000100
+#time=1d9b9a5c2f0e3ff
+"Added"=hex(7):61,00,00,00,00,00
+"Kept"="same"
+"Version"="version-b"
+
+[Software\\\\Roblox\\\\New] 1690000100
+"Value"="new"
+
+[Software\\\\Roblox\\\\Touched] 1690000100
+#time=1d9b9a5c2f0e3ff
+"Value"="same"
+
+[Software\\\\Wine] 1690000000
+"Version"="win7"
+"""
+
+
+def _changes_by_path(changes):
+    return {change.path: change for change in changes}
+
+
+def test_diff_hives(tmp_path):
+    old_hive = tmp_path / "old.reg"
+    new_hive = tmp_path / "new.reg"
+    old_hive.write_text(OLD_HIVE)
+    new_hive.write_text(NEW_HIVE)
+
+    changes = _changes_by_path(registry_diff.diff_hives(old_hive, new_hive, key_prefix="Software\\Roblox"))
+
+    assert set(changes) == {r"Software\\Roblox\\Changed", r"Software\\Roblox\\Gone", r"Software\\Roblox\\New"}
+    assert changes[r"Software\\Roblox\\Gone"].kind == "removed"
+    assert changes[r"Software\\Roblox\\New"].kind == "added"
+
+    changed = changes[r"Software\\Roblox\\Changed"]
+    assert changed.kind == "changed"
+
+    value_changes = {value_change.name: value_change for value_change in changed.values}
+    assert set(value_changes) == {"Added", "Removed", "Version"}
+    assert value_changes["Added"].old is None
+    assert value_changes["Added"].new.type is RegistryValueType.REG_MULTI_SZ
+    assert value_changes["Removed"].new is None
+    assert value_changes["Version"].new.data == "version-b"
+
+    assert r"Software\\Wine" in _changes_by_path(registry_diff.diff_hives(old_hive, new_hive))
+
+
+def test_diff_against_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, "wineprefixes_directory", lambda: tmp_path / "prefixes")
+    monkeypatch.setattr(paths, "registry_snapshots_directory", lambda: tmp_path / "snapshots")
+
+    prefix = Wineprefix(WineprefixConfigurationModel(
+        id=str(uuid.uuid4()),
+        priority=0,
+        name_on_disk="diff",
+        display_name="diff",
+        wine_home="",
+        dll_overrides=""
+    ))
+
+    hive = prefix.paths.base_directory / "user.reg"
+    hive.parent.mkdir(parents=True)
+    hive.write_text(OLD_HIVE)
+
+    assert registry_diff.snapshot_registry(prefix) == [registry_diff.snapshot_directory(prefix) / "user.reg"]
+    assert registry_diff.diff_registry_snapshot(prefix) == {"user.reg": []}
+
+    hive.write_text(NEW_HIVE)
+
+    changes = registry_diff.diff_registry_snapshot(prefix, key_prefix="Software\\Wine")
+    assert [change.path for change in changes["user.reg"]] == [r"Software\\Wine"]
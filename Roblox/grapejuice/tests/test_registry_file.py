@@ -0,0 +1,114 @@
+import os
+
+import pytest
+
+from grapejuice_common.wine.registry_file import RegistryFile, RegistryValueType
+
+USER_HIVE = """WINE REGISTRY Version 2
+;; All keys relative to \\\\User\\\\S-1-5-21-0-0-0-1000
+
+#arch=win64
+
+[Software\\\\Microsoft\\\\Windows NT\\\\CurrentVersion] 1690000000
+#time=1d9b9a5c2f0e3b1
+"ProductName"="Microsoft Windows 10"
+
+[Software\\\\Roblox\\\\RobloxStudioBrowser\\\\roblox.com] 1690000000
+#time=1d9b9a5c2f0e3b1
+".ROBLOSECURITY"="secret=with=equals"
+"Binary"=hex:01,02,\\
+  03,04
+"Path"="C:\\\\"
+
+[Software\\\\Wine] 1690000001
+"Version"="win10"
+"""
+
+
+@pytest.fixture
+def user_hive(tmp_path):
+    path = tmp_path / "user.reg"
+    path.write_text(USER_HIVE)
+
+    return path
+
+
+@pytest.mark.parametrize("load", [True, False])
+def test_find_key(user_hive, load):
+    hive = RegistryFile(user_hive)
+    if load:
+        hive.load()
+
+    key = hive.find_key(r"Software\\Roblox\\RobloxStudioBrowser\\roblox.com")
+
+    assert key.value == "1690000000"
+    assert key.get_attribute("time") == "1d9b9a5c2f0e3b1"
+    assert key.get_attribute(".ROBLOSECURITY") == '"secret=with=equals"'
+    assert key.get_attribute("Binary") == "hex:01,02,03,04"
+    assert key.get_attribute("Path") == '"C:\\\\"'
+
+    assert hive.find_key(r"Software\\Microsoft\\Windows NT\\CurrentVersion").get_attribute("ProductName") == \
+        '"Microsoft Windows 10"'
+    assert hive.find_key(r"Software\\Roblox") is None
+
+
+def test_find_keys(user_hive):
+    keys = RegistryFile(user_hive).find_keys([r"software\\wine", r"Software\\Missing"])
+
+    assert keys[r"software\\wine"].get_attribute("Version") == '"win10"'
+    assert keys[r"Software\\Missing"] is None
+
+
+def test_index_follows_changes(user_hive):
+    hive = RegistryFile(user_hive)
+    hive.load()
+
+    user_hive.write_text(USER_HIVE.replace('"win10"', '"win7"'))
+    os.utime(user_hive, ns=(0, 0))
+
+    assert hive.find_key(r"Software\\Wine").get_attribute("Version") == '"win7"'
+
+
+def test_missing_hive(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        RegistryFile(tmp_path / "system.reg").find_key(r"Software\\Wine")
+
+
+TYPED_HIVE = """WINE REGISTRY Version 2
+
+[Software\\\\Typed] 1690000000
+#time=1d9b9a5c2f0e3b1
+@="default"
+"String"="line\\nbreak \\"quoted\\" \\x00e9"
+"Dword"=dword:0000002a
+"Binary"=hex:01,02,ff
+"Expand"=str(2):"%SystemRoot%\\\\system32"
+"ExpandHex"=hex(2):25,00,41,00,25,00,00,00
+"Multi"=hex(7):61,00,00,00,62,00,63,00,00,00,00,00
+"Qword"=hex(b):01,00,00,00,00,00,00,00
+"""
+
+
+def test_typed_values(tmp_path):
+    path = tmp_path / "system.reg"
+    path.write_text(TYPED_HIVE)
+
+    key = RegistryFile(path).find_key(r"Software\\Typed")
+    values = key.values
+
+    assert "time" not in values
+    assert key.get_value("time") is None
+
+    expected = {
+        "@": (RegistryValueType.REG_SZ, "default"),
+        "String": (RegistryValueType.REG_SZ, "line\nbreak \"quoted\" é"),
+        "Dword": (RegistryValueType.REG_DWORD, 42),
+        "Binary": (RegistryValueType.REG_BINARY, b"\x01\x02\xff"),
+        "Expand": (RegistryValueType.REG_EXPAND_SZ, "%SystemRoot%\\system32"),
+        "ExpandHex": (RegistryValueType.REG_EXPAND_SZ, "%A%"),
+        "Multi": (RegistryValueType.REG_MULTI_SZ, ["a", "bc"]),
+        "Qword": (RegistryValueType.REG_QWORD, 1)
+    }
+
+    assert {name: (value.type, value.data) for name, value in values.items()} == expected
+    assert key.get_value("Dword").raw == "dword:0000002a"
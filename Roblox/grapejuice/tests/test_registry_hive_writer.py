@@ -0,0 +1,152 @@
+import pytest
+
+from grapejuice_common import paths
+from grapejuice_common.errors import UnsupportedOfflineRegistryEdit
+from grapejuice_common.wine.registry_hive_writer import RegistryHiveWriter, apply_registry_text, escape_registry_string
+
+SYSTEM_HIVE = """WINE REGISTRY Version 2
+;; All keys relative to \\\\Machine
+
+#arch=win64
+
+[System\\\\CurrentControlSet\\\\Services\\\\edgeupdate] 1690000000
+#time=1d9b9a5c2f0e3b1
+"DependOnService"=hex(7):52,00,50,00,43,00,53,00,53,00,00,00,\\
+  00,00
+"Start"=dword:00000002
+
+[System\\\\CurrentControlSet\\\\Services\\\\edgeupdate\\\\Security] 1690000000
+#time=1d9b9a5c2f0e3b1
+"Security"=hex:01,00
+
+[System\\\\CurrentControlSet\\\\Services\\\\edgeupdatem] 1690000000
+#time=1d9b9a5c2f0e3b1
+"Start"=dword:00000003
+;; A comment that should survive
+
+[System\\\\Other] 1690000000
+#time=1d9b9a5c2f0e3b1
+@="default"
+"""
+
+
+@pytest.fixture
+def system_hive(tmp_path):
+    path = tmp_path / "system.reg"
+    path.write_text(SYSTEM_HIVE)
+
+    return path
+
+
+def test_unchanged_hive_round_trips(system_hive):
+    writer = RegistryHiveWriter(system_hive)
+    writer.load()
+
+    assert "\n".join(writer.lines()) + "\n" == SYSTEM_HIVE
+
+
+def test_delete_key_removes_subkeys(system_hive):
+    with RegistryHiveWriter(system_hive) as writer:
+        assert writer.delete_key(r"System\CurrentControlSet\Services\edgeupdate")
+
+    text = system_hive.read_text()
+
+    assert "edgeupdate]" not in text
+    assert "edgeupdate\\\\Security" not in text
+    assert "[System\\\\CurrentControlSet\\\\Services\\\\edgeupdatem] 1690000000" in text
+    assert ";; A comment that should survive" in text
+
+
+def test_set_and_delete_values(system_hive):
+    with RegistryHiveWriter(system_hive) as writer:
+        writer.set_dword_value(r"System\Other", "Start", 4)
+        writer.set_string_value(r"System\Other", None, "changed")
+        writer.set_string_value(r"System\New Key", "Name", "Grapejuice \"ünicode\"")
+        writer.delete_value(r"System\CurrentControlSet\Services\edgeupdatem", "start")
+
+    writer = RegistryHiveWriter(system_hive)
+    writer.load()
+    text = "\n".join(writer.lines())
+
+    assert "\"Start\"=dword:00000004" in text
+    assert "@=\"changed\"" in text
+    assert "[System\\\\New Key]" in text
+    assert "\"Name\"=\"Grapejuice \\\"\\x00fcnicode\\\"\"" in text
+    assert "dword:00000003" not in text
+    assert "[System\\\\Other] 1690000000" not in text
+
+
+def test_escape_registry_string():
+    assert escape_registry_string("a\\b\"c\n") == "a\\\\b\\\"c\\n"
+
+
+def test_apply_registry_text(tmp_path, system_hive):
+    delete_reg = (paths.assets_directory() / "edge_webview" / "delete_edgeupdatem_service.reg").read_bytes()
+    writers = apply_registry_text(delete_reg.decode("UTF-16"), tmp_path)
+
+    assert not writers["system.reg"].has_key(r"System\CurrentControlSet\Services\edgeupdatem")
+    assert writers["system.reg"].has_key(r"System\CurrentControlSet\Services\edgeupdate")
+
+
+def test_apply_registry_text_rejects_redirected_keys(tmp_path, system_hive):
+    with pytest.raises(UnsupportedOfflineRegistryEdit):
+        apply_registry_text("[HKEY_LOCAL_MACHINE\\Software\\Roblox]\n\"A\"=\"B\"\n", tmp_path)
+
+
+LINKED_SYSTEM_HIVE = """WINE REGISTRY Version 2
+;; All keys relative to \\\\Machine
+
+#arch=win64
+
+[System\\\\ControlSet001\\\\Services\\\\edgeupdate] 1690000000
+#time=1d9b9a5c2f0e3b1
+"Start"=dword:00000002
+
+[System\\\\CurrentControlSet] 1690000000
+#time=1d9b9a5c2f0e3b1
+#link
+"SymbolicLinkValue"=hex(6):5c,00,52,00,65,00,67,00,69,00,73,00,74,00,72,00,79,00,5c,00,4d,00,\\
+  61,00,63,00,68,00,69,00,6e,00,65,00,5c,00,53,00,79,00,73,00,74,00,65,00,6d,00,\\
+  5c,00,43,00,6f,00,6e,00,74,00,72,00,6f,00,6c,00,53,00,65,00,74,00,30,00,30,00,\\
+  31,00
+"""
+
+
+@pytest.fixture
+def linked_system_hive(tmp_path):
+    path = tmp_path / "system.reg"
+    path.write_text(LINKED_SYSTEM_HIVE)
+
+    return path
+
+
+def test_apply_registry_text_follows_links(tmp_path, linked_system_hive):
+    delete_reg = (paths.assets_directory() / "edge_webview" / "delete_edgeupdate_service.reg").read_bytes()
+    writers = apply_registry_text(delete_reg.decode("UTF-16"), tmp_path)
+    writers["system.reg"].save()
+
+    text = linked_system_hive.read_text()
+    assert "[System\\\\ControlSet001\\\\Services\\\\edgeupdate]" not in text
+    assert "#link" in text
+
+    restore_reg = (paths.assets_directory() / "edge_webview" / "edgeupdate_service.reg").read_bytes()
+    writers = apply_registry_text(restore_reg.decode("UTF-16"), tmp_path)
+    writers["system.reg"].save()
+
+    text = linked_system_hive.read_text()
+    assert "[System\\\\ControlSet001\\\\Services\\\\edgeupdate]" in text
+    assert "[System\\\\CurrentControlSet\\\\Services" not in text
+    assert writers["system.reg"].has_key(r"System\CurrentControlSet\Services\edgeupdate")
+
+
+def test_link_keys_are_not_deleted_offline(tmp_path, linked_system_hive):
+    with pytest.raises(UnsupportedOfflineRegistryEdit):
+        apply_registry_text("[-HKEY_LOCAL_MACHINE\\System\\CurrentControlSet]\n", tmp_path)
+
+
+def test_links_out_of_the_hive_are_not_followed(tmp_path):
+    foreign_hive = LINKED_SYSTEM_HIVE.replace("relative to \\\\Machine", "relative to \\\\User\\\\S-1-5-21-0-0-0-1000")
+    (tmp_path / "system.reg").write_text(foreign_hive)
+
+    with pytest.raises(UnsupportedOfflineRegistryEdit):
+        apply_registry_text("[HKEY_LOCAL_MACHINE\\System\\CurrentControlSet\\Services\\x]\n\"A\"=\"B\"\n", tmp_path)
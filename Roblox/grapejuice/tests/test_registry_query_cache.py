@@ -0,0 +1,47 @@
+import os
+
+from grapejuice_common.wine.registry_file import RegistryFile
+from grapejuice_common.wine.registry_query_cache import RegistryQueryCache
+
+HIVE = """WINE REGISTRY Version 2
+
+[Software\\\\Wine] 1690000000
+"Version"="{version}"
+"""
+
+
+def test_results_are_cached_until_the_hive_changes(tmp_path):
+    hive_path = tmp_path / "user.reg"
+    hive_path.write_text(HIVE.format(version="win10"))
+
+    queries = []
+
+    def query(hive: RegistryFile) -> str:
+        queries.append(hive)
+        return hive.find_key(r"Software\\Wine").get_attribute("Version")
+
+    def cache():
+        return RegistryQueryCache(tmp_path / "grapejuice_registry_cache.json")
+
+    assert cache().query(hive_path, "version", query) == '"win10"'
+    assert cache().query(hive_path, "version", query) == '"win10"'
+    assert len(queries) == 1
+
+    # Wineserver replaces the file when it saves the hive
+    replacement = tmp_path / "user.reg.new"
+    replacement.write_text(HIVE.format(version="win7"))
+    os.replace(replacement, hive_path)
+
+    assert cache().query(hive_path, "version", query) == '"win7"'
+    assert len(queries) == 2
+
+
+def test_invalid_cache_is_ignored(tmp_path):
+    hive_path = tmp_path / "user.reg"
+    hive_path.write_text(HIVE.format(version="win10"))
+
+    cache_path = tmp_path / "grapejuice_registry_cache.json"
+    cache_path.write_text("{")
+
+    assert RegistryQueryCache(cache_path).query(hive_path, "present", lambda hive: True) is True
+    assert RegistryQueryCache(cache_path).query(hive_path, "present", lambda hive: False) is True
@@ -0,0 +1,88 @@
+import pytest
+
+from grapejuice_common import paths
+from grapejuice_common.errors import LegacyRegistryFormat
+from grapejuice_common.wine.registry_transaction import RegistryTransaction, decode_registry_file, REGISTRY_HEADER
+
+
+def test_transaction_merges_fragments_into_one_import():
+    imports = []
+    edge_webview_directory = paths.assets_directory() / "edge_webview"
+
+    with RegistryTransaction(imports.append) as transaction:
+        transaction.add_file(edge_webview_directory / "delete_edgeupdate_service.reg")
+        transaction.add_file(edge_webview_directory / "delete_edgeupdatem_service.reg")
+        transaction.add_file(paths.assets_directory() / "disable_mime_assoc.reg")
+
+    assert len(imports) == 1
+
+    merged = imports[0]
+    assert merged.count(REGISTRY_HEADER) == 1
+    assert r"[-HKEY_LOCAL_MACHINE\System\CurrentControlSet\Services\edgeupdate]" in merged
+    assert r"[-HKEY_LOCAL_MACHINE\System\CurrentControlSet\Services\edgeupdatem]" in merged
+    assert '"Enable"="N"' in merged
+
+
+def test_transaction_substitutes_templates():
+    imports = []
+
+    with RegistryTransaction(imports.append) as transaction:
+        transaction.add_file(paths.assets_directory() / "roblox_documents_folder.reg", patches={"DOCUMENTS_DIR": "Z:"})
+
+    assert '"DocumentsFolderLocation"="Z:"' in imports[0]
+
+
+def test_empty_transaction_does_not_import():
+    imports = []
+
+    with RegistryTransaction(imports.append):
+        pass
+
+    assert not imports
+
+
+def test_decode_registry_file():
+    assert decode_registry_file("REGEDIT4".encode("UTF-16")) == "REGEDIT4"
+    assert decode_registry_file(b"REGEDIT4") == "REGEDIT4"
+
+
+def test_transaction_rejects_regedit4_fragments():
+    transaction = RegistryTransaction(lambda text: None)
+
+    with pytest.raises(LegacyRegistryFormat):
+        transaction.add_fragment("\r\nREGEDIT4\r\n\r\n[HKEY_CURRENT_USER\\Software\\Test]\r\n\"Value\"=\"x\"\r\n")
+
+    assert transaction.is_empty
+
+
+def _count_imports(prefix, tmp_path, monkeypatch):
+    imports = []
+
+    monkeypatch.setattr(prefix.paths, "_base_directory", tmp_path)
+    monkeypatch.setattr(prefix.core_control, "import_registry_text", imports.append)
+
+    return imports
+
+
+def test_configure_prefix_imports_once(random_wineprefix, tmp_path, monkeypatch):
+    imports = _count_imports(random_wineprefix, tmp_path, monkeypatch)
+
+    random_wineprefix.core_control.configure_prefix()
+
+    assert len(imports) == 1
+    assert '"Enable"="N"' in imports[0]
+
+
+def test_configure_prefix_joins_transaction(random_wineprefix, tmp_path, monkeypatch):
+    imports = _count_imports(random_wineprefix, tmp_path, monkeypatch)
+    edge_webview_directory = paths.assets_directory() / "edge_webview"
+
+    with random_wineprefix.core_control.registry_transaction() as transaction:
+        random_wineprefix.core_control.create_prefix(transaction)
+        transaction.add_file(edge_webview_directory / "delete_edgeupdate_service.reg")
+
+        assert not imports
+
+    assert len(imports) == 1
+    assert '"Enable"="N"' in imports[0]
+    assert r"[-HKEY_LOCAL_MACHINE\System\CurrentControlSet\Services\edgeupdate]" in imports[0]
@@ -0,0 +1,150 @@
+import threading
+import time
+
+import pytest
+
+from grapejuice_common import paths
+from grapejuice_common.roblox_product import RobloxProduct
+from grapejuice_common.util import roblox_version
+from grapejuice_common.wine import roblox_pre_update
+
+
+def _touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"")
+
+
+@pytest.fixture
+def prefix(random_wineprefix, tmp_path, monkeypatch):
+    monkeypatch.setattr(random_wineprefix.paths, "_base_directory", tmp_path)
+    monkeypatch.setattr(paths, "roblox_update_locks_directory", lambda: tmp_path / "update_locks")
+    monkeypatch.setattr(
+        roblox_version, "player_version_lookup",
+        lambda channel, allow_stale=True: roblox_version.VersionLookup("version-new", fresh=True)
+    )
+    monkeypatch.setattr(
+        roblox_version, "studio_version_lookup",
+        lambda channel, allow_stale=True: roblox_version.VersionLookup("version-studio", fresh=True)
+    )
+
+    return random_wineprefix
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def _versions(prefix):
+    return prefix.paths.roblox_program_files / "Versions"
+
+
+def test_up_to_date_prefix(prefix):
+    _touch(_versions(prefix) / "version-new" / "RobloxPlayerBeta.exe")
+
+    assert roblox_pre_update.outdated_products(prefix) == []
+
+
+def test_outdated_player_is_updated_when_idle(prefix, monkeypatch):
+    versions = _versions(prefix)
+    _touch(versions / "RobloxPlayerLauncher.exe")
+    _touch(versions / "version-old" / "RobloxPlayerBeta.exe")
+
+    runs = []
+
+    def run_exe(*args, **kwargs):
+        runs.append(args)
+        _touch(versions / "version-new" / "RobloxPlayerBeta.exe")
+
+    monkeypatch.setattr(prefix.core_control, "run_exe", run_exe)
+    monkeypatch.setattr(roblox_pre_update, "machine_is_idle", lambda p, max_load: True)
+
+    outdated = roblox_pre_update.pre_update_prefix(prefix, max_load=0.5)
+
+    assert outdated == [roblox_pre_update.OutdatedProduct(RobloxProduct.player, "version-new")]
+    assert runs == [(versions / "RobloxPlayerLauncher.exe",)]
+    assert roblox_pre_update.outdated_products(prefix) == []
+
+
+def test_busy_machine_is_left_alone(prefix, monkeypatch):
+    _touch(_versions(prefix) / "RobloxPlayerLauncher.exe")
+    _touch(_versions(prefix) / "version-old" / "RobloxPlayerBeta.exe")
+
+    monkeypatch.setattr(prefix.core_control, "run_exe", pytest.fail)
+    monkeypatch.setattr(roblox_pre_update, "machine_is_idle", lambda p, max_load: False)
+
+    assert len(roblox_pre_update.pre_update_prefix(prefix, max_load=0.5)) == 1
+
+
+def test_launching_prefix_is_left_alone(prefix, monkeypatch):
+    _touch(_versions(prefix) / "RobloxPlayerLauncher.exe")
+    _touch(_versions(prefix) / "version-old" / "RobloxPlayerBeta.exe")
+
+    monkeypatch.setattr(prefix.core_control, "run_exe", pytest.fail)
+    monkeypatch.setattr(roblox_pre_update, "machine_is_idle", lambda p, max_load: True)
+
+    with roblox_pre_update.launch_lock(prefix):
+        assert len(roblox_pre_update.pre_update_prefix(prefix, max_load=0.5, force=True)) == 1
+
+
+def test_launch_waits_for_update(prefix, monkeypatch):
+    versions = _versions(prefix)
+    _touch(versions / "RobloxPlayerLauncher.exe")
+    _touch(versions / "version-old" / "RobloxPlayerBeta.exe")
+
+    events = []
+
+    def launch():
+        with roblox_pre_update.launch_lock(prefix):
+            events.append("launch")
+
+    def run_exe(*_args, **_kwargs):
+        launcher = threading.Thread(target=launch)
+        launcher.start()
+        launcher.join(0.2)
+
+        events.append("update")
+
+        _touch(versions / "version-new" / "RobloxPlayerBeta.exe")
+        return launcher
+
+    monkeypatch.setattr(prefix.core_control, "run_exe", run_exe)
+    monkeypatch.setattr(roblox_pre_update, "machine_is_idle", lambda p, max_load: True)
+
+    roblox_pre_update.pre_update_prefix(prefix, max_load=0.5)
+
+    _wait_for(lambda: "launch" in events)
+    assert events == ["update", "launch"]
+
+
+def test_new_release_is_seen_by_later_checks(random_wineprefix, tmp_path, monkeypatch):
+    monkeypatch.setattr(random_wineprefix.paths, "_base_directory", tmp_path)
+    monkeypatch.setattr(paths, "roblox_version_cache_location", lambda: tmp_path / "roblox_versions.json")
+
+    served = ["version-old"]
+    fetches = []
+
+    def fetch_version(binary_type, channel, cached):
+        fetches.append(binary_type)
+        entry = roblox_version.CachedVersion(served[0], None, time.time())
+        roblox_version._store_cached_version(roblox_version._cache_key(binary_type, channel), entry)
+
+        return entry
+
+    monkeypatch.setattr(roblox_version, "_fetch_version", fetch_version)
+
+    _touch(_versions(random_wineprefix) / "version-old" / "RobloxPlayerBeta.exe")
+    assert roblox_pre_update.outdated_products(random_wineprefix) == []
+    assert roblox_pre_update.outdated_products(random_wineprefix) == []
+    assert len(fetches) == 1
+
+    # Roblox releases a version after the first check, and the cached version expires
+    served[0] = "version-new"
+    monkeypatch.setattr(roblox_version, "version_ttl", lambda channel: 0)
+
+    assert roblox_pre_update.outdated_products(random_wineprefix) == [
+        roblox_pre_update.OutdatedProduct(RobloxProduct.player, "version-new")
+    ]
@@ -0,0 +1,151 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from grapejuice_common import paths
+from grapejuice_common.roblox_product import RobloxReleaseChannel
+from grapejuice_common.util import roblox_version, file_lock
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, version: str = None, etag: str = None):
+        self.status_code = status_code
+        self.headers = {"ETag": etag} if etag else dict()
+        self._version = version
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(str(self.status_code))
+
+    def json(self):
+        return {"clientVersionUpload": self._version}
+
+
+@pytest.fixture
+def requests_made(tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, "roblox_version_cache_location", lambda: tmp_path / "roblox_versions.json")
+
+    made = []
+    responses = []
+
+    def fake_get(url, headers=None, timeout=None):
+        made.append(dict(headers or dict()))
+        response = responses.pop(0)
+
+        if isinstance(response, Exception):
+            raise response
+
+        return response
+
+    monkeypatch.setattr(requests, "get", fake_get)
+
+    return made, responses
+
+
+def _client_version():
+    return roblox_version._client_version(roblox_version.PLAYER_BINARY_TYPE, RobloxReleaseChannel.LIVE)
+
+
+def _age_cache(seconds: float):
+    key = roblox_version._cache_key(roblox_version.PLAYER_BINARY_TYPE, RobloxReleaseChannel.LIVE)
+    entry = roblox_version._load_version_cache()[key]
+
+    roblox_version._store_cached_version(
+        key,
+        roblox_version.CachedVersion(entry.version, entry.etag, time.time() - seconds)
+    )
+
+
+def test_fresh_version_is_not_fetched_again(requests_made):
+    made, responses = requests_made
+    responses.append(FakeResponse(200, "version-a", etag="\"a\""))
+
+    assert _client_version() == "version-a"
+    assert _client_version() == "version-a"
+    assert len(made) == 1
+
+
+def test_stale_version_is_revalidated_in_background(requests_made):
+    made, responses = requests_made
+    responses.extend([FakeResponse(200, "version-a", etag="\"a\""), FakeResponse(304)])
+
+    _client_version()
+    _age_cache(roblox_version.LIVE_CHANNEL_TTL + 1)
+
+    assert _client_version() == "version-a"
+
+    for thread in list(roblox_version._background_refreshes.values()):
+        thread.join()
+
+    assert made[1] == {"If-None-Match": "\"a\""}
+
+    # The revalidation made the cached version fresh again
+    assert _client_version() == "version-a"
+    assert len(made) == 2
+
+
+def test_expired_version_is_used_when_the_network_fails(requests_made):
+    made, responses = requests_made
+    responses.extend([FakeResponse(200, "version-a"), requests.ConnectionError("offline")])
+
+    _client_version()
+    _age_cache(roblox_version.MAX_STALE_AGE + 1)
+
+    assert _client_version() == "version-a"
+    assert len(made) == 2
+
+
+def test_expired_version_is_fetched_again_in_the_same_process(requests_made):
+    made, responses = requests_made
+    responses.extend([FakeResponse(200, "version-a"), FakeResponse(200, "version-b")])
+
+    assert roblox_version.current_player_version(RobloxReleaseChannel.LIVE) == "version-a"
+    _age_cache(roblox_version.LIVE_CHANNEL_TTL + 1)
+
+    lookup = roblox_version.player_version_lookup(RobloxReleaseChannel.LIVE, allow_stale=False)
+
+    assert lookup == roblox_version.VersionLookup("version-b", fresh=True)
+    assert roblox_version.current_player_version(RobloxReleaseChannel.LIVE) == "version-b"
+    assert len(made) == 2
+
+
+def test_unwritable_cache_does_not_break_lookups(requests_made, tmp_path, monkeypatch):
+    made, responses = requests_made
+    responses.append(FakeResponse(200, "version-a"))
+
+    monkeypatch.setattr(paths, "roblox_version_cache_location", lambda: tmp_path / "missing" / "roblox_versions.json")
+
+    assert _client_version() == "version-a"
+
+
+@pytest.mark.parametrize("contents", ["[]", "null", "{\"WindowsPlayer/LIVE\": 1}", "{"])
+def test_invalid_cache_is_ignored(requests_made, tmp_path, contents):
+    made, responses = requests_made
+    responses.append(FakeResponse(200, "version-a"))
+
+    (tmp_path / "roblox_versions.json").write_text(contents)
+
+    assert _client_version() == "version-a"
+    assert len(made) == 1
+
+    # The invalid cache was replaced
+    assert _client_version() == "version-a"
+    assert len(made) == 1
+
+
+def test_stores_wait_for_other_processes(requests_made, tmp_path):
+    entry = roblox_version.CachedVersion("version-a", None, time.time())
+    store = threading.Thread(target=roblox_version._store_cached_version, args=("key", entry))
+
+    # Another process is storing a version
+    with file_lock(tmp_path / "roblox_versions.json.lock"):
+        store.start()
+        store.join(0.2)
+
+        assert store.is_alive()
+        assert not (tmp_path / "roblox_versions.json").exists()
+
+    store.join(5)
+    assert roblox_version._load_version_cache() == {"key": entry}
@@ -0,0 +1,147 @@
+import os
+
+from grapejuice_common.wine import roblox_version_index as index_module
+from grapejuice_common.wine.roblox_version_index import RobloxVersionIndex
+
+
+def _touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"")
+
+
+def _age(path, seconds=60):
+    # Make the directory look settled, so the index trusts its mtime
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - seconds * 1_000_000_000))
+
+
+def _count_scans(monkeypatch):
+    scans = []
+    original_scan_version = index_module._scan_version
+
+    def counting_scan_version(path, mtime_ns):
+        scans.append(path.name)
+        return original_scan_version(path, mtime_ns)
+
+    monkeypatch.setattr(index_module, "_scan_version", counting_scan_version)
+
+    return scans
+
+
+def test_index_finds_executables(tmp_path):
+    appdata = tmp_path / "AppData" / "Versions"
+    program_files = tmp_path / "Program Files" / "Versions"
+
+    _touch(program_files / "RobloxPlayerLauncher.exe")
+    _touch(program_files / "version-a" / "RobloxPlayerLauncher.exe")
+    _touch(program_files / "version-a" / "RobloxPlayerBeta.exe")
+    _touch(appdata / "version-b" / "RobloxStudioBeta.exe")
+
+    index = RobloxVersionIndex([appdata, program_files])
+
+    assert index.executables("RobloxPlayerLauncher.exe") == [
+        program_files / "RobloxPlayerLauncher.exe",
+        program_files / "version-a" / "RobloxPlayerLauncher.exe"
+    ]
+    assert index.settings_paths("RobloxStudioBeta.exe") == [
+        appdata / "version-b" / "ClientSettings" / "ClientAppSettings.json"
+    ]
+    assert index.loose_executable(program_files, "RobloxPlayerLauncher.exe") == \
+        program_files / "RobloxPlayerLauncher.exe"
+    assert index.latest_version("RobloxPlayerBeta.exe").name == "version-a"
+    assert index.latest_version("RobloxStudioLauncherBeta.exe") is None
+
+
+def test_index_only_reads_changed_directories(tmp_path, monkeypatch):
+    versions = tmp_path / "Versions"
+    _touch(versions / "version-a" / "RobloxPlayerLauncher.exe")
+    _age(versions / "version-a")
+    _age(versions)
+
+    index = RobloxVersionIndex([versions])
+    assert len(index.executables("RobloxPlayerLauncher.exe")) == 1
+
+    scans = _count_scans(monkeypatch)
+
+    index.refresh()
+    assert scans == []
+
+    _touch(versions / "version-b" / "RobloxPlayerLauncher.exe")
+
+    assert len(index.executables("RobloxPlayerLauncher.exe")) == 2
+    assert scans == ["version-b"]
+
+
+def test_queries_do_not_look_at_every_version(tmp_path, monkeypatch):
+    versions = tmp_path / "Versions"
+    _touch(versions / "version-a" / "RobloxPlayerLauncher.exe")
+    _age(versions / "version-a")
+    _age(versions)
+
+    index = RobloxVersionIndex([versions])
+    index.versions
+
+    stats = []
+    original_mtime_ns = index_module._mtime_ns
+    monkeypatch.setattr(index_module, "_mtime_ns", lambda path: stats.append(path) or original_mtime_ns(path))
+
+    # Extracting into an existing version is only seen by an explicit refresh
+    _touch(versions / "version-a" / "RobloxPlayerBeta.exe")
+    _age(versions / "version-a")
+
+    assert index.find_version("version-a", "RobloxPlayerBeta.exe") is None
+    assert stats == [versions]
+
+    assert index.refresh().find_version("version-a", "RobloxPlayerBeta.exe") is not None
+
+
+def test_index_is_stored_in_the_prefix(tmp_path, monkeypatch):
+    versions = tmp_path / "Versions"
+    cache_path = tmp_path / "grapejuice_versions_index.json"
+
+    for name in ("version-a", "version-b"):
+        _touch(versions / name / "RobloxPlayerBeta.exe")
+        _age(versions / name)
+
+    _age(versions)
+
+    assert len(RobloxVersionIndex([versions], cache_path).versions) == 2
+
+    # A new Grapejuice process does not have to read the versions again
+    scans = _count_scans(monkeypatch)
+    assert RobloxVersionIndex([versions], cache_path).find_version("version-b", "RobloxPlayerBeta.exe") is not None
+    assert scans == []
+
+    # Another prefix, e.g. a clone, does not use the index of the original
+    assert len(RobloxVersionIndex([tmp_path / "Other"], cache_path).versions) == 0
+
+
+def test_invalid_stored_index_is_ignored(tmp_path):
+    versions = tmp_path / "Versions"
+    cache_path = tmp_path / "grapejuice_versions_index.json"
+    _touch(versions / "version-a" / "RobloxPlayerBeta.exe")
+
+    for contents in ("[]", "{\"directories\": {\"" + str(versions) + "\": {}}}", "not json"):
+        cache_path.write_text(contents)
+        assert RobloxVersionIndex([versions], cache_path).find_version("version-a") is not None
+
+
+def test_index_handles_missing_directories(tmp_path):
+    index = RobloxVersionIndex([tmp_path / "missing"])
+
+    assert index.versions == []
+    assert index.latest_version() is None
+
+
+def test_find_version(tmp_path):
+    versions = tmp_path / "Versions"
+    _touch(versions / "version-a" / "RobloxPlayerLauncher.exe")
+    _touch(versions / "version-b" / "RobloxPlayerBeta.exe")
+
+    index = RobloxVersionIndex([versions])
+
+    assert index.find_version("version-a").path == versions / "version-a"
+    assert index.find_version("version-a", "RobloxPlayerBeta.exe") is None
+    assert index.find_version("version-b", "RobloxPlayerBeta.exe").executable("RobloxPlayerBeta.exe") == \
+        versions / "version-b" / "RobloxPlayerBeta.exe"
+    assert index.find_version("version-c") is None
@@ -0,0 +1,78 @@
+import json
+
+from grapejuice_common.logs import tracing
+
+
+def test_spans_are_noops_when_disabled():
+    assert not tracing.tracing_enabled()
+
+    with tracing.span("disabled") as s:
+        s.set("key", "value")
+
+    assert tracing.span("other") is tracing.span("disabled")
+
+
+def test_nested_spans_as_json_lines(tmp_path):
+    path = tmp_path / "test.trace.jsonl"
+    tracing.configure_tracing("test", trace_format=tracing.TRACE_FORMAT_JSON_LINES, path=path)
+
+    @tracing.traced("inner")
+    def inner():
+        return 42
+
+    try:
+        with tracing.span("outer", uri="roblox-player:1"):
+            assert inner() == 42
+
+    finally:
+        tracing.close_tracing()
+
+    events = [json.loads(line) for line in path.read_text().splitlines()]
+
+    assert [e["name"] for e in events] == ["inner", "outer"]
+    assert events[0]["parent"] == "outer"
+    assert events[0]["depth"] == 1
+    assert events[1]["args"] == {"uri": "roblox-player:1"}
+    assert events[1]["duration_us"] >= events[0]["duration_us"]
+
+
+def test_chrome_trace_is_valid_json_when_closed(tmp_path):
+    path = tmp_path / "test.trace.json"
+    tracing.configure_tracing("test", trace_format=tracing.TRACE_FORMAT_CHROME, path=path)
+
+    try:
+        with tracing.span("failing"):
+            raise ValueError()
+
+    except ValueError:
+        pass
+
+    finally:
+        tracing.close_tracing()
+
+    events = json.loads(path.read_text())
+
+    assert events[0]["ph"] == "X"
+    assert events[0]["args"] == {"error": "ValueError"}
+    assert events[-1]["ph"] == "M"
+
+
+def test_pipeline_steps_are_children_of_the_submitting_span(tmp_path):
+    from grapejuice_common.wine.launch_pipeline import LaunchPipeline
+
+    path = tmp_path / "test.trace.jsonl"
+    tracing.configure_tracing("test", trace_format=tracing.TRACE_FORMAT_JSON_LINES, path=path)
+
+    try:
+        with tracing.span("launch"):
+            with LaunchPipeline() as pipeline:
+                pipeline.submit("step", lambda: None)
+
+    finally:
+        tracing.close_tracing()
+
+    events = {e["name"]: e for e in map(json.loads, path.read_text().splitlines())}
+
+    assert events["pipeline/step"]["parent"] == "launch"
+    assert events["pipeline/step"]["depth"] == 1
+    assert events["pipeline/step"]["thread"] != events["launch"]["thread"]
@@ -0,0 +1,102 @@
+import os
+import uuid
+
+import pytest
+
+from grapejuice_common import paths
+from grapejuice_common.models.wineprefix_configuration_model import WineprefixConfigurationModel
+from grapejuice_common.wine import versions_dedup
+from grapejuice_common.wine.wineprefix import Wineprefix
+
+
+def _prefix(name: str) -> Wineprefix:
+    return Wineprefix(WineprefixConfigurationModel(
+        id=str(uuid.uuid4()),
+        priority=0,
+        name_on_disk=name,
+        display_name=name,
+        wine_home="",
+        dll_overrides=""
+    ))
+
+
+def _write(path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+@pytest.fixture
+def prefixes(tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, "wineprefixes_directory", lambda: tmp_path / "prefixes")
+    monkeypatch.setattr(paths, "versions_hash_index_location", lambda: tmp_path / "versions_hashes.json")
+    monkeypatch.setattr(versions_dedup, "scan_wine_processes", lambda p: [])
+
+    found = []
+
+    for name in ("a", "b"):
+        prefix = _prefix(name)
+        version = prefix.paths.roblox_program_files / "Versions" / "version-1"
+
+        _write(version / "RobloxPlayerBeta.exe", b"player" * 100)
+        _write(version / "content" / "sky.tex", b"sky" * 100)
+        _write(version / "ClientSettings" / "ClientAppSettings.json", b"{}")
+        _write(version / f"only-in-{name}.dll", name.encode() * (1000 + 100 * len(found)))
+
+        found.append(prefix)
+
+    return found
+
+
+def _version(prefix: Wineprefix):
+    return prefix.paths.roblox_program_files / "Versions" / "version-1"
+
+
+def test_dry_run_changes_nothing(prefixes):
+    report = versions_dedup.dedup_versions(prefixes, dry_run=True)
+
+    assert report.duplicate_files == 2
+    assert report.bytes_saved == 900
+    assert report.hashed_files == 4
+
+    a, b = map(_version, prefixes)
+    assert not os.path.samefile(a / "RobloxPlayerBeta.exe", b / "RobloxPlayerBeta.exe")
+
+
+def test_duplicates_are_linked(prefixes):
+    report = versions_dedup.dedup_versions(prefixes)
+
+    assert report.duplicate_files == 2
+    assert report.reflinked + report.hardlinked == 2
+
+    a, b = map(_version, prefixes)
+    assert (b / "RobloxPlayerBeta.exe").read_bytes() == b"player" * 100
+    assert not os.path.samefile(a / "ClientSettings" / "ClientAppSettings.json",
+                                b / "ClientSettings" / "ClientAppSettings.json")
+
+    if report.hardlinked:
+        assert os.path.samefile(a / "RobloxPlayerBeta.exe", b / "RobloxPlayerBeta.exe")
+
+    # The second run reads nothing and finds nothing left to do
+    again = versions_dedup.dedup_versions(prefixes)
+
+    assert again.hashed_files == 0
+    assert again.duplicate_files == 0
+
+
+def test_skipped_prefixes_keep_their_hashes(prefixes, monkeypatch):
+    a, b = prefixes
+
+    assert versions_dedup.dedup_versions(prefixes, dry_run=True).hashed_files == 4
+
+    # b is running programs for a while
+    busy = b.paths.base_directory
+    monkeypatch.setattr(versions_dedup, "scan_wine_processes", lambda p: ["RobloxPlayerBeta.exe"] if p == busy else [])
+
+    skipped = versions_dedup.dedup_versions(prefixes, dry_run=True)
+    assert skipped.skipped_prefixes == 1
+
+    monkeypatch.setattr(versions_dedup, "scan_wine_processes", lambda p: [])
+
+    again = versions_dedup.dedup_versions([a, b], dry_run=True)
+    assert again.hashed_files == 0
+    assert again.duplicate_files == 2
@@ -0,0 +1,88 @@
+import os
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from grapejuice_common import paths
+from grapejuice_common.models.wineprefix_configuration_model import WineprefixConfigurationModel
+from grapejuice_common.util import roblox_version
+from grapejuice_common.wine import versions_gc
+from grapejuice_common.wine.wineprefix import Wineprefix
+
+PLAYER_VERSIONS = ("version-p1", "version-p2", "version-p3", "version-p4")
+STUDIO_VERSIONS = ("version-s1", "version-s2")
+
+
+def _write(path, data: bytes = b"data"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+@pytest.fixture
+def prefix(tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, "wineprefixes_directory", lambda: tmp_path / "prefixes")
+    monkeypatch.setattr(roblox_version, "current_player_version", lambda channel: "version-p1")
+    monkeypatch.setattr(roblox_version, "current_studio_version", lambda channel: "version-s2")
+    monkeypatch.setattr(versions_gc, "scan_wine_processes", lambda p: [])
+
+    prefix = Wineprefix(WineprefixConfigurationModel(
+        id=str(uuid.uuid4()),
+        priority=0,
+        name_on_disk="gc",
+        display_name="gc",
+        wine_home="",
+        dll_overrides=""
+    ))
+
+    versions = prefix.paths.roblox_program_files / "Versions"
+
+    # Installed in order, the oldest first
+    for age, name in enumerate(reversed(PLAYER_VERSIONS + STUDIO_VERSIONS)):
+        executable = "RobloxStudioBeta.exe" if name in STUDIO_VERSIONS else "RobloxPlayerBeta.exe"
+        _write(versions / name / executable, b"x" * 100)
+        os.utime(versions / name, ns=(age * 10 ** 9, age * 10 ** 9))
+
+    _write(versions / "version-unknown" / "Something.dll")
+
+    return prefix
+
+
+def _names(versions):
+    return sorted(version.name for version in versions)
+
+
+def test_plan_keeps_current_and_previous(prefix):
+    plan = versions_gc.plan_gc(prefix, keep=1)
+
+    assert _names(plan.kept) == ["version-p1", "version-p2", "version-s1", "version-s2", "version-unknown"]
+    assert _names(stale.version for stale in plan.stale) == ["version-p3", "version-p4"]
+    assert plan.reclaimable_size == 200
+
+
+def test_gc_leaves_versions_in_use(prefix, monkeypatch):
+    processes = [SimpleNamespace(command_line=("C:\\Roblox\\Versions\\VERSION-P4\\RobloxPlayerBeta.exe", "--app"))]
+    monkeypatch.setattr(versions_gc, "scan_wine_processes", lambda p: processes)
+
+    plan = versions_gc.plan_gc(prefix, keep=0)
+    assert _names(stale.version for stale in plan.stale) == ["version-p2", "version-p3", "version-s1"]
+
+    # Version 3 was started after the plan was made
+    processes.append(SimpleNamespace(command_line=("c:/roblox/versions/version-p3/RobloxPlayerBeta.exe",)))
+    removed = versions_gc.run_gc(plan)
+
+    versions = prefix.paths.roblox_program_files / "Versions"
+    assert _names(stale.version for stale in removed) == ["version-p2", "version-s1"]
+    assert not (versions / "version-p2").exists()
+    assert (versions / "version-p3").exists()
+    assert (versions / "version-p4").exists()
+    assert not (prefix.paths.base_directory / ".grapejuice_trash").exists()
+
+
+@pytest.mark.parametrize("current_version", [None, "version-not-installed"])
+def test_newest_version_is_kept_when_current_is_unknown(prefix, monkeypatch, current_version):
+    monkeypatch.setattr(versions_gc, "_current_version", lambda p, product: current_version)
+
+    plan = versions_gc.plan_gc(prefix, keep=0)
+
+    assert _names(plan.kept) == ["version-p1", "version-s1", "version-unknown"]
@@ -0,0 +1,54 @@
+import json
+import os
+import subprocess
+
+from click.testing import CliRunner
+
+from grapejuice.cli import main as cli_main
+from grapejuice_common.wine import wine_functions
+from grapejuice_common.wine.wine_process_monitor import WineProcessMonitor
+
+
+def test_monitor_samples_processes_in_prefix(tmp_path):
+    prefix = tmp_path / "prefix"
+    prefix.mkdir()
+
+    proc = subprocess.Popen(["sleep", "30"], env={**os.environ, "WINEPREFIX": str(prefix)})
+    monitor = WineProcessMonitor(prefix)
+
+    try:
+        first = monitor.sample()
+        second = monitor.sample()
+
+    finally:
+        proc.kill()
+        proc.wait()
+
+    assert [s.pid for s in first] == [proc.pid]
+    assert first[0].cpu_percent == 0.0
+    assert first[0].rss_bytes > 0
+    assert first[0].threads == 1
+
+    assert [s.pid for s in second] == [proc.pid]
+    assert second[0].cpu_percent >= 0.0
+    assert second[0].as_dict()["image"] == "sleep"
+
+
+def test_top_once_measures_over_an_interval(random_wineprefix, tmp_path, monkeypatch):
+    monkeypatch.setattr(random_wineprefix.paths, "_base_directory", tmp_path)
+    monkeypatch.setattr(wine_functions, "get_wineprefix", lambda hints: random_wineprefix)
+
+    busy = subprocess.Popen(["sh", "-c", "while :; do :; done"], env={**os.environ, "WINEPREFIX": str(tmp_path)})
+
+    try:
+        result = CliRunner().invoke(cli_main.cli, ["top", "player", "--once", "--json", "--interval", "0.3"])
+
+    finally:
+        busy.kill()
+        busy.wait()
+
+    assert result.exit_code == 0, result.output
+
+    processes = json.loads(result.output)["processes"]
+    assert [p["pid"] for p in processes] == [busy.pid]
+    assert processes[0]["cpu_percent"] > 0
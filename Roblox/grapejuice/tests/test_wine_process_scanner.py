@@ -0,0 +1,42 @@
+import os
+import subprocess
+
+from grapejuice_common.wine.wine_process_scanner import scan_wine_processes, image_name, running_programs, \
+    WineProcess
+
+
+def test_scan_finds_processes_in_prefix(tmp_path):
+    prefix = tmp_path / "prefix"
+    prefix.mkdir()
+
+    proc = subprocess.Popen(["sleep", "30"], env={**os.environ, "WINEPREFIX": str(prefix)})
+
+    try:
+        found = scan_wine_processes(prefix)
+        other = scan_wine_processes(tmp_path / "other_prefix")
+
+    finally:
+        proc.kill()
+        proc.wait()
+
+    assert [p.unix_pid for p in found] == [proc.pid]
+    assert found[0].image == "sleep"
+    assert found[0].threads == 1
+    assert not other
+
+
+def test_image_name_from_windows_path():
+    assert image_name(("C:\\Program Files (x86)\\Roblox\\RobloxPlayerBeta.exe", "--app")) == "RobloxPlayerBeta.exe"
+    assert image_name((), fallback="wineserver") == "wineserver"
+
+
+def test_running_programs_leaves_out_wine_infrastructure():
+    processes = [
+        WineProcess(pid="1", threads=1, image="wineserver"),
+        WineProcess(pid="2", threads=4, image="services.exe"),
+        WineProcess(pid="3", threads=2, image="Explorer.exe"),
+        WineProcess(pid="4", threads=30, image="RobloxPlayerBeta.exe")
+    ]
+
+    assert [p.pid for p in running_programs(processes)] == ["4"]
+    assert not running_programs(processes[:3])
@@ -1,2 +1,27 @@
 def test_wineprefix_instantiation(random_wineprefix):
     print(random_wineprefix.configuration)
+
+
+def _player_lookup(monkeypatch, fresh: bool):
+    from grapejuice_common.util import roblox_version
+
+    monkeypatch.setattr(
+        roblox_version, "player_version_lookup",
+        lambda channel: roblox_version.VersionLookup("version-current", fresh=fresh)
+    )
+
+
+def test_direct_player_launch(random_wineprefix, tmp_path, monkeypatch):
+    monkeypatch.setattr(random_wineprefix.paths, "_base_directory", tmp_path)
+    random_wineprefix.configuration.roblox_direct_player_launch = True
+
+    player = random_wineprefix.paths.roblox_program_files / "Versions" / "version-current" / "RobloxPlayerBeta.exe"
+    player.parent.mkdir(parents=True)
+    player.write_bytes(b"")
+
+    _player_lookup(monkeypatch, fresh=True)
+    assert random_wineprefix.roblox._direct_player_executable() == player
+
+    # A version that was served from an expired cache might be outdated, the launcher has to check for updates
+    _player_lookup(monkeypatch, fresh=False)
+    assert random_wineprefix.roblox._direct_player_executable() is None
@@ -0,0 +1,167 @@
+import os
+import uuid
+
+import pytest
+
+from grapejuice_common import paths
+from grapejuice_common.errors import WineprefixInUse
+from grapejuice_common.models.wineprefix_configuration_model import WineprefixConfigurationModel
+from grapejuice_common.wine import wineprefix_clone
+from grapejuice_common.wine.wine_process_scanner import WineProcess
+from grapejuice_common.wine.wineprefix import Wineprefix
+from grapejuice_common.wine.wineprefix_core_control import WineprefixCoreControl
+
+SYSTEM_HIVE = """WINE REGISTRY Version 2
+;; All keys relative to \\\\Machine
+
+#arch=win64
+
+[Software\\\\Microsoft\\\\Cryptography] 1690000000
+#time=1d9b9a5c2f0e3b1
+"MachineGuid"="template-guid"
+
+[Software\\\\Wine\\\\Fonts] 1690000000
+#time=1d9b9a5c2f0e3b1
+"Path"="Z:{windows_path}\\\\drive_c\\\\fonts"
+"Sibling"="Z:{windows_path}2\\\\drive_c"
+"Unix"="{unix_path}"
+"""
+
+USER_HIVE = """WINE REGISTRY Version 2
+;; All keys relative to \\\\User\\\\S-1-5-21-0-0-0-1000
+
+#arch=win64
+
+[Software\\\\Roblox\\\\RobloxStudioBrowser\\\\roblox.com] 1690000000
+#time=1d9b9a5c2f0e3b1
+".ROBLOSECURITY"="secret"
+
+[Software\\\\Roblox\\\\Other] 1690000000
+#time=1d9b9a5c2f0e3b1
+"Keep"="me"
+"""
+
+
+def _prefix(name: str) -> Wineprefix:
+    return Wineprefix(WineprefixConfigurationModel(
+        id=str(uuid.uuid4()),
+        priority=0,
+        name_on_disk=name,
+        display_name=name,
+        wine_home="",
+        dll_overrides=""
+    ))
+
+
+def _write(path, data=b"data"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+@pytest.fixture
+def template(tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, "wineprefixes_directory", lambda: tmp_path / "prefixes")
+    monkeypatch.setattr(wineprefix_clone, "scan_wine_processes", lambda p: [])
+
+    prefix = _prefix("template")
+    base = prefix.paths.base_directory
+    versions = prefix.paths.roblox_program_files / "Versions"
+
+    windows_path = str(base).replace("/", "\\\\")
+    _write(base / "system.reg", SYSTEM_HIVE.format(windows_path=windows_path, unix_path=base).encode("UTF-8"))
+    _write(base / "user.reg", USER_HIVE.encode("UTF-8"))
+    _write(base / "grapejuice_fast_flags.json")
+    _write(versions / "version-a" / "RobloxPlayerBeta.exe")
+    _write(versions / "version-a" / "ClientSettings" / "ClientAppSettings.json")
+    _write(prefix.paths.drive_c / "windows" / "system32" / "kernel32.dll")
+    _write(prefix.paths.drive_c / "windows" / "temp" / "junk.tmp")
+
+    (base / "dosdevices").mkdir()
+    os.symlink("../drive_c", base / "dosdevices" / "c:")
+    os.symlink(str(base / "drive_c"), base / "dosdevices" / "d:")
+
+    return prefix
+
+
+def test_clone_prefix(template):
+    clone = _prefix("clone")
+    statistics = wineprefix_clone.clone_prefix(template, clone)
+
+    base = clone.paths.base_directory
+    versions = clone.paths.roblox_program_files / "Versions"
+    template_versions = template.paths.roblox_program_files / "Versions"
+
+    player = versions / "version-a" / "RobloxPlayerBeta.exe"
+    settings = versions / "version-a" / "ClientSettings" / "ClientAppSettings.json"
+
+    assert player.read_bytes() == b"data"
+    if statistics.reflinked == 0:
+        assert os.path.samefile(player, template_versions / "version-a" / "RobloxPlayerBeta.exe")
+        assert not os.path.samefile(settings, template_versions / "version-a" / "ClientSettings" /
+                                    "ClientAppSettings.json")
+
+    assert (clone.paths.drive_c / "windows" / "system32" / "kernel32.dll").exists()
+    assert (clone.paths.drive_c / "windows" / "temp").is_dir()
+    assert not (clone.paths.drive_c / "windows" / "temp" / "junk.tmp").exists()
+    assert not (base / "grapejuice_fast_flags.json").exists()
+
+    assert os.readlink(base / "dosdevices" / "c:") == "../drive_c"
+    assert os.readlink(base / "dosdevices" / "d:") == str(base / "drive_c")
+
+    system_hive = (base / "system.reg").read_text()
+    assert "template-guid" not in system_hive
+    assert str(base).replace("/", "\\\\") in system_hive
+    assert f'"Unix"="{base}"' in system_hive
+
+    # Paths of other prefixes whose name starts with the name of the template are left alone
+    template_windows_path = str(template.paths.base_directory).replace("/", "\\\\")
+    assert f'"Sibling"="Z:{template_windows_path}2\\\\drive_c"' in system_hive
+    assert f'"Path"="Z:{template_windows_path}\\\\' not in system_hive
+
+    user_hive = (base / "user.reg").read_text()
+    assert "ROBLOSECURITY" not in user_hive
+    assert '"Keep"="me"' in user_hive
+
+    # The template is left alone
+    assert "template-guid" in (template.paths.base_directory / "system.reg").read_text()
+
+
+def test_clone_refuses_existing_prefix(template):
+    clone = _prefix("clone")
+    clone.paths.base_directory.mkdir(parents=True)
+
+    with pytest.raises(FileExistsError):
+        wineprefix_clone.clone_prefix(template, clone)
+
+
+def _template_processes(monkeypatch, images):
+    kills = []
+
+    def scan(_):
+        return [] if kills else [WineProcess(pid=str(i), threads=1, image=image) for i, image in enumerate(images)]
+
+    monkeypatch.setattr(wineprefix_clone, "scan_wine_processes", scan)
+    monkeypatch.setattr(WineprefixCoreControl, "kill_wine_server", lambda self: kills.append(self))
+
+    return kills
+
+
+def test_clone_shuts_down_wine_infrastructure(template, monkeypatch):
+    kills = _template_processes(monkeypatch, ["wineserver", "services.exe", "explorer.exe"])
+    clone = _prefix("clone")
+
+    wineprefix_clone.clone_prefix(template, clone)
+
+    assert len(kills) == 1
+    assert clone.paths.base_directory.exists()
+
+
+def test_clone_refuses_template_running_programs(template, monkeypatch):
+    kills = _template_processes(monkeypatch, ["wineserver", "RobloxPlayerBeta.exe"])
+    clone = _prefix("clone")
+
+    with pytest.raises(WineprefixInUse):
+        wineprefix_clone.clone_prefix(template, clone)
+
+    assert not kills
+    assert not clone.paths.base_directory.exists()
@@ -0,0 +1,222 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from grapejuice_common.features.settings import current_settings
+from grapejuice_common.wine import wineprefix_core_control
+from grapejuice_common.wine.wineprefix_core_control import WineprefixCoreControl, ProcessWrapper, \
+    _exit_code_from_wait_status
+
+
+def _raw_wait_status(command):
+    proc = subprocess.Popen(command)
+    _pid, status = os.waitpid(proc.pid, 0)
+    proc.returncode = 0  # Reaped by hand, don't let Popen wait for it
+
+    return status
+
+
+def test_exit_code_from_wait_status():
+    assert _exit_code_from_wait_status(_raw_wait_status(["sh", "-c", "exit 0"])) == 0
+    assert _exit_code_from_wait_status(_raw_wait_status(["sh", "-c", "exit 3"])) == 3
+
+
+def test_exit_code_from_wait_status_signal():
+    status = _raw_wait_status(["sh", "-c", "kill -TERM $$"])
+
+    assert _exit_code_from_wait_status(status) == -signal.SIGTERM
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def test_polled_process_exits(monkeypatch):
+    monkeypatch.setattr(wineprefix_core_control, "processes", [])
+
+    exits = []
+    wrapper = ProcessWrapper(subprocess.Popen(["sh", "-c", "exit 3"]), on_exit=lambda: exits.append(True))
+    wineprefix_core_control.processes.append(wrapper)
+
+    # This is what the polling timer runs
+    _wait_for(lambda: not wineprefix_core_control._poll_processes())
+
+    assert wrapper.exited
+    assert wrapper.proc.returncode == 3
+    assert exits == [True]
+
+
+def test_watched_process_exit_is_seen_without_main_loop():
+    proc = subprocess.Popen(["sh", "-c", "kill -TERM $$"])
+    wrapper = ProcessWrapper(proc)
+    wrapper.child_watched = True
+
+    _wait_for(lambda: wrapper.exited)
+    assert proc.returncode == -signal.SIGTERM
+
+    # The process is left for the child watch to reap
+    pid, status = os.waitpid(proc.pid, 0)
+    assert pid == proc.pid
+    assert _exit_code_from_wait_status(status) == -signal.SIGTERM
+
+
+def _count_environment_builds(monkeypatch, tmp_path):
+    builds = []
+    build_env = WineprefixCoreControl._build_env
+
+    def counting_build_env(self, *args, **kwargs):
+        builds.append(args)
+        return build_env(self, *args, **kwargs)
+
+    monkeypatch.setattr(WineprefixCoreControl, "_build_env", counting_build_env)
+    monkeypatch.setattr(WineprefixCoreControl, "_resolve_wine_home", lambda self: tmp_path)
+
+    return builds
+
+
+def test_environment_is_built_once(random_wineprefix, tmp_path, monkeypatch):
+    builds = _count_environment_builds(monkeypatch, tmp_path)
+    core_control = random_wineprefix.core_control
+
+    # Importing a registry file twice and killing the wineserver afterwards
+    for _ in range(3):
+        assert core_control.make_env()["WINEPREFIX"] == str(random_wineprefix.paths.base_directory)
+
+    assert len(builds) == 1
+
+
+def test_environment_is_rebuilt_after_changes(random_wineprefix, tmp_path, monkeypatch):
+    builds = _count_environment_builds(monkeypatch, tmp_path)
+    core_control = random_wineprefix.core_control
+
+    assert core_control.make_env()["WINEDEBUG"] == "-all"
+
+    random_wineprefix.configuration.enable_winedebug = True
+    random_wineprefix.configuration.winedebug_string = "+loaddll"
+    assert core_control.make_env()["WINEDEBUG"] == "+loaddll"
+    assert len(builds) == 2
+
+    # Fields that are changed in place count as changes too
+    random_wineprefix.configuration.env["GRAPEJUICE_TEST_PREFIX_VARIABLE"] = "1"
+    assert core_control.make_env()["GRAPEJUICE_TEST_PREFIX_VARIABLE"] == "1"
+    assert len(builds) == 3
+
+    monkeypatch.setattr(current_settings, "_revision", current_settings.revision + 1)
+    core_control.make_env()
+    assert len(builds) == 4
+
+    monkeypatch.setenv("GRAPEJUICE_TEST_VARIABLE", "1")
+    assert core_control.make_env()["GRAPEJUICE_TEST_VARIABLE"] == "1"
+    assert len(builds) == 5
+
+    core_control.make_env()
+    assert len(builds) == 5
+
+
+def test_wine_server_running(random_wineprefix, tmp_path, monkeypatch):
+    monkeypatch.setattr(WineprefixCoreControl, "wine_server_directory", property(lambda self: tmp_path))
+    lock_path = tmp_path / "lock"
+    core_control = random_wineprefix.core_control
+
+    assert not core_control.wine_server_running
+
+    # Locks held by this process do not conflict with the lock check, so the lock is held by another one
+    server = subprocess.Popen(
+        [
+            sys.executable, "-c",
+            "import fcntl, sys, time\n"
+            "fp = open(sys.argv[1], 'w')\n"
+            "fcntl.lockf(fp, fcntl.LOCK_EX)\n"
+            "print('locked', flush=True)\n"
+            "time.sleep(30)",
+            str(lock_path)
+        ],
+        stdout=subprocess.PIPE
+    )
+
+    try:
+        assert server.stdout.readline() == b"locked\n"
+        assert core_control.wine_server_running
+
+    finally:
+        server.kill()
+        server.wait()
+        server.stdout.close()
+
+    # The files of a wineserver that crashed stay behind
+    assert lock_path.exists()
+    assert not core_control.wine_server_running
+
+
+def _fake_wine_server(monkeypatch, tmp_path, running: bool):
+    calls = []
+
+    monkeypatch.setattr(WineprefixCoreControl, "wine_server_running", property(lambda self: running))
+    monkeypatch.setattr(WineprefixCoreControl, "wine_server", lambda self: tmp_path / "wineserver")
+    monkeypatch.setattr(WineprefixCoreControl, "make_env", lambda self, accelerate_graphics=False: dict())
+    monkeypatch.setattr(subprocess, "call", lambda command, **kwargs: calls.append(command) or 0)
+    monkeypatch.setattr(subprocess, "check_call", lambda command, **kwargs: calls.append(command) or 0)
+
+    return calls
+
+
+def _persistent_prefix(prefix, tmp_path, monkeypatch, linger_time: int = 600):
+    monkeypatch.setattr(prefix.paths, "_base_directory", tmp_path)
+    prefix.configuration.persistent_wineserver = True
+    prefix.configuration.wineserver_linger_time = linger_time
+
+    return prefix.core_control
+
+
+@pytest.mark.parametrize("linger_time,persistence", [(600, "-p600"), (0, "-p")])
+def test_persistent_wine_server_is_started(random_wineprefix, tmp_path, monkeypatch, linger_time, persistence):
+    calls = _fake_wine_server(monkeypatch, tmp_path, running=False)
+    core_control = _persistent_prefix(random_wineprefix, tmp_path, monkeypatch, linger_time)
+
+    core_control.ensure_wine_server()
+
+    assert calls == [[str(tmp_path / "wineserver"), persistence]]
+
+
+def test_running_wine_server_is_not_started_again(random_wineprefix, tmp_path, monkeypatch):
+    calls = _fake_wine_server(monkeypatch, tmp_path, running=True)
+    core_control = _persistent_prefix(random_wineprefix, tmp_path, monkeypatch)
+
+    core_control.ensure_wine_server()
+
+    assert not calls
+
+
+def test_wine_server_is_only_started_when_persistent(random_wineprefix, tmp_path, monkeypatch):
+    calls = _fake_wine_server(monkeypatch, tmp_path, running=False)
+    monkeypatch.setattr(random_wineprefix.paths, "_base_directory", tmp_path)
+
+    random_wineprefix.core_control.ensure_wine_server()
+
+    assert not calls
+
+
+def test_persistent_wine_server_is_kept_warm(random_wineprefix, tmp_path, monkeypatch):
+    calls = _fake_wine_server(monkeypatch, tmp_path, running=True)
+    core_control = _persistent_prefix(random_wineprefix, tmp_path, monkeypatch)
+
+    core_control.shutdown_wine_server()
+
+    assert not calls
+
+
+@pytest.mark.parametrize("running", [True, False])
+def test_wine_server_is_shut_down(random_wineprefix, tmp_path, monkeypatch, running):
+    calls = _fake_wine_server(monkeypatch, tmp_path, running=running)
+
+    random_wineprefix.core_control.shutdown_wine_server()
+
+    assert calls == ([[str(tmp_path / "wineserver"), "-k"]] if running else [])